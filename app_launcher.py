@@ -1,10 +1,14 @@
 # app_launcher.py
 import sys
+import threading
 import traceback
 from PySide6.QtWidgets import QApplication, QMessageBox
 from login_screen import LoginWindow
 from main_window import MainWindow
 from logger import log_error
+from log_retention import run_retention
+from perf_monitor import start_watchdog
+from schema import ensure_schema
 
 def launch_app():
     app = QApplication(sys.argv)
@@ -16,6 +20,15 @@ def launch_app():
     except FileNotFoundError:
         print("Style file not found. Running without styles.")
 
+    # Tables, indexes and triggers the screens rely on, before any screen is built
+    ensure_schema()
+
+    # Event-loop lag / stall sampling
+    start_watchdog(app)
+
+    # Archive old error logs without holding up startup
+    threading.Thread(target=run_retention, name="log-retention", daemon=True).start()
+
     # Instantiate screens
     login_window = LoginWindow()
     main_window = MainWindow()
@@ -0,0 +1,116 @@
+# appointment_heatmap.py
+"""
+Weekday × time-of-day occupancy of appointments, computed with NumPy.
+
+All appointments in a date range, except canceled ones (as in
+vet_utilization), are read in one query as arrays of start times,
+durations and vets. Each appointment adds +1 at its start minute
+and -1 at its end minute of the week; a cumulative sum over those
+markers gives how many appointments are running in every minute of the
+week, which folds into a 7 × (1440 / slot) grid of booked minutes. The
+same pass, offset per vet, yields every vet's grid at once, so years of
+data cost one query and a handful of array operations.
+"""
+import csv
+import sqlite3
+from collections import namedtuple
+
+import numpy as np
+
+DB = "vet_management.db"
+ALL_VETS = ""                      # key of the combined grid
+SLOT_CHOICES = (60, 15)            # minutes per column: 7×24 or 7×96
+DAYS = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+
+WEEK_MINUTES = 7 * 24 * 60
+# 1970-01-01 was a Thursday; weekdays are numbered from Sunday like strftime('%w')
+_EPOCH_WEEKDAY = 4
+
+HeatmapGrid = namedtuple("HeatmapGrid", "minutes counts slot_minutes")
+# minutes: booked minutes per (weekday, slot); counts: appointments starting in it
+
+
+def _load(start, end):
+    """
+    (start minute of week, duration, vet index) arrays for appointments
+    between start and end that were not canceled, plus the vet names the indexes refer to.
+    """
+    conn = sqlite3.connect(f"file:{DB}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("""
+            SELECT date_time, duration_minutes, COALESCE(veterinarian, '')
+              FROM appointments
+             WHERE date_time >= ? AND date_time < DATE(?, '+1 day')
+               AND status != 'Canceled'
+        """, (start, end)).fetchall()
+    finally:
+        conn.close()
+    if not rows:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.int64), []
+    times, durations, vets = zip(*rows)
+    stamps = np.array(times, dtype="datetime64[m]").astype(np.int64)
+    days = stamps // 1440
+    week_minute = ((days + _EPOCH_WEEKDAY) % 7) * 1440 + stamps % 1440
+    durations = np.clip(np.array(durations, dtype=np.int64), 0, WEEK_MINUTES)
+    codes = {}
+    group = np.fromiter((codes.setdefault(v, len(codes)) for v in vets), np.int64, len(vets))
+    return week_minute, durations, group, list(codes)
+
+
+def _grids(week_minute, durations, group, n_groups, slot_minutes):
+    """Booked-minute and start-count grids for each of `n_groups` groups."""
+    span = 2 * WEEK_MINUTES + 1            # room for appointments running past Saturday night
+    offset = group * span
+    markers = (np.bincount(offset + week_minute, minlength=n_groups * span)
+               - np.bincount(offset + week_minute + durations, minlength=n_groups * span))
+    running = np.cumsum(markers.reshape(n_groups, span), axis=1)[:, :2 * WEEK_MINUTES]
+    running = running[:, :WEEK_MINUTES] + running[:, WEEK_MINUTES:]    # wrap into Sunday
+    slots = 1440 // slot_minutes
+    minutes = running.reshape(n_groups, 7, slots, slot_minutes).sum(axis=3)
+    counts = np.bincount(group * 7 * slots + week_minute // slot_minutes,
+                         minlength=n_groups * 7 * slots).reshape(n_groups, 7, slots)
+    return minutes, counts
+
+
+def heatmap_by_vet(start, end, slot_minutes=60):
+    """
+    {vet: HeatmapGrid} for appointments between start and end (inclusive),
+    plus the combined grid under ALL_VETS.
+    """
+    if slot_minutes not in SLOT_CHOICES:
+        raise ValueError(f"slot_minutes must be one of {SLOT_CHOICES}")
+    week_minute, durations, group, names = _load(start, end)
+    minutes, counts = _grids(week_minute, durations, group, len(names), slot_minutes)
+    result = {name: HeatmapGrid(minutes[i], counts[i], slot_minutes)
+              for i, name in sorted(enumerate(names), key=lambda p: p[1]) if name != ALL_VETS}
+    result[ALL_VETS] = HeatmapGrid(minutes.sum(axis=0), counts.sum(axis=0), slot_minutes)
+    return result
+
+
+def busiest_slots(grid, limit=10):
+    """[(label, booked minutes)] for the `limit` busiest non-empty slots."""
+    flat = grid.minutes.ravel()
+    order = np.argsort(flat, kind="stable")[::-1][:limit]
+    slots = grid.minutes.shape[1]
+    return [(_slot_label(i // slots, i % slots, grid.slot_minutes), int(flat[i]))
+            for i in order if flat[i] > 0]
+
+
+def _slot_label(day, slot, slot_minutes):
+    minute = slot * slot_minutes
+    return f"{DAYS[day]} {minute // 60:02d}:{minute % 60:02d}"
+
+
+def write_csv(path, grids):
+    """Long-format CSV of `grids` ({vet: HeatmapGrid}); the combined grid is labelled 'All'."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Vet", "Weekday", "Time", "Booked Minutes", "Appointments"])
+        for vet, grid in grids.items():
+            for day in range(7):
+                for slot in range(grid.minutes.shape[1]):
+                    minute = slot * grid.slot_minutes
+                    writer.writerow([
+                        vet or "All", DAYS[day], f"{minute // 60:02d}:{minute % 60:02d}",
+                        int(grid.minutes[day, slot]), int(grid.counts[day, slot])
+                    ])
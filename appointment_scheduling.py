@@ -1,5 +1,4 @@
 import sqlite3
-import csv
 from datetime import datetime, timedelta
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QFormLayout, QTableWidget, QTableWidgetItem,
                                QLineEdit, QComboBox, QPushButton,  QMessageBox, QCompleter
@@ -9,6 +8,14 @@ from PySide6.QtCore import Qt, QDate, QStringListModel, QTime, Signal, QTimer
 from PySide6.QtGui import QColor, QTextCharFormat, QBrush
 from notifications import send_email
 from logger import log_error  # Import the log_error function
+from perf_monitor import timed
+import patient_search
+import csv_export
+import csv_export_dialog
+
+# CSV export columns: date/time and duration separate, as stored
+EXPORT_HEADER = ["ID", "Patient", "Date & Time", "Duration (min)", "Type", "Reason",
+                 "Veterinarian", "Status", "Notification Status"]
 
 class MultiSelectCalendar(QCalendarWidget):
     def __init__(self):
@@ -102,8 +109,12 @@ class AppointmentSchedulingScreen(QWidget):
         # Existing patient input
         self.patient_input = QLineEdit()
         self.patient_input.setPlaceholderText("Search for a patient...")
-        self.patient_completer = QCompleter()
+        # one model for the lifetime of the screen; filter_patients swaps its rows
+        self.patient_model = QStringListModel(self)
+        self.patient_completer = QCompleter(self.patient_model, self)
         self.patient_completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)  # Correct usage
+        # matches may start at a later word ("whi" → "Mr Whiskers")
+        self.patient_completer.setFilterMode(Qt.MatchFlag.MatchContains)
         self.patient_input.setCompleter(self.patient_completer)
         self.patient_input.textChanged.connect(self.filter_patients)
         form_layout.addRow("Patient:", self.patient_input)
@@ -240,9 +251,6 @@ class AppointmentSchedulingScreen(QWidget):
         # Set the layout
         self.setLayout(layout)
 
-        # Load all patient names for the completer
-        self.all_patients = []  # Store all patients for filtering
-        self.load_patients()
         self.load_appointments()
 
     def search_appointments(self):
@@ -280,6 +288,7 @@ class AppointmentSchedulingScreen(QWidget):
             cursor.execute(query, params)
             rows = cursor.fetchall()
             conn.close()
+            self.export_query = csv_export.ExportQuery(query, params, EXPORT_HEADER)
 
             # Clear & refill table
             self.appointment_table.setRowCount(0)
@@ -302,38 +311,22 @@ class AppointmentSchedulingScreen(QWidget):
             QMessageBox.critical(self, "Error", f"An error occurred while searching:\n{e}")
 
     def reload_patients(self):
-        """Reload the patient list into the completer."""
-        self.load_patients()
+        """Refresh the completer after a patient was added, edited or deleted."""
+        self.filter_patients(self.patient_input.text())
         QMessageBox.information(self, "Patient List Updated", "The patient list has been updated.")
 
-    def load_patients(self):
-        """Load patient names into the completer."""
-        conn = sqlite3.connect('vet_management.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT patient_id, name FROM patients")
-        patients = cursor.fetchall()
-        conn.close()
-
-        self.all_patients = [(str(patient_id), name) for patient_id, name in patients]
-
-        # Populate the completer with patient names
-        patient_names = [f"{name} (ID: {patient_id})" for patient_id, name in self.all_patients]
-        model = QStringListModel(patient_names)  # Convert list to a model
-        self.patient_completer.setModel(model)
-
     def filter_patients(self, text):
-        """Filter patients based on input text."""
-        # Create a filtered list of patients
-        filtered_patients = [
+        """Show the top matches for `text` in the completer."""
+        if "(ID: " in text:
+            return  # a completion was just picked
+        names = [
             f"{name} (ID: {patient_id})"
-            for patient_id, name in self.all_patients
-            if text.lower() in name.lower()
+            for patient_id, name in patient_search.complete_names(text)
         ]
+        if names != self.patient_model.stringList():
+            self.patient_model.setStringList(names)
 
-        # Wrap the filtered list in a QStringListModel
-        model = QStringListModel(filtered_patients)
-        self.patient_completer.setModel(model)
-
+    @timed("appointments.schedule_appointment")
     def schedule_appointment(self):
         """Schedule new appointments for selected dates."""
         try:
@@ -410,6 +403,7 @@ class AppointmentSchedulingScreen(QWidget):
             log_error(f"Error scheduling appointment: {e}")
             QMessageBox.critical(self, "Error", "Failed to schedule appointment.")
 
+    @timed("appointments.edit_appointment")
     def edit_appointment(self):
         """Edit selected appointment data in the database, with conflict detection."""
         if not self.selected_appointment_id:
@@ -631,45 +625,19 @@ class AppointmentSchedulingScreen(QWidget):
         self.reminders_list_updated.emit()
 
     def export_to_csv(self):
-        """Export appointment data to a CSV file."""
-        # Open a file dialog to select save location
+        """Stream the appointments matching the current search or filters straight from the database."""
         default_filename = f"appointments_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
         file_path, _ = QFileDialog.getSaveFileName(self, "Save CSV", default_filename, "CSV Files (*.csv)")
 
         if not file_path:
             return  # User canceled
 
-        # Fetch data from the table
-        row_count = self.appointment_table.rowCount()
-        if row_count == 0:
-            QMessageBox.warning(self, "No Data", "There are no appointments to export.")
-            return
-
-        try:
-            with open(file_path, mode='w', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-
-                # Write headers
-                headers = [self.appointment_table.horizontalHeaderItem(col).text() for col in
-                           range(self.appointment_table.columnCount())]
-                writer.writerow(headers)
-
-                # Write rows
-                for row in range(row_count):
-                    row_data = [self.appointment_table.item(row, col).text() for col in
-                                range(self.appointment_table.columnCount())]
-                    writer.writerow(row_data)
-
-            QMessageBox.information(self, "Export Successful", f"Appointments exported to: {file_path}")
-        except Exception as e:
-            QMessageBox.critical(self, "Export Failed", f"An error occurred: {str(e)}")
+        csv_export_dialog.start_export(self, file_path, self.export_query)
 
     def load_appointments(self):
         """Load all appointments into the table, including duration."""
         try:
-            conn = sqlite3.connect("vet_management.db")
-            cur = conn.cursor()
-            cur.execute("""
+            query = """
                 SELECT 
                     a.appointment_id,
                     p.name,
@@ -682,7 +650,11 @@ class AppointmentSchedulingScreen(QWidget):
                     a.notification_status
                 FROM appointments a
                 JOIN patients p ON a.patient_id = p.patient_id
-            """)
+            """
+            self.export_query = csv_export.ExportQuery(query, (), EXPORT_HEADER)
+            conn = sqlite3.connect("vet_management.db")
+            cur = conn.cursor()
+            cur.execute(query)
             rows = cur.fetchall()
             conn.close()
 
@@ -739,6 +711,7 @@ class AppointmentSchedulingScreen(QWidget):
             cursor.execute(query, params)
             rows = cursor.fetchall()
             conn.close()
+            self.export_query = csv_export.ExportQuery(query, params, EXPORT_HEADER)
 
             # clear out old data
             self.appointment_table.setRowCount(0)
@@ -771,10 +744,11 @@ class AppointmentSchedulingScreen(QWidget):
         conn = sqlite3.connect("vet_management.db")
         cur = conn.cursor()
         cur.execute("""
-            SELECT patient_id, date_time, duration_minutes,
-                   appointment_type, reason, veterinarian, status
-            FROM appointments
-            WHERE appointment_id = ?
+            SELECT a.patient_id, p.name, a.date_time, a.duration_minutes,
+                   a.appointment_type, a.reason, a.veterinarian, a.status
+            FROM appointments a
+            JOIN patients p ON p.patient_id = a.patient_id
+            WHERE a.appointment_id = ?
         """, (appt_id,))
         row = cur.fetchone()
         conn.close()
@@ -783,11 +757,10 @@ class AppointmentSchedulingScreen(QWidget):
             QMessageBox.warning(self, "Error", "Could not load that appointment.")
             return
 
-        patient_id, dt, dur, typ, reason, vet, status = row
+        patient_id, name, dt, dur, typ, reason, vet, status = row
 
         # Populate the form:
         # → Patient line (you already have a completer + formatting):
-        name = next(n for pid, n in self.all_patients if pid == str(patient_id))
         self.patient_input.setText(f"{name} (ID: {patient_id})")
 
         # → Calendar & time
@@ -824,6 +797,7 @@ class AppointmentSchedulingScreen(QWidget):
         # Reset the style after a delay
         QTimer.singleShot(3000, lambda: self.patient_input.setStyleSheet(""))
 
+    @timed("appointments.check_and_send_notifications")
     def check_and_send_notifications(self):
         """Check for appointments 1 day in advance and send email notifications."""
         current_time = datetime.now()
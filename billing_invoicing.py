@@ -2,17 +2,19 @@ import win32print
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QPushButton, QLabel,
     QLineEdit, QComboBox, QFormLayout, QHeaderView, QFileDialog, QMessageBox, QSpinBox, QDialog, QDoubleSpinBox,
-    QDateTimeEdit, QDateEdit
+    QDateTimeEdit, QDateEdit, QCompleter
 )
-from PySide6.QtCore import QDateTime, QTimer, QDate, Signal
+from PySide6.QtCore import QDateTime, QTimer, QDate, Signal, Qt, QStringListModel
 from PySide6 import QtGui
 from PySide6.QtPrintSupport import QPrinter, QPrintDialog, QPrinterInfo
 from PySide6.QtGui import QTextDocument
 import inventory  # your existing inventory.py module
 import tempfile
 import os
+import json
 import sqlite3
-import csv
+import csv_export
+import csv_export_dialog
 from logger import log_error  # Import the log_error function
 from datetime import datetime, timedelta
 from reportlab.lib.pagesizes import A4
@@ -25,6 +27,8 @@ from reportlab.lib.units import mm
 from PySide6.QtCore import QDateTime, QTimer, QDate, Signal, QSizeF, QMarginsF, QUrl
 from PySide6.QtGui import QTextDocument, QPageSize, QPageLayout
 from PySide6.QtPrintSupport import QPrinter, QPrintDialog
+from item_catalogue import AmbiguousItemError, catalogue
+from perf_monitor import timed
 
 class PaymentHistoryDialog(QDialog):
     def __init__(self, invoice_id, parent=None):
@@ -150,8 +154,15 @@ class ItemizedBillingDialog(QDialog):
         layout = QVBoxLayout()
         form_layout = QFormLayout()
 
-        # Service/Product Description
+        # Service/Product Description (autocompletes from inventory)
+        self.inventory_item_id = None
         self.description_input = QLineEdit()
+        self.completer_model = QStringListModel(self)
+        self.completer = QCompleter(self.completer_model, self)
+        self.completer.setCaseSensitivity(Qt.CaseInsensitive)
+        self.description_input.setCompleter(self.completer)
+        self.description_input.textEdited.connect(self.update_completions)
+        self.completer.activated[str].connect(self.on_inventory_item_chosen)
         form_layout.addRow("Description:", self.description_input)
 
         # Quantity
@@ -207,6 +218,24 @@ class ItemizedBillingDialog(QDialog):
         if self.item_id:
             self.load_existing_item()
 
+    def update_completions(self, text):
+        self.inventory_item_id = None
+        self.completer_model.setStringList(
+            [item.name for item in catalogue.search_prefix(text)] if text.strip() else []
+        )
+
+    def on_inventory_item_chosen(self, name):
+        try:
+            item = catalogue.resolve(name)
+        except AmbiguousItemError as e:
+            QMessageBox.warning(self, "Ambiguous Item", f"{e}\nRename one of them in Inventory first.")
+            return
+        if not item:
+            return
+        self.inventory_item_id = item.item_id
+        if item.unit_price:
+            self.unit_price_input.setValue(item.unit_price)
+
     def calculate_total(self):
         """Calculate total price based on quantity and unit price."""
         quantity = self.quantity_input.value()
@@ -224,7 +253,7 @@ class ItemizedBillingDialog(QDialog):
         cursor = conn.cursor()
         cursor.execute('''
             SELECT description, quantity, unit_price, vat_pct, vat_amount, discount_pct, 
-            discount_amount, total_price FROM invoice_items WHERE item_id = ?
+            discount_amount, total_price, inventory_item_id FROM invoice_items WHERE item_id = ?
         ''', (self.item_id,))
         item = cursor.fetchone()
         conn.close()
@@ -237,6 +266,7 @@ class ItemizedBillingDialog(QDialog):
             self.vat_amount_label.setText(f"{item[4]:.2f}")
             self.discount_pct_input.setValue(item[5])
             self.discount_amount_label.setText(f"{item[6]:.2f}")
+            self.inventory_item_id = item[8]
             self.calculate_total()
 
     def save_item(self):
@@ -253,6 +283,17 @@ class ItemizedBillingDialog(QDialog):
         discount_amount = (self.discount_pct_input.value() / 100.0) * (quantity * unit_price)
         total_price = (quantity * unit_price) + vat_amount - discount_amount
 
+        # link the line to its inventory item (typed names resolve too)
+        inventory_item_id = self.inventory_item_id
+        if inventory_item_id is None:
+            try:
+                item = catalogue.resolve(description)
+            except AmbiguousItemError as e:
+                QMessageBox.warning(self, "Ambiguous Item",
+                                    f"{e}\nPick the item from the suggestions or use its exact name.")
+                return
+            inventory_item_id = item.item_id if item else None
+
         try:
             print("Invoice ID when saving item:", self.invoice_id)  # Debug
             conn = sqlite3.connect("vet_management.db")
@@ -261,17 +302,17 @@ class ItemizedBillingDialog(QDialog):
             if self.item_id:
                 cursor.execute('''
                     UPDATE invoice_items SET description = ?, quantity = ?, unit_price = ?, vat_pct = ?, vat_amount = ?, 
-                    discount_pct = ?, discount_amount = ?, total_price = ?
+                    discount_pct = ?, discount_amount = ?, total_price = ?, inventory_item_id = ?
                     WHERE item_id = ?
                 ''', (description, quantity, unit_price, vat_pct, vat_amount, discount_pct, discount_amount,
-                      total_price, self.item_id))
+                      total_price, inventory_item_id, self.item_id))
             else:
                 cursor.execute('''
                     INSERT INTO invoice_items (invoice_id, description, quantity, unit_price, vat_pct, vat_amount, 
-                    discount_pct,  discount_amount, total_price)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    discount_pct,  discount_amount, total_price, inventory_item_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 ''', (self.invoice_id, description, quantity, unit_price, vat_pct, vat_amount,
-                      discount_pct, discount_amount, total_price))
+                      discount_pct, discount_amount, total_price, inventory_item_id))
 
             conn.commit()
             conn.close()
@@ -690,30 +731,44 @@ class BillingInvoicingScreen(QWidget):
             log_error(f"Database Error in load_invoices: {str(e)}")
             QMessageBox.critical(self, "Database Error", f"An unexpected error occurred: {str(e)}")
 
-    def apply_filters(self):
-        """Filter and display invoices based on search text, status, AND date‐range."""
-        search_text = self.search_input.text().lower()
+    def filtered_invoices(self):
+        """
+        Rows of self.invoices passing the search text, status and date-range
+        filters. The table and the CSV export both use this, so they always
+        agree; the search is casefolded in Python, which SQLite's ASCII-only
+        lower() is not.
+        """
+        search_text = self.search_input.text().casefold()
         status_filter = self.status_filter.currentText()
         start_date = self.start_date.date()
         end_date = self.end_date.date()
 
-        filtered_invoices = []
-        total_amount = 0
-        remaining_balance = 0
-        payment_count = 0
-
+        matches = []
         for invoice in self.invoices:
-            invoice_id, appointment_id, patient_name, total_amt, final_amt, status,_, balance, created_at, appointment_date = invoice
+            appointment_id, patient_name, status, created_at = invoice[1], invoice[2], invoice[5], invoice[8]
             created_day = QDate.fromString(created_at.split(" ")[0], "yyyy-MM-dd")
             if created_day < start_date or created_day > end_date:
                 continue
-            if search_text and search_text not in str(appointment_id).lower() and search_text not in patient_name.lower():
+            # the patient name is NULL when the patient record is gone
+            if (search_text and search_text not in str(appointment_id)
+                    and search_text not in (patient_name or "").casefold()):
                 continue
             if status_filter == "Open" and status == "Paid":
                 continue
             if status_filter == "Paid" and status != "Paid":
                 continue
-            filtered_invoices.append(invoice)
+            matches.append(invoice)
+        return matches
+
+    def apply_filters(self):
+        """Filter and display invoices based on search text, status, AND date‐range."""
+        filtered_invoices = self.filtered_invoices()
+        total_amount = 0
+        remaining_balance = 0
+        payment_count = 0
+
+        for invoice in filtered_invoices:
+            final_amt, status, balance = invoice[4], invoice[5], invoice[7]
             total_amount += final_amt
             remaining_balance += balance
             if status != "Unpaid":
@@ -832,17 +887,21 @@ class BillingInvoicingScreen(QWidget):
         conn = sqlite3.connect("vet_management.db")
         cursor = conn.cursor()
         cursor.execute('''
-            SELECT description, quantity, unit_price, vat_amount, discount_amount, total_price FROM invoice_items WHERE invoice_id = ?
+            SELECT description, quantity, unit_price, vat_amount, discount_amount, total_price,
+                   inventory_item_id
+              FROM invoice_items WHERE invoice_id = ?
         ''', (self.selected_invoice_id,))
         items = cursor.fetchall()
         conn.close()
 
         self.item_table.setRowCount(0)
         item_total = 0.0
-        for row_data in items:
+        for *row_data, inventory_item_id in items:
             self.item_table.insertRow(self.item_table.rowCount())
             for col_index, col_data in enumerate(row_data):
                 self.item_table.setItem(self.item_table.rowCount() - 1, col_index, QTableWidgetItem(str(col_data)))
+            # keep the inventory link on the row so finalizing doesn't re-resolve names
+            self.item_table.item(self.item_table.rowCount() - 1, 0).setData(Qt.UserRole, inventory_item_id)
             item_total += float(row_data[3])
 
         self.calculate_totals_from_items()  # More maintainable
@@ -946,6 +1005,7 @@ class BillingInvoicingScreen(QWidget):
             self.date_label.clear()
             self.add_item_button.setEnabled(False)
 
+    @timed("billing.create_invoice")
     def create_invoice(self):
         """Stage 1: Create a draft invoice entry so items can be added, then finalize it."""
         try:
@@ -990,6 +1050,7 @@ class BillingInvoicingScreen(QWidget):
             log_error(f"Error in create_invoice: {str(e)}")
             QMessageBox.critical(self, "Error", "Failed to create draft invoice.")
 
+    @timed("billing.edit_invoice")
     def edit_invoice(self):
         """Edit an existing invoice, update items & auto‐deduct stock once."""
         if not self.selected_invoice_id:
@@ -1001,6 +1062,18 @@ class BillingInvoicingScreen(QWidget):
             QMessageBox.warning(self, "Input Error", "Appointment ID is required.")
             return
 
+        # lines without a stored inventory link, resolved by name before anything is written
+        try:
+            unlinked = catalogue.resolve_many(
+                self.item_table.item(row, 0).text().strip()
+                for row in range(self.item_table.rowCount())
+                if self.item_table.item(row, 0).data(Qt.UserRole) is None
+            )
+        except AmbiguousItemError as e:
+            QMessageBox.warning(self, "Ambiguous Item",
+                                f"{e}\nEdit the line and pick the item from the suggestions.")
+            return
+
         conn = None
         try:
             # 1) Recalculate from the UI
@@ -1042,8 +1115,12 @@ class BillingInvoicingScreen(QWidget):
             )
 
             # 4) Re‐insert each row with VAT/discount fractions
+            deductions = {}
             for row in range(self.item_table.rowCount()):
                 desc            = self.item_table.item(row, 0).text().strip()
+                inventory_item_id = self.item_table.item(row, 0).data(Qt.UserRole)
+                if inventory_item_id is None and unlinked.get(desc):
+                    inventory_item_id = unlinked[desc].item_id
                 qty             = int(self.item_table.item(row, 1).text())
                 unit_price      = float(self.item_table.item(row, 2).text())
                 vat_amount      = float(self.item_table.item(row, 3).text())
@@ -1062,52 +1139,25 @@ class BillingInvoicingScreen(QWidget):
                     INSERT INTO invoice_items
                       (invoice_id, description, quantity, unit_price,
                        vat_pct, vat_amount, discount_pct, discount_amount,
-                       total_price, vat_flag)
-                    VALUES (?,?,?,?,?,?,?,?,?,?)
+                       total_price, vat_flag, inventory_item_id)
+                    VALUES (?,?,?,?,?,?,?,?,?,?,?)
                 """, (
                     self.selected_invoice_id,
                     desc, qty, unit_price,
                     vat_frac, vat_amount,
                     discount_frac, discount_amount,
-                    total_price, flag
+                    total_price, flag, inventory_item_id
                 ))
+                if inventory_item_id is not None:
+                    deductions[inventory_item_id] = deductions.get(inventory_item_id, 0) + qty
 
             # ── AUTO‐STOCK DEDUCTION ─────────────────────────────────────────────
-            reason_prefix = f"Sold/Dispensed via Invoice #{self.selected_invoice_id}"
-            for row in range(self.item_table.rowCount()):
-                desc = self.item_table.item(row, 0).text().strip()
-                qty  = int(self.item_table.item(row, 1).text())
-
-                # lookup item_id
-                cursor.execute("SELECT item_id FROM items WHERE name = ?", (desc,))
-                rec = cursor.fetchone()
-                if not rec:
-                    continue
-                item_id = rec[0]
-
-                full_reason = f"{reason_prefix} — {qty}×{desc}"
-
-                # avoid duplicates by exact match on reason
-                cursor.execute("""
-                    SELECT COUNT(*) FROM stock_movements
-                     WHERE item_id = ?
-                       AND reason   = ?
-                """, (item_id, full_reason))
-                already, = cursor.fetchone()
-                if already:
-                    continue
-
-                ts = datetime.now().isoformat(" ", "seconds")
-                cursor.execute("""
-                    INSERT INTO stock_movements
-                      (item_id, change_qty, reason, timestamp)
-                    VALUES (?,       ?,         ?,      ?)
-                """, (
-                    item_id,
-                    -qty,
-                    full_reason,
-                    ts
-                ))
+            # appends the difference from what the invoice already took, so
+            # re-finalizing an edited invoice only moves the quantity delta
+            inventory.apply_source_deductions(
+                cursor, "invoice", self.selected_invoice_id, deductions,
+                f"Sold/Dispensed via Invoice #{self.selected_invoice_id}"
+            )
 
             # ── COMMIT EVERYTHING ─────────────────────────────────────────────────
             conn.commit()
@@ -1157,6 +1207,7 @@ class BillingInvoicingScreen(QWidget):
 
     # In billing_invoicing.py, inside your BillingInvoicingScreen class:
 
+    @timed("billing.print_invoice")
     def print_invoice(self):
         """Fetch invoice data, then offer Save-PDF or Print (with logo, header, items, VAT‐breakdown, signatures)."""
         # 1) Ensure an invoice is selected
@@ -1514,35 +1565,35 @@ class BillingInvoicingScreen(QWidget):
         conn.close()
 
     def export_to_csv(self):
-        """Export invoice data to a CSV file."""
+        """Stream the invoices matching the current filters straight from the database."""
         file_path, _ = QFileDialog.getSaveFileName(self, "Save CSV", "invoices.csv", "CSV Files (*.csv)")
         if not file_path:
             return
 
-        row_count = self.invoice_table.rowCount()
-        column_count = self.invoice_table.columnCount()
-
-        if row_count == 0:
-            QMessageBox.warning(self, "No Data", "There are no invoices to export.")
-            return
-
-        try:
-            with open(file_path, mode='w', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-                # Write headers
-                headers = [self.invoice_table.horizontalHeaderItem(col).text() for col in range(column_count)]
-                writer.writerow(headers)
-
-                # Write rows
-                for row in range(row_count):
-                    row_data = [self.invoice_table.item(row, col).text() for col in range(column_count)]
-                    writer.writerow(row_data)
-
-            QMessageBox.information(self, "Export Successful", f"Invoices exported to {file_path}.")
-        except Exception as e:
-            QMessageBox.critical(self, "Export Failed", f"An error occurred while exporting: {str(e)}")
-
+        csv_export_dialog.start_export(self, file_path, self.export_query())
 
+    def export_query(self):
+        """
+        The invoices filtered_invoices() selects, re-read from the database
+        with amounts as numbers and dates as stored. The ids go in as one
+        JSON array, so there is no limit on how many rows match.
+        """
+        ids = json.dumps([invoice[0] for invoice in self.filtered_invoices()])
+        return csv_export.ExportQuery('''
+            SELECT i.invoice_id, i.appointment_id, p.name,
+                   i.total_amount, i.final_amount, i.payment_status, i.payment_method,
+                   ROUND(i.final_amount - COALESCE((SELECT SUM(amount_paid) FROM payment_history WHERE invoice_id = i.invoice_id), 0), 2),
+                   i.created_at, a.date_time
+            FROM invoices i
+            JOIN appointments a ON i.appointment_id = a.appointment_id
+            LEFT JOIN patients p ON p.patient_id = a.patient_id
+            WHERE i.invoice_id IN (SELECT value FROM json_each(?))
+            ORDER BY i.invoice_id
+        ''', (ids,), [
+            "Invoice ID", "Appointment ID", "Patient Name", "Total Amount",
+            "Final Amount", "Payment Status", "Payment Method", "Remaining Balance",
+            "Created At", "Appointment Date"
+        ])
 
     def clear_inputs(self):
         """Clear all input fields."""
@@ -0,0 +1,74 @@
+# csv_export.py
+"""
+Streaming CSV export straight from the database, without any Qt.
+
+A screen describes what it is showing as an ExportQuery (SQL, parameters
+and column names). export_csv() re-runs that query on a read-only
+connection and moves rows from cursor.fetchmany() into csv.writer in
+batches of BATCH_SIZE, so memory stays flat however many rows match and
+the export is not limited to what the table widget has loaded.
+
+Values keep their database types: ids and counts are written as
+integers, amounts as numbers and dates as ISO text, with none of the
+display formatting the tables on screen add.
+
+The file is written under a temporary name and renamed when complete,
+so a cancelled or failed export never leaves a partial CSV behind.
+"""
+import csv
+import os
+import sqlite3
+from collections import namedtuple
+
+DB = "vet_management.db"
+BATCH_SIZE = 5000
+
+ExportQuery = namedtuple("ExportQuery", "sql params header")
+
+
+class ExportCancelled(Exception):
+    """Raised by export_csv() when `cancelled()` returns True between batches."""
+
+
+def count_rows(query):
+    conn = sqlite3.connect(f"file:{DB}?mode=ro", uri=True)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM ({query.sql})", query.params).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def export_csv(path, query, progress=None, cancelled=None, batch_size=BATCH_SIZE):
+    """
+    Write the rows of `query` to `path`; returns the number of rows.
+
+    `progress(done, total)` is called after every batch and `cancelled()`
+    is checked before the next one. Both run on the calling thread.
+    """
+    total = count_rows(query) if progress else 0
+    part = path + ".part"
+    done = 0
+    conn = sqlite3.connect(f"file:{DB}?mode=ro", uri=True)
+    try:
+        cur = conn.execute(query.sql, query.params)
+        with open(part, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(query.header)
+            while True:
+                if cancelled and cancelled():
+                    raise ExportCancelled(path)
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                writer.writerows(rows)
+                done += len(rows)
+                if progress:
+                    progress(done, max(total, done))
+        os.replace(part, path)
+    except BaseException:
+        if os.path.exists(part):
+            os.remove(part)
+        raise
+    finally:
+        conn.close()
+    return done
@@ -0,0 +1,73 @@
+# csv_export_dialog.py
+"""
+Runs csv_export.export_csv() on a worker thread behind a progress dialog.
+
+The screens call start_export() with the ExportQuery for what they are
+showing; the GUI stays responsive while the rows stream to disk, the
+dialog counts rows as batches land and Cancel stops between batches.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6.QtWidgets import QMessageBox, QProgressDialog
+from PySide6.QtCore import QObject, Qt, Signal
+
+import csv_export
+from logger import log_error
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="csv-export")
+
+
+class _ExportSignals(QObject):
+    # emitted from the worker thread, delivered on the GUI thread
+    progress = Signal(int, int)          # rows written, total rows
+    finished = Signal(int, str)          # rows written (-1 if cancelled), error ('' on success)
+
+
+def start_export(parent, path, query):
+    """Export `query` (a csv_export.ExportQuery) to `path` in the background."""
+    dialog = QProgressDialog(f"Exporting to {os.path.basename(path)}…", "Cancel", 0, 0, parent)
+    dialog.setWindowTitle("Export CSV")
+    dialog.setWindowModality(Qt.WindowModality.WindowModal)
+    dialog.setMinimumDuration(300)
+    dialog.setAutoClose(False)
+    dialog.setAutoReset(False)
+
+    cancel = threading.Event()
+    dialog.canceled.connect(cancel.set)
+
+    signals = _ExportSignals(dialog)
+
+    def on_progress(done, total):
+        dialog.setMaximum(total)
+        dialog.setValue(done)
+        dialog.setLabelText(f"Exporting to {os.path.basename(path)}… {done:,} of {total:,} rows")
+
+    def on_finished(rows, error):
+        dialog.close()
+        dialog.deleteLater()
+        if rows < 0:
+            return  # cancelled; nothing was written
+        if error:
+            log_error(f"CSV export to {path} failed: {error}")
+            QMessageBox.critical(parent, "Export Failed", f"An error occurred while exporting:\n{error}")
+        elif rows == 0:
+            QMessageBox.information(parent, "Export Complete", f"No rows matched; saved an empty file to {path}")
+        else:
+            QMessageBox.information(parent, "Export Complete", f"{rows:,} rows saved to {path}")
+
+    signals.progress.connect(on_progress)
+    signals.finished.connect(on_finished)
+
+    def run():
+        try:
+            rows = csv_export.export_csv(path, query, signals.progress.emit, cancel.is_set)
+        except csv_export.ExportCancelled:
+            signals.finished.emit(-1, "")
+        except Exception as e:
+            signals.finished.emit(0, str(e))
+        else:
+            signals.finished.emit(rows, "")
+
+    _executor.submit(run)
@@ -1,11 +1,15 @@
 # error_log_viewer.py
 from PySide6.QtWidgets import (
     QDialog, QVBoxLayout, QTableWidget, QTableWidgetItem, QPushButton,
-    QDateEdit, QHeaderView, QHBoxLayout, QMessageBox, QFileDialog
+    QDateEdit, QHeaderView, QHBoxLayout, QMessageBox, QFileDialog, QLabel
 )
 from PySide6.QtCore import QDate
 import sqlite3
 import csv
+from logger import ensure_error_tables
+
+PAGE_SIZE = 100
+EXPORT_BATCH = 1000
 
 class ErrorLogViewer(QDialog):
     def __init__(self):
@@ -30,18 +34,32 @@ class ErrorLogViewer(QDialog):
         filter_layout.addWidget(self.end_date_filter)
 
         self.search_button = QPushButton("Filter Logs")
-        self.search_button.clicked.connect(self.load_logs)
+        self.search_button.clicked.connect(lambda: self.load_logs(page=0))
         filter_layout.addWidget(self.search_button)
 
         layout.addLayout(filter_layout)
 
-        # Error Log Table — 2 columns to match DB schema
+        # Error Log Table — one row per distinct error (fingerprint)
         self.log_table = QTableWidget()
-        self.log_table.setColumnCount(2)
-        self.log_table.setHorizontalHeaderLabels(["Timestamp", "Error Message"])
-        self.log_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.log_table.setColumnCount(4)
+        self.log_table.setHorizontalHeaderLabels(["Last Seen", "First Seen", "Count", "Error Message"])
+        self.log_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.log_table.horizontalHeader().setStretchLastSection(True)
         layout.addWidget(self.log_table)
 
+        # Paging
+        self.page = 0
+        page_layout = QHBoxLayout()
+        self.prev_button = QPushButton("◀ Previous")
+        self.prev_button.clicked.connect(lambda: self.load_logs(page=self.page - 1))
+        self.next_button = QPushButton("Next ▶")
+        self.next_button.clicked.connect(lambda: self.load_logs(page=self.page + 1))
+        self.page_label = QLabel()
+        page_layout.addWidget(self.prev_button)
+        page_layout.addWidget(self.page_label)
+        page_layout.addWidget(self.next_button)
+        layout.addLayout(page_layout)
+
         # Export
         self.export_button = QPushButton("Export to CSV")
         self.export_button.clicked.connect(self.export_logs_to_csv)
@@ -52,36 +70,48 @@ class ErrorLogViewer(QDialog):
         # Initial load
         self.load_logs()
 
-    def load_logs(self):
-        """Load logs from the database with date filtering (inclusive)."""
+    def load_logs(self, page=0):
+        """Load one page of aggregated errors seen within the date range (inclusive)."""
         self.log_table.setRowCount(0)
+        self.page = max(page, 0)
 
         start_date = self.start_date_filter.date().toString("yyyy-MM-dd")
-        end_date   = self.end_date_filter.date().toString("yyyy-MM-dd")
+        end_date   = self.end_date_filter.date().addDays(1).toString("yyyy-MM-dd")
 
         try:
             conn = sqlite3.connect("vet_management.db")
+            ensure_error_tables(conn)
+            conn.commit()
             cursor = conn.cursor()
 
+            # last_seen range uses ix_error_groups_last_seen; groups that
+            # started after the range are dropped by the first_seen check
             cursor.execute("""
-                SELECT timestamp, error_message
-                  FROM error_logs
-                 WHERE DATE(timestamp) BETWEEN DATE(?) AND DATE(?)
-                 ORDER BY timestamp DESC
-            """, (start_date, end_date))
+                SELECT last_seen, first_seen, count, COALESCE(sample_message, message)
+                  FROM error_groups
+                 WHERE last_seen >= ?
+                   AND first_seen < ?
+                 ORDER BY last_seen DESC
+                 LIMIT ? OFFSET ?
+            """, (start_date, end_date, PAGE_SIZE + 1, self.page * PAGE_SIZE))
             logs = cursor.fetchall()
             conn.close()
 
-            for row_index, (ts, msg) in enumerate(logs):
+            has_next = len(logs) > PAGE_SIZE
+            for row_index, row in enumerate(logs[:PAGE_SIZE]):
                 self.log_table.insertRow(row_index)
-                self.log_table.setItem(row_index, 0, QTableWidgetItem(str(ts)))
-                self.log_table.setItem(row_index, 1, QTableWidgetItem(str(msg)))
+                for col, value in enumerate(row):
+                    self.log_table.setItem(row_index, col, QTableWidgetItem(str(value)))
+
+            self.prev_button.setEnabled(self.page > 0)
+            self.next_button.setEnabled(has_next)
+            self.page_label.setText(f"Page {self.page + 1}")
 
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Could not load logs: {str(e)}")
 
     def export_logs_to_csv(self):
-        """Export logs to a CSV file (2 columns)."""
+        """Export raw log occurrences to a CSV file."""
         file_path, _ = QFileDialog.getSaveFileName(self, "Save Logs", "error_logs.csv", "CSV Files (*.csv)")
         if not file_path:
             return
@@ -90,17 +120,21 @@ class ErrorLogViewer(QDialog):
             conn = sqlite3.connect("vet_management.db")
             cursor = conn.cursor()
             cursor.execute("""
-                SELECT timestamp, error_message
+                SELECT timestamp, error_message, fingerprint
                   FROM error_logs
-                 ORDER BY timestamp DESC
+                 ORDER BY id DESC
             """)
-            logs = cursor.fetchall()
-            conn.close()
 
+            # stream in batches so memory stays flat however long the history is
             with open(file_path, mode='w', newline='', encoding='utf-8') as f:
                 w = csv.writer(f)
-                w.writerow(["Timestamp", "Error Message"])
-                w.writerows(logs)
+                w.writerow(["Timestamp", "Error Message", "Fingerprint"])
+                while True:
+                    batch = cursor.fetchmany(EXPORT_BATCH)
+                    if not batch:
+                        break
+                    w.writerows(batch)
+            conn.close()
 
             QMessageBox.information(self, "Export Successful", f"Logs saved to {file_path}")
 
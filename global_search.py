@@ -0,0 +1,169 @@
+# global_search.py
+"""
+One search index for the omnibox in the main window.
+
+global_search is an FTS5 table holding a short title/body for every
+patient, appointment, invoice, prescription, consent form and medical
+record. Each entity's rowid is ref_id * 8 + its kind code, so the
+triggers below update or remove an entry by rowid as rows change; the
+index is filled once and never rebuilt.
+
+Hits carry the patient id but not the patient's name; names are joined in
+at query time so renaming a patient touches a single entry.
+"""
+import sqlite3
+import time
+from collections import namedtuple
+
+from patient_search import prefix_query
+
+DB = "vet_management.db"
+RESULT_LIMIT = 20
+RANK_CANDIDATES = 500
+BUDGET_MS = 50              # ranked query is abandoned after this long
+
+Hit = namedtuple("Hit", "kind ref_id patient_id patient_name title detail date")
+
+# kind, code, table, id column, patient id, date, title, body; {r} is new/old
+_SOURCES = [
+    ("patient", 1, "patients", "patient_id",
+     "{r}.patient_id", "NULL",
+     "{r}.name",
+     "{r}.species || ' ' || COALESCE({r}.breed, '') || ' ' || {r}.owner_name || ' ' || "
+     "COALESCE({r}.owner_contact, '') || ' ' || COALESCE({r}.owner_email, '')"),
+    ("appointment", 2, "appointments", "appointment_id",
+     "{r}.patient_id", "{r}.date_time",
+     "{r}.reason",
+     "'appointment ' || {r}.appointment_id || ' ' || COALESCE({r}.appointment_type, '') || ' ' || "
+     "{r}.veterinarian || ' ' || {r}.status"),
+    ("invoice", 3, "invoices", "invoice_id",
+     "COALESCE({r}.patient_id, (SELECT patient_id FROM appointments "
+     "WHERE appointment_id = {r}.appointment_id))", "{r}.created_at",
+     "'Invoice ' || {r}.invoice_id",
+     "COALESCE({r}.payment_status, '') || ' ' || COALESCE({r}.payment_method, '') || ' ' || "
+     "printf('%.2f', {r}.final_amount)"),
+    ("prescription", 4, "prescriptions", "prescription_id",
+     "{r}.patient_id", "{r}.date_issued",
+     "{r}.medication",
+     "{r}.dosage || ' ' || COALESCE({r}.instructions, '') || ' ' || COALESCE({r}.status, '')"),
+    ("consent", 5, "consent_forms", "consent_id",
+     "{r}.patient_id", "{r}.created_at",
+     "{r}.form_type",
+     "COALESCE({r}.signed_by, '') || ' ' || {r}.status"),
+    ("record", 6, "medical_records", "record_id",
+     "{r}.patient_id", "{r}.date_created",
+     "COALESCE(NULLIF({r}.chief_complaint, ''), 'Medical record')",
+     "COALESCE({r}.diagnosis, '') || ' ' || COALESCE({r}.vet_name, '') || ' ' || "
+     "COALESCE({r}.assessment, '')"),
+]
+
+def _entry(r, kind, code, table, id_col, patient, date, title, body):
+    """SELECT list producing one global_search row from row alias `r`."""
+    return (f"{r}.{id_col} * 8 + {code}, '{kind}', {r}.{id_col}, "
+            f"{patient.format(r=r)}, {date.format(r=r)}, "
+            f"{title.format(r=r)}, {body.format(r=r)}")
+
+def _triggers(source):
+    code, table, id_col = source[1:4]
+    cols = "rowid, kind, ref_id, patient_id, date, title, body"
+    return f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_global_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO global_search ({cols})
+            SELECT {_entry('new', *source)};
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_global_au AFTER UPDATE ON {table} BEGIN
+            DELETE FROM global_search WHERE rowid = old.{id_col} * 8 + {code};
+            INSERT INTO global_search ({cols})
+            SELECT {_entry('new', *source)};
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_global_ad AFTER DELETE ON {table} BEGIN
+            DELETE FROM global_search WHERE rowid = old.{id_col} * 8 + {code};
+        END;
+    """
+
+# ── Schema ───────────────────────────────────────────────────────────────
+def ensure_global_index():
+    conn = sqlite3.connect(DB)
+    cur = conn.cursor()
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    tables = {r[0] for r in cur.fetchall()}
+    fresh = "global_search" not in tables
+    cur.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS global_search USING fts5(
+            kind UNINDEXED, ref_id UNINDEXED, patient_id UNINDEXED, date UNINDEXED,
+            title, body,
+            tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+        )
+    """)
+    for source in _SOURCES:
+        table = source[2]
+        if table not in tables:
+            continue  # init_db.py has not created it yet
+        cur.executescript(_triggers(source))
+        if fresh:
+            cur.execute(f"""
+                INSERT INTO global_search (rowid, kind, ref_id, patient_id, date, title, body)
+                SELECT {_entry('t', *source)} FROM {table} t
+            """)
+    conn.commit()
+    conn.close()
+
+# ── Search ───────────────────────────────────────────────────────────────
+_RANKED = f"""
+    SELECT kind, ref_id, patient_id, title, body, date FROM (
+        SELECT kind, ref_id, patient_id, title, body, date,
+               bm25(global_search, 0, 0, 0, 0, 4.0, 1.0) AS score
+          FROM global_search
+         WHERE global_search MATCH ?
+         LIMIT {RANK_CANDIDATES}
+    )
+     ORDER BY score
+     LIMIT ?
+"""
+# newest entries first; used when the ranked query runs over budget
+_RECENT = """
+    SELECT kind, ref_id, patient_id, title, body, date
+      FROM global_search
+     WHERE global_search MATCH ?
+     ORDER BY rowid DESC
+     LIMIT ?
+"""
+
+def search(text, limit=RESULT_LIMIT, budget_ms=BUDGET_MS):
+    """
+    Up to `limit` Hits for `text`, best first. If ranking does not finish
+    within `budget_ms`, the newest matches are returned unranked instead.
+    """
+    query = prefix_query(text)
+    if not query:
+        return []
+    conn = sqlite3.connect(DB)
+    deadline = time.perf_counter() + budget_ms / 1000
+    conn.set_progress_handler(lambda: time.perf_counter() > deadline, 1000)
+    cur = conn.cursor()
+    try:
+        try:
+            cur.execute(_RANKED, (query, limit))
+            rows = cur.fetchall()
+        except sqlite3.OperationalError as e:
+            if "interrupted" not in str(e):
+                raise
+            conn.set_progress_handler(None, 0)
+            cur.execute(_RECENT, (query, limit))
+            rows = cur.fetchall()
+        conn.set_progress_handler(None, 0)
+
+        pids = {r[2] for r in rows if r[2] is not None}
+        names = {}
+        if pids:
+            cur.execute(
+                f"SELECT patient_id, name FROM patients WHERE patient_id IN ({','.join('?' * len(pids))})",
+                list(pids)
+            )
+            names = dict(cur.fetchall())
+    finally:
+        conn.close()
+    return [
+        Hit(kind, ref_id, pid, names.get(pid, ""), title, " ".join(body.split())[:80], date or "")
+        for kind, ref_id, pid, title, body, date in rows
+    ]
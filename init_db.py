@@ -5,6 +5,10 @@ from hashlib import sha256
 conn = sqlite3.connect('vet_management.db')
 cursor = conn.cursor()
 
+# Lets log_retention hand freed pages back without a full VACUUM; this only
+# takes effect on a new database (see log_retention.enable_incremental_vacuum)
+cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+
 # --- Roles Table ---
 cursor.execute('''
 CREATE TABLE IF NOT EXISTS roles (
@@ -39,6 +43,9 @@ CREATE TABLE IF NOT EXISTS patients (
 )
 ''')
 
+# case-insensitive name index → prefix range scans for the booking completer
+cursor.execute("CREATE INDEX IF NOT EXISTS ix_patients_name_nocase ON patients (name COLLATE NOCASE)")
+
 # --- Appointments Table ---
 cursor.execute('''
 CREATE TABLE IF NOT EXISTS appointments (
@@ -127,7 +134,8 @@ for col, definition in [
     ("vat_amount",     "REAL NOT NULL DEFAULT 0"),
     ("vat_flag",       "TEXT NOT NULL DEFAULT ''"),
     ("discount_pct",   "REAL NOT NULL DEFAULT 0"),
-    ("discount_amount","REAL NOT NULL DEFAULT 0")
+    ("discount_amount","REAL NOT NULL DEFAULT 0"),
+    ("inventory_item_id", "INTEGER REFERENCES items(item_id)")
 ]:
     try:
         cursor.execute(f"""
@@ -160,6 +168,24 @@ CREATE TABLE IF NOT EXISTS stock_movements (
 )
 """)
 
+cursor.execute("CREATE INDEX IF NOT EXISTS ix_items_name ON items (name)")
+
+# ── Add source_type / source_id if missing ───────────────────────────
+for col, definition in [("source_type", "TEXT"), ("source_id", "INTEGER")]:
+    try:
+        cursor.execute(f"ALTER TABLE stock_movements ADD COLUMN {col} {definition}")
+    except sqlite3.OperationalError:
+        # column already exists
+        pass
+
+# movements a source document has made → deductions append the delta
+cursor.execute("DROP INDEX IF EXISTS ux_stock_movements_source")
+cursor.execute("""
+CREATE INDEX IF NOT EXISTS ix_stock_movements_source
+    ON stock_movements (source_type, source_id)
+ WHERE source_type IS NOT NULL
+""")
+
 # ── PRESCRIPTIONS ───────────────────────────────────────────────────
 cursor.execute("""
 CREATE TABLE IF NOT EXISTS prescriptions (
@@ -189,6 +215,10 @@ CREATE TABLE IF NOT EXISTS prescription_history (
     changes_json     TEXT
 )
 """)
+cursor.execute("""
+CREATE INDEX IF NOT EXISTS ix_prescription_history_rx_ts
+    ON prescription_history (prescription_id, timestamp)
+""")
 
 # --- Medical Records (SOAP) ---
 cursor.execute("""
@@ -274,6 +304,17 @@ CREATE TABLE IF NOT EXISTS consent_forms (
 )
 """)
 
+# --- Vet Roster (shifts for the utilization report; no rows → Mon–Fri 09–17) ---
+cursor.execute("""
+CREATE TABLE IF NOT EXISTS vet_roster (
+    veterinarian  TEXT    NOT NULL,
+    weekday       INTEGER NOT NULL CHECK (weekday BETWEEN 0 AND 6),  -- 0 = Sunday
+    start_time    TEXT    NOT NULL,                                  -- 'HH:MM'
+    end_time      TEXT    NOT NULL,
+    PRIMARY KEY (veterinarian, weekday)
+)
+""")
+
 # Optional starter templates
 cursor.execute("INSERT OR IGNORE INTO consent_templates (name, body_text) VALUES (?, ?)",
                ("General Treatment Consent",
@@ -1,9 +1,230 @@
 # inventory.py
+import re
 import sqlite3
 from datetime import datetime
 
 DB = "vet_management.db"
 
+# ── Ensure the source-tracking columns exist ─────────────────────────────
+# source type → reason text the old reason-matching scheme wrote (with a
+# " — qty×name" suffix) before movements carried source_type/source_id
+_LEGACY_REASONS = {
+    "invoice":      "Sold/Dispensed via Invoice #{}",
+    "prescription": "Dispensed Rx #{}",
+}
+
+def ensure_source_columns():
+    """
+    Ledger rows written on behalf of another document (an invoice, a
+    prescription) carry source_type/source_id, so the stock a document
+    has taken can be summed without matching on the free-text reason.
+    """
+    conn = sqlite3.connect(DB)
+    cur = conn.cursor()
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='stock_movements'")
+    if not cur.fetchone():
+        conn.close()
+        return
+    for col, definition in [("source_type", "TEXT"), ("source_id", "INTEGER")]:
+        try:
+            cur.execute(f"ALTER TABLE stock_movements ADD COLUMN {col} {definition}")
+        except sqlite3.OperationalError:
+            pass  # already added
+    # the ledger is append-only: a source may have several rows per item
+    cur.execute("DROP INDEX IF EXISTS ux_stock_movements_source")
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS ix_stock_movements_source
+            ON stock_movements (source_type, source_id)
+         WHERE source_type IS NOT NULL
+    """)
+    _backfill_sources(cur)
+    conn.commit()
+    conn.close()
+
+def _backfill_sources(cur):
+    """Tag untagged legacy invoice/Rx deductions by parsing their reason text."""
+    patterns = [
+        (source_type, re.compile("^" + re.escape(fmt).replace(r"\{\}", r"(\d+)") + r"(?:\D|$)"))
+        for source_type, fmt in _LEGACY_REASONS.items()
+    ]
+    cur.execute(
+        "SELECT movement_id, reason FROM stock_movements WHERE source_type IS NULL AND ("
+        + " OR ".join("reason LIKE ?" for _ in _LEGACY_REASONS) + ")",
+        [fmt.format("") + "%" for fmt in _LEGACY_REASONS.values()]
+    )
+    tags = []
+    for movement_id, reason in cur.fetchall():
+        for source_type, pattern in patterns:
+            m = pattern.match(reason)
+            if m:
+                tags.append((source_type, int(m.group(1)), movement_id))
+                break
+    # every legacy row counts, duplicates included: they all moved stock
+    cur.executemany(
+        "UPDATE stock_movements SET source_type = ?, source_id = ? WHERE movement_id = ?", tags
+    )
+
+# ── Materialized on-hand stock + monthly snapshots ───────────────────────
+_STOCK_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS trg_items_stock_ai
+AFTER INSERT ON items BEGIN
+    INSERT OR IGNORE INTO item_stock (item_id, on_hand) VALUES (NEW.item_id, 0);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_items_stock_ad
+AFTER DELETE ON items BEGIN
+    DELETE FROM item_stock WHERE item_id = OLD.item_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stock_movements_ai
+AFTER INSERT ON stock_movements BEGIN
+    INSERT INTO item_stock (item_id, on_hand) VALUES (NEW.item_id, NEW.change_qty)
+    ON CONFLICT (item_id) DO UPDATE SET on_hand = on_hand + excluded.on_hand;
+    -- back-dated movements also count towards later snapshots
+    UPDATE stock_snapshots SET on_hand = on_hand + NEW.change_qty
+     WHERE item_id = NEW.item_id AND snapshot_date > NEW.timestamp;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stock_movements_au
+AFTER UPDATE OF item_id, change_qty, timestamp ON stock_movements BEGIN
+    UPDATE item_stock SET on_hand = on_hand - OLD.change_qty WHERE item_id = OLD.item_id;
+    INSERT INTO item_stock (item_id, on_hand) VALUES (NEW.item_id, NEW.change_qty)
+    ON CONFLICT (item_id) DO UPDATE SET on_hand = on_hand + excluded.on_hand;
+    UPDATE stock_snapshots SET on_hand = on_hand - OLD.change_qty
+     WHERE item_id = OLD.item_id AND snapshot_date > OLD.timestamp;
+    UPDATE stock_snapshots SET on_hand = on_hand + NEW.change_qty
+     WHERE item_id = NEW.item_id AND snapshot_date > NEW.timestamp;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stock_movements_ad
+AFTER DELETE ON stock_movements BEGIN
+    UPDATE item_stock SET on_hand = on_hand - OLD.change_qty WHERE item_id = OLD.item_id;
+    UPDATE stock_snapshots SET on_hand = on_hand - OLD.change_qty
+     WHERE item_id = OLD.item_id AND snapshot_date > OLD.timestamp;
+END;
+"""
+
+def ensure_stock_tables():
+    """
+    item_stock holds the current on-hand per item and is kept in step
+    with stock_movements by triggers, so screens never SUM the ledger.
+    stock_snapshots holds on-hand as of the first of each month, so
+    historical levels only need the movements since the nearest snapshot;
+    this month's snapshot is recorded here if it is missing.
+    """
+    conn = sqlite3.connect(DB)
+    cur = conn.cursor()
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='stock_movements'")
+    if not cur.fetchone():
+        conn.close()
+        return
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='item_stock'")
+    fresh = cur.fetchone() is None
+    cur.executescript("""
+    BEGIN;
+    CREATE TABLE IF NOT EXISTS item_stock (
+      item_id  INTEGER PRIMARY KEY REFERENCES items(item_id) ON DELETE CASCADE,
+      on_hand  INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS stock_snapshots (
+      item_id        INTEGER NOT NULL REFERENCES items(item_id) ON DELETE CASCADE,
+      snapshot_date  TEXT    NOT NULL,   -- 'YYYY-MM-01'; covers movements before it
+      on_hand        INTEGER NOT NULL,
+      PRIMARY KEY (item_id, snapshot_date)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS ix_stock_movements_item_ts
+        ON stock_movements (item_id, timestamp);
+    """ + _STOCK_TRIGGERS + ("""
+    INSERT OR REPLACE INTO item_stock (item_id, on_hand)
+    SELECT i.item_id, IFNULL(SUM(sm.change_qty), 0)
+      FROM items i
+      LEFT JOIN stock_movements sm ON sm.item_id = i.item_id
+     GROUP BY i.item_id;
+    """ if fresh else "") + """
+    COMMIT;
+    """)
+    _take_snapshot(cur, datetime.now().strftime("%Y-%m-01"))
+    conn.commit()
+    conn.close()
+
+def _take_snapshot(cur, snapshot_date):
+    """Record on-hand as of `snapshot_date` (current level minus the short tail since)."""
+    cur.execute("""
+        INSERT OR IGNORE INTO stock_snapshots (item_id, snapshot_date, on_hand)
+        SELECT s.item_id, ?,
+               s.on_hand - IFNULL((SELECT SUM(sm.change_qty)
+                                     FROM stock_movements sm
+                                    WHERE sm.item_id = s.item_id
+                                      AND sm.timestamp >= ?), 0)
+          FROM item_stock s
+    """, (snapshot_date, snapshot_date))
+
+# ── Low-stock alert queue ────────────────────────────────────────────────
+_ALERT_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS trg_item_stock_low
+AFTER UPDATE OF on_hand ON item_stock
+WHEN NEW.on_hand <= (SELECT reorder_threshold FROM items WHERE item_id = NEW.item_id)
+ AND OLD.on_hand >  (SELECT reorder_threshold FROM items WHERE item_id = NEW.item_id)
+BEGIN
+    INSERT INTO stock_alerts (item_id, on_hand, reorder_threshold)
+    SELECT NEW.item_id, NEW.on_hand, reorder_threshold FROM items WHERE item_id = NEW.item_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_item_stock_restocked
+AFTER UPDATE OF on_hand ON item_stock
+WHEN NEW.on_hand > (SELECT reorder_threshold FROM items WHERE item_id = NEW.item_id)
+BEGIN
+    UPDATE stock_alerts SET status = 'Resolved'
+     WHERE item_id = NEW.item_id AND status = 'Pending';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_items_threshold_raised
+AFTER UPDATE OF reorder_threshold ON items
+WHEN (SELECT on_hand FROM item_stock WHERE item_id = NEW.item_id) <= NEW.reorder_threshold
+ AND (SELECT on_hand FROM item_stock WHERE item_id = NEW.item_id) >  OLD.reorder_threshold
+BEGIN
+    INSERT INTO stock_alerts (item_id, on_hand, reorder_threshold)
+    SELECT NEW.item_id, on_hand, NEW.reorder_threshold FROM item_stock WHERE item_id = NEW.item_id;
+END;
+"""
+
+def ensure_alert_tables():
+    """
+    Threshold crossings are detected at write time by triggers on
+    item_stock/items and queued in stock_alerts, so nothing has to rescan
+    every item after each adjustment.
+    """
+    conn = sqlite3.connect(DB)
+    cur = conn.cursor()
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='item_stock'")
+    if not cur.fetchone():
+        conn.close()
+        return
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='stock_alerts'")
+    fresh = cur.fetchone() is None
+    cur.executescript("""
+    BEGIN;
+    CREATE TABLE IF NOT EXISTS stock_alerts (
+      alert_id           INTEGER PRIMARY KEY AUTOINCREMENT,
+      item_id            INTEGER NOT NULL REFERENCES items(item_id) ON DELETE CASCADE,
+      on_hand            INTEGER NOT NULL,
+      reorder_threshold  INTEGER NOT NULL,
+      created_at         TEXT    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+      status             TEXT    NOT NULL DEFAULT 'Pending',   -- Pending | Acknowledged | Resolved
+      emailed_at         TEXT
+    );
+    CREATE INDEX IF NOT EXISTS ix_stock_alerts_pending
+        ON stock_alerts (item_id) WHERE status = 'Pending';
+    """ + _ALERT_TRIGGERS + ("""
+    INSERT INTO stock_alerts (item_id, on_hand, reorder_threshold)
+    SELECT i.item_id, s.on_hand, i.reorder_threshold
+      FROM items i JOIN item_stock s ON s.item_id = i.item_id
+     WHERE s.on_hand <= i.reorder_threshold;
+    """ if fresh else "") + """
+    COMMIT;
+    """)
+    conn.close()
+
 def get_all_items():
     conn = sqlite3.connect(DB)
     cur = conn.cursor()
@@ -11,11 +232,10 @@ def get_all_items():
           SELECT
       i.item_id, i.name, i.description,
       i.unit_cost, i.unit_price,
-      IFNULL(SUM(sm.change_qty),0) AS on_hand,
+      IFNULL(s.on_hand,0) AS on_hand,
       i.reorder_threshold
         FROM items i
-        LEFT JOIN stock_movements sm ON i.item_id=sm.item_id
-        GROUP BY i.item_id
+        LEFT JOIN item_stock s ON i.item_id=s.item_id
     """)
     rows = cur.fetchall()
     conn.close()
@@ -28,17 +248,104 @@ def items_below_reorder():
         SELECT
       i.item_id, i.name, i.description,
       i.unit_cost, i.unit_price,
-      IFNULL(SUM(sm.change_qty),0) AS on_hand,
+      IFNULL(s.on_hand,0) AS on_hand,
       i.reorder_threshold
         FROM items i
-        LEFT JOIN stock_movements sm ON i.item_id=sm.item_id
-        GROUP BY i.item_id
-        HAVING on_hand <= i.reorder_threshold
+        LEFT JOIN item_stock s ON i.item_id=s.item_id
+        WHERE IFNULL(s.on_hand,0) <= i.reorder_threshold
     """)
     rows = cur.fetchall()
     conn.close()
     return rows
 
+def pending_alerts():
+    """Queued low-stock alerts: (alert_id, item_id, name, on_hand, threshold, created_at)."""
+    conn = sqlite3.connect(DB)
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT a.alert_id, a.item_id, i.name, a.on_hand, a.reorder_threshold, a.created_at
+          FROM stock_alerts a
+          JOIN items i ON i.item_id = a.item_id
+         WHERE a.status = 'Pending'
+         ORDER BY a.alert_id
+    """)
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+def pending_alert_count():
+    conn = sqlite3.connect(DB)
+    cur = conn.cursor()
+    cur.execute("SELECT COUNT(*) FROM stock_alerts WHERE status = 'Pending'")
+    count, = cur.fetchone()
+    conn.close()
+    return count
+
+def acknowledge_alerts(alert_ids):
+    conn = sqlite3.connect(DB)
+    cur = conn.cursor()
+    cur.executemany(
+        "UPDATE stock_alerts SET status = 'Acknowledged' WHERE alert_id = ? AND status = 'Pending'",
+        [(a,) for a in alert_ids]
+    )
+    conn.commit()
+    conn.close()
+
+def on_hand_at(item_id, when):
+    """
+    On-hand for `item_id` just before `when` ('YYYY-MM-DD[ HH:MM:SS]'):
+    the nearest monthly snapshot plus the movements after it.
+    """
+    conn = sqlite3.connect(DB)
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT snapshot_date, on_hand FROM stock_snapshots
+         WHERE item_id = ? AND snapshot_date <= ?
+         ORDER BY snapshot_date DESC LIMIT 1
+    """, (item_id, when))
+    snap = cur.fetchone()
+    since, base = snap if snap else ("", 0)
+    cur.execute("""
+        SELECT IFNULL(SUM(change_qty),0) FROM stock_movements
+         WHERE item_id = ? AND timestamp >= ? AND timestamp < ?
+    """, (item_id, since, when))
+    delta, = cur.fetchone()
+    conn.close()
+    return base + delta
+
+# ── Item change events ───────────────────────────────────────────────────
+_item_listeners = []
+
+def on_items_changed(callback):
+    """Register `callback()` to run after items are created, updated or deleted."""
+    _item_listeners.append(callback)
+
+def _notify_items_changed():
+    for callback in list(_item_listeners):
+        callback()
+
+def ensure_item_indexes():
+    conn = sqlite3.connect(DB)
+    cur = conn.cursor()
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='items'")
+    if cur.fetchone():
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_items_name ON items (name)")
+        conn.commit()
+    conn.close()
+
+def ensure_invoice_link_column():
+    """Invoice lines picked from the catalogue record which item they took stock from."""
+    conn = sqlite3.connect(DB)
+    cur = conn.cursor()
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='invoice_items'")
+    if cur.fetchone():
+        try:
+            cur.execute("ALTER TABLE invoice_items ADD COLUMN inventory_item_id INTEGER REFERENCES items(item_id)")
+        except sqlite3.OperationalError:
+            pass  # already added
+        conn.commit()
+    conn.close()
+
 def create_item(name, description, cost, price, threshold):
     conn = sqlite3.connect(DB)
     cur = conn.cursor()
@@ -49,6 +356,7 @@ def create_item(name, description, cost, price, threshold):
     """, (name, description, cost, price, threshold))
     conn.commit()
     conn.close()
+    _notify_items_changed()
 
 def update_item(item_id, **fields):
     cols, vals = zip(*fields.items())
@@ -58,6 +366,7 @@ def update_item(item_id, **fields):
     cur.execute(f"UPDATE items SET {set_clause} WHERE item_id=?", (*vals, item_id))
     conn.commit()
     conn.close()
+    _notify_items_changed()
 
 def delete_item(item_id):
     conn = sqlite3.connect(DB)
@@ -65,6 +374,7 @@ def delete_item(item_id):
     cur.execute("DELETE FROM items WHERE item_id=?", (item_id,))
     conn.commit()
     conn.close()
+    _notify_items_changed()
 
 def adjust_stock(item_id, change_qty, reason=None):
     ts = datetime.now().isoformat(" ", "seconds")
@@ -77,3 +387,45 @@ def adjust_stock(item_id, change_qty, reason=None):
     """, (item_id, change_qty, reason, ts))
     conn.commit()
     conn.close()
+
+def apply_source_deductions(cur, source_type, source_id, quantities, reason):
+    """
+    Bring the stock deducted for one source document in line with
+    `quantities` ({item_id: qty taken out of stock}).
+
+    Runs on the caller's cursor so it commits (or rolls back) together
+    with the document itself. The ledger is append-only: for each item a
+    movement is added for the difference between `quantities` and what
+    the source's movements already sum to, so re-applying an edited
+    document only moves the delta, items no longer on it are put back
+    and a retry adds nothing.
+    """
+    # rows an older version wrote for this document by reason text count as applied
+    legacy = _LEGACY_REASONS.get(source_type)
+    if legacy:
+        prefix = legacy.format(source_id)
+        cur.execute("""
+          UPDATE stock_movements
+             SET source_type = ?, source_id = ?
+           WHERE source_type IS NULL
+             AND (reason = ? OR substr(reason, 1, ?) = ?)
+        """, (source_type, source_id, prefix, len(prefix) + 1, prefix + " "))
+
+    cur.execute("""
+      SELECT item_id, SUM(change_qty) FROM stock_movements
+       WHERE source_type = ? AND source_id = ?
+       GROUP BY item_id
+    """, (source_type, source_id))
+    applied = dict(cur.fetchall())
+
+    ts = datetime.now().isoformat(" ", "seconds")
+    deltas = []
+    for item_id in sorted(set(quantities) | set(applied)):
+        delta = -quantities.get(item_id, 0) - applied.get(item_id, 0)
+        if delta:
+            deltas.append((item_id, delta, reason, ts, source_type, source_id))
+    cur.executemany("""
+      INSERT INTO stock_movements
+        (item_id, change_qty, reason, timestamp, source_type, source_id)
+      VALUES (?,?,?,?,?,?)
+    """, deltas)
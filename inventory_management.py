@@ -6,12 +6,16 @@ from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QFormLayout,
     QTableWidget, QTableWidgetItem, QLineEdit, QPlainTextEdit,
     QDoubleSpinBox, QSpinBox, QPushButton, QMessageBox,
-    QFileDialog, QInputDialog
+    QFileDialog, QInputDialog, QLabel
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, Signal
 import inventory  # your existing inventory.py
+import reorder_forecast
+import stock_take
 
 class InventoryManagementScreen(QWidget):
+    alerts_changed = Signal(int)   # pending low-stock alert count
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Inventory Management")
@@ -19,6 +23,18 @@ class InventoryManagementScreen(QWidget):
 
         main = QVBoxLayout(self)
 
+        # ── Low-stock banner (non-modal) ──────────────────
+        alert_row = QHBoxLayout()
+        self.alert_label = QLabel()
+        self.alert_label.setWordWrap(True)
+        self.alert_label.setStyleSheet("color: #a94442; background: #f2dede; padding: 6px;")
+        self.ack_btn = QPushButton("Acknowledge")
+        self.ack_btn.clicked.connect(self.on_acknowledge_alerts)
+        alert_row.addWidget(self.alert_label, 1)
+        alert_row.addWidget(self.ack_btn)
+        main.addLayout(alert_row)
+        self._pending_alert_ids = []
+
         # ── Table ──────────────────────────────────────────
         self.table = QTableWidget(0, 7)
         self.table.setHorizontalHeaderLabels([
@@ -49,7 +65,9 @@ class InventoryManagementScreen(QWidget):
         self.delete_btn = QPushButton("Delete")
         self.adjust_btn = QPushButton("Adjust Stock")
         self.export_btn = QPushButton("Export Reorder Report")
-        for b in (self.new_btn, self.save_btn, self.delete_btn, self.adjust_btn, self.export_btn):
+        self.stocktake_btn = QPushButton("Import Stock-Take")
+        for b in (self.new_btn, self.save_btn, self.delete_btn, self.adjust_btn,
+                  self.export_btn, self.stocktake_btn):
             btns.addWidget(b)
         main.addLayout(btns)
 
@@ -59,9 +77,10 @@ class InventoryManagementScreen(QWidget):
         self.delete_btn.clicked.connect(self.on_delete)
         self.adjust_btn.clicked.connect(self.on_adjust)
         self.export_btn.clicked.connect(self.on_export)
+        self.stocktake_btn.clicked.connect(self.on_import_stock_take)
 
         self.refresh()
-        self.check_low_stock_and_alert()
+        self.refresh_alerts()
 
     def refresh(self):
         self.table.setRowCount(0)
@@ -132,28 +151,71 @@ class InventoryManagementScreen(QWidget):
         inventory.adjust_stock(self.selected_item_id, qty, reason)
         self.refresh()
         self.on_select()
-        self.check_low_stock_and_alert()
+        self.refresh_alerts()
 
     def on_export(self):
         path, _ = QFileDialog.getSaveFileName(self, "Save CSV", "reorder_report.csv", "*.csv")
         if not path:
             return
-        rows = inventory.items_below_reorder()
-        with open(path, "w", newline="") as f:
+        rows = reorder_forecast.reorder_suggestions()
+        with open(path, "w", newline="", encoding="utf-8") as f:
             w = csv.writer(f)
-            w.writerow(["ID","Name","Desc","Cost","Price","Threshold","OnHand"])
+            w.writerow([
+                "ID", "Name", "OnHand", "Threshold",
+                "AvgDailyUse", "StdDailyUse", "Recent7dUse", "DaysOfCover",
+                "SuggestedReorderPoint", "SuggestedOrderQty"
+            ])
             w.writerows(rows)
         QMessageBox.information(self, "Exported", f"Saved to {path}")
 
-    def check_low_stock_and_alert(self):
-        low = inventory.items_below_reorder()
-        if not low:
+    def on_import_stock_take(self):
+        """Apply a CSV of counted quantities in one go and save the variance report."""
+        path, _ = QFileDialog.getOpenFileName(self, "Open Stock-Take CSV", "", "*.csv")
+        if not path:
+            return
+        try:
+            counts = stock_take.read_counts(path)
+            variances, unknown, ambiguous = stock_take.apply_counts(counts)
+        except (ValueError, sqlite3.Error) as e:
+            QMessageBox.critical(self, "Stock-Take Failed", str(e))
             return
-        # Build a friendly HTML list
-        lines = [f"{row[1]} (On-Hand: {row[5]}, Reorder @ {row[6]})" for row in low]
-        QMessageBox.warning(
-            self,
-            "Low Stock Warning",
-            "<b>The following items are at or below reorder level:</b><br>" +
-            "<br>".join(lines)
-        )
\ No newline at end of file
+
+        self.refresh()
+        self.refresh_alerts()
+
+        adjusted = sum(1 for v in variances if v[4])
+        msg = (f"{len(variances)} item(s) counted, {adjusted} adjusted"
+               + (f", {len(unknown)} line(s) did not match any item" if unknown else "")
+               + (f", {len(ambiguous)} line(s) named several items and were skipped" if ambiguous else "")
+               + ".")
+        report, _ = QFileDialog.getSaveFileName(
+            self, "Save Variance Report",
+            f"stock_take_variance_{datetime.now():%Y%m%d}.csv", "*.csv"
+        )
+        if report:
+            stock_take.write_variance_report(report, variances, unknown, ambiguous)
+            msg += f"\nVariance report saved to {report}"
+        QMessageBox.information(self, "Stock-Take Applied", msg)
+
+    def refresh_alerts(self):
+        """Show queued low-stock alerts (filled by DB triggers) in the banner."""
+        alerts = inventory.pending_alerts()
+        self._pending_alert_ids = [a[0] for a in alerts]
+        if alerts:
+            lines = [f"{name} (On-Hand: {on_hand}, Reorder @ {thr})"
+                     for _, _, name, on_hand, thr, _ in alerts]
+            self.alert_label.setText(
+                "<b>At or below reorder level:</b> " + "; ".join(lines)
+            )
+        self.alert_label.setVisible(bool(alerts))
+        self.ack_btn.setVisible(bool(alerts))
+        self.alerts_changed.emit(len(alerts))
+
+    def on_acknowledge_alerts(self):
+        inventory.acknowledge_alerts(self._pending_alert_ids)
+        self.refresh_alerts()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        # deductions from billing/prescriptions may have queued new alerts
+        self.refresh_alerts()
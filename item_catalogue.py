@@ -0,0 +1,104 @@
+# item_catalogue.py
+"""
+In-memory catalogue of inventory items keyed by name.
+
+Billing and prescriptions resolve free-text names through here instead
+of running one `SELECT item_id FROM items WHERE name = ?` per line. A
+name resolves to the item with exactly that name; only when there is
+none does the normalized (case- and whitespace-insensitive) name apply,
+and a name that still fits several items raises AmbiguousItemError
+rather than picking one. The cache is loaded lazily and dropped
+whenever inventory.py reports an item change.
+"""
+import sqlite3
+import threading
+from bisect import bisect_left
+from collections import namedtuple
+
+import inventory
+
+DB = inventory.DB
+
+CatalogueItem = namedtuple("CatalogueItem", "item_id name unit_price")
+
+def normalize(name):
+    """Case- and whitespace-insensitive key for an item name."""
+    return " ".join((name or "").split()).casefold()
+
+class AmbiguousItemError(ValueError):
+    """A name matches more than one inventory item."""
+    def __init__(self, name, candidates):
+        self.name = name
+        self.candidates = candidates
+        super().__init__(
+            f"“{name}” matches several inventory items: "
+            + ", ".join(f"{item.name} (#{item.item_id})" for item in candidates)
+        )
+
+class ItemCatalogue:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_name = None    # exact name → [CatalogueItem]
+        self._by_key = None     # normalized name → [CatalogueItem]
+        self._by_id = None      # item_id → CatalogueItem
+        self._keys = None       # sorted normalized names, for prefix search
+
+    def invalidate(self):
+        with self._lock:
+            self._by_name = self._by_key = self._by_id = self._keys = None
+
+    def _load(self):
+        with self._lock:
+            if self._by_key is None:
+                conn = sqlite3.connect(DB)
+                cur = conn.cursor()
+                cur.execute("SELECT item_id, name, unit_price FROM items ORDER BY item_id")
+                by_name, by_key, by_id = {}, {}, {}
+                for row in cur.fetchall():
+                    item = CatalogueItem(*row)
+                    by_id[item.item_id] = item
+                    by_name.setdefault(item.name, []).append(item)
+                    by_key.setdefault(normalize(item.name), []).append(item)
+                conn.close()
+                self._by_name, self._by_key, self._by_id = by_name, by_key, by_id
+                self._keys = sorted(by_key)
+            return self._by_name, self._by_key, self._by_id, self._keys
+
+    def get(self, item_id):
+        return self._load()[2].get(item_id)
+
+    @staticmethod
+    def _match(name, by_name, by_key):
+        candidates = by_name.get((name or "").strip()) or by_key.get(normalize(name))
+        if not candidates:
+            return None
+        if len(candidates) > 1:
+            raise AmbiguousItemError(name, candidates)
+        return candidates[0]
+
+    def resolve(self, name):
+        """CatalogueItem for `name`, or None; raises AmbiguousItemError if several fit."""
+        by_name, by_key, _, _ = self._load()
+        return self._match(name, by_name, by_key)
+
+    def resolve_many(self, names):
+        """
+        {name: CatalogueItem or None} for every name, from one cache lookup;
+        raises AmbiguousItemError for the first name that fits several items.
+        """
+        by_name, by_key, _, _ = self._load()
+        return {name: self._match(name, by_name, by_key) for name in names}
+
+    def search_prefix(self, prefix, limit=20):
+        """Up to `limit` items whose normalized name starts with `prefix`, A–Z."""
+        _, by_key, _, keys = self._load()
+        key = normalize(prefix)
+        hits = []
+        for i in range(bisect_left(keys, key), len(keys)):
+            if not keys[i].startswith(key) or len(hits) >= limit:
+                break
+            hits.extend(by_key[keys[i]][:limit - len(hits)])
+        return hits
+
+catalogue = ItemCatalogue()
+inventory.on_items_changed(catalogue.invalidate)
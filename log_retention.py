@@ -0,0 +1,136 @@
+# log_retention.py
+"""
+Retention for the error log tables: rows older than the cut-off are
+appended to a gzip-compressed JSONL archive, deleted in small batches,
+and the freed pages are handed back with an incremental vacuum.
+
+Incremental vacuum needs auto_vacuum = INCREMENTAL, which init_db.py sets
+on a new database. An older database is switched once, with the
+application closed, since it takes a full VACUUM that rewrites the file:
+
+    python -m log_retention --enable-incremental-vacuum
+
+Until then retention still archives and deletes, and the freed pages are
+reused by later writes instead of being returned to the filesystem.
+"""
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime, timedelta, timezone
+
+from logger import ensure_error_tables, log_error
+
+DB = "vet_management.db"
+ARCHIVE_DIR = "log_archive"
+RETENTION_DAYS = int(os.getenv("ERROR_LOG_RETENTION_DAYS", "90"))
+BATCH_SIZE = 1000
+VACUUM_PAGES = 2000
+
+def _archive_batches(conn, out, table, key, cutoff, columns):
+    """Copy + delete `table` rows with `key` < cutoff, BATCH_SIZE at a time."""
+    moved = 0
+    cols = ", ".join(columns)
+    while True:
+        cur = conn.execute(
+            f"SELECT rowid, {cols} FROM {table} WHERE {key} < ? ORDER BY rowid LIMIT ?",
+            (cutoff, BATCH_SIZE)
+        )
+        rows = cur.fetchall()
+        if not rows:
+            return moved
+        for row in rows:
+            out.write(json.dumps({"table": table, **dict(zip(columns, row[1:]))}) + "\n")
+        out.flush()
+        # a short transaction per batch keeps the app's writers unblocked
+        with conn:
+            conn.executemany(f"DELETE FROM {table} WHERE rowid = ?", [(r[0],) for r in rows])
+        moved += len(rows)
+
+def _incremental_vacuum(conn):
+    mode, = conn.execute("PRAGMA auto_vacuum").fetchone()
+    if mode == 2:   # INCREMENTAL; see enable_incremental_vacuum()
+        conn.execute(f"PRAGMA incremental_vacuum({VACUUM_PAGES})")
+
+def enable_incremental_vacuum(db=DB):
+    """
+    One-off switch of an existing database to auto_vacuum = INCREMENTAL.
+    Runs a full VACUUM, which rewrites the whole file under an exclusive
+    lock, so run it with the application closed. Returns False if the
+    database was already incremental.
+    """
+    conn = sqlite3.connect(db, timeout=10)
+    try:
+        mode, = conn.execute("PRAGMA auto_vacuum").fetchone()
+        if mode == 2:
+            return False
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        return True
+    finally:
+        conn.close()
+
+def archive_old_errors(days=RETENTION_DAYS, archive_dir=ARCHIVE_DIR, db=DB):
+    """
+    Move error_logs rows and error_groups not seen for `days` days into
+    <archive_dir>/error_logs_<YYYYMMDD>.jsonl.gz. Returns rows archived.
+    """
+    # error log timestamps are UTC, like CURRENT_TIMESTAMP
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+    path = os.path.join(archive_dir, f"error_logs_{datetime.now():%Y%m%d}.jsonl.gz")
+
+    conn = sqlite3.connect(db, timeout=10)
+    try:
+        ensure_error_tables(conn)
+        conn.commit()
+        due = conn.execute("""
+            SELECT EXISTS (SELECT 1 FROM error_logs WHERE timestamp < ?)
+                OR EXISTS (SELECT 1 FROM error_groups WHERE last_seen < ?)
+        """, (cutoff, cutoff)).fetchone()[0]
+        if not due:
+            return 0
+
+        os.makedirs(archive_dir, exist_ok=True)
+        # append mode: each run adds a gzip member, readers see one stream
+        with gzip.open(path, "at", encoding="utf-8") as out:
+            moved = _archive_batches(
+                conn, out, "error_logs", "timestamp", cutoff,
+                ("id", "timestamp", "error_message", "fingerprint")
+            )
+            moved += _archive_batches(
+                conn, out, "error_groups", "last_seen", cutoff,
+                ("fingerprint", "message", "stack_signature", "sample_message",
+                 "first_seen", "last_seen", "count")
+            )
+        _incremental_vacuum(conn)
+        return moved
+    finally:
+        conn.close()
+
+def run_retention():
+    """Entry point for a background thread at startup; never raises."""
+    try:
+        archive_old_errors()
+    except Exception as e:
+        log_error(f"Error log retention failed: {e}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m log_retention",
+                                     description="Archive error log rows older than the retention period.")
+    parser.add_argument("--days", type=int, default=RETENTION_DAYS,
+                        help=f"retention period in days (default: {RETENTION_DAYS})")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="switch the database to incremental vacuum (full VACUUM; close the application first)")
+    args = parser.parse_args(argv)
+    if args.enable_incremental_vacuum:
+        changed = enable_incremental_vacuum()
+        print("incremental vacuum enabled" if changed else "incremental vacuum was already enabled")
+    print(f"{archive_old_errors(args.days)} rows archived")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,34 +1,290 @@
+import atexit
+import gzip
+import hashlib
 import logging
-import sqlite3
 import os
+import queue
+import re
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
-# Set up logging to a file
 LOG_FILE = "vet_management_errors.log"
-logging.basicConfig(filename=LOG_FILE, level=logging.ERROR, format="%(asctime)s - %(levelname)s - %(message)s")
+DB = "vet_management.db"
+
+# Records are handed to a background listener thread; callers never touch
+# the disk or the DB. If the queue fills up (an error storm while the DB
+# is locked) further records are dropped and counted instead of blocking.
+QUEUE_SIZE = 5000
+BATCH_SIZE = 200            # max rows per executemany
+DB_RETRY_SECONDS = 5        # back-off after a failed DB write
+LOG_MAX_BYTES = 1_000_000
+LOG_BACKUPS = 5
+RAW_LOG_CAP = 10_000        # error_logs keeps only the newest N raw occurrences
+
+FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+
+# ── Fingerprinting ───────────────────────────────────────────────────────
+_VOLATILE = [
+    (re.compile(r"0x[0-9a-fA-F]+"), "<addr>"),
+    (re.compile(r"(['\"]).*?\1"), "'<s>'"),
+    (re.compile(r"\d+(\.\d+)?"), "<n>"),
+    (re.compile(r"\s+"), " "),
+]
+
+def normalize_message(message):
+    """
+    First line of `message` (plus the exception line of an embedded
+    traceback) with ids, numbers, addresses and quoted values masked.
+    """
+    lines = [l for l in (message or "").strip().splitlines() if l.strip()]
+    if not lines:
+        return ""
+    text = lines[0]
+    if any(l.startswith("Traceback (most recent call last)") for l in lines):
+        text += " " + lines[-1]
+    for pattern, repl in _VOLATILE:
+        text = pattern.sub(repl, text)
+    return text.strip()[:300]
+
+def stack_signature(tb=None):
+    """'file:function' chain of the active exception, or of the logging call site."""
+    frames = traceback.extract_tb(tb) if tb else traceback.extract_stack()
+    names = [
+        f"{os.path.basename(f.filename)}:{f.name}" for f in frames
+        if os.path.basename(f.filename) != "logger.py"
+    ]
+    return "|".join(names[-6:])
+
+def fingerprint(normalized, signature):
+    return hashlib.sha1(f"{normalized}\n{signature}".encode("utf-8")).hexdigest()[:16]
+
+_tables_ready = False
+_tables_lock = threading.Lock()
 
-# Ensure the error log table exists in the database
-def setup_error_logging():
-    conn = sqlite3.connect("vet_management.db")
-    cursor = conn.cursor()
-    cursor.execute('''
+def ensure_error_tables(conn):
+    """
+    error_groups holds one aggregated row per fingerprint; error_logs is a
+    capped ring of raw occurrences tagged with their fingerprint. Existing
+    rows are folded into groups the first time this runs.
+    """
+    global _tables_ready
+    with _tables_lock:
+        if not _tables_ready:
+            _create_error_tables(conn)
+            _tables_ready = True
+
+def _create_error_tables(conn):
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS error_logs (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             timestamp TEXT,
             error_message TEXT
         )
     ''')
-    conn.commit()
-    conn.close()
+    try:
+        conn.execute("ALTER TABLE error_logs ADD COLUMN fingerprint TEXT")
+    except sqlite3.OperationalError:
+        pass  # already added
+    fresh = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='error_groups'"
+    ).fetchone() is None
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS error_groups (
+            fingerprint      TEXT PRIMARY KEY,
+            message          TEXT NOT NULL,     -- normalized message
+            stack_signature  TEXT,
+            sample_message   TEXT,              -- latest raw occurrence
+            first_seen       TEXT NOT NULL,
+            last_seen        TEXT NOT NULL,
+            count            INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_error_groups_last_seen ON error_groups (last_seen)")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_error_logs_fingerprint ON error_logs (fingerprint)")
+    if fresh:
+        rows = conn.execute("SELECT id, timestamp, error_message FROM error_logs").fetchall()
+        occurrences = []
+        for row_id, ts, msg in rows:
+            norm = normalize_message(msg)
+            occurrences.append((ts, msg, fingerprint(norm, ""), norm, ""))
+        _upsert_groups(conn, occurrences)
+        conn.executemany(
+            "UPDATE error_logs SET fingerprint = ? WHERE id = ?",
+            [(occ[2], row[0]) for occ, row in zip(occurrences, rows)]
+        )
+
+def _upsert_groups(conn, occurrences):
+    """Fold (timestamp, message, fingerprint, normalized, signature) rows into error_groups."""
+    groups = {}
+    for ts, msg, fp, norm, sig in occurrences:
+        g = groups.get(fp)
+        if g is None:
+            groups[fp] = [fp, norm, sig, msg, ts, ts, 1]
+        else:
+            g[3] = msg
+            g[4] = min(g[4], ts)
+            g[5] = max(g[5], ts)
+            g[6] += 1
+    conn.executemany('''
+        INSERT INTO error_groups
+            (fingerprint, message, stack_signature, sample_message, first_seen, last_seen, count)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (fingerprint) DO UPDATE SET
+            sample_message = excluded.sample_message,
+            first_seen     = MIN(first_seen, excluded.first_seen),
+            last_seen      = MAX(last_seen, excluded.last_seen),
+            count          = count + excluded.count
+    ''', list(groups.values()))
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks: a full queue drops the record."""
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DatabaseHandler(logging.Handler):
+    """
+    Buffers records and inserts them into error_logs in batches. Runs on
+    the listener thread only. A failed write keeps the newest BATCH_SIZE
+    rows and waits DB_RETRY_SECONDS before trying again, so a locked DB
+    costs one attempt per back-off period rather than one per error.
+    """
+    def __init__(self, db=DB):
+        super().__init__(logging.ERROR)
+        self.db = db
+        self.buffer = []
+        self._retry_at = 0.0
+
+    def emit(self, record):
+        ts = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(record.created))
+        msg = record.getMessage()
+        norm = normalize_message(msg)
+        sig = getattr(record, "stack_signature", "")
+        self.buffer.append((ts, msg, fingerprint(norm, sig), norm, sig))
+        if len(self.buffer) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self, force=False):
+        if not self.buffer or (not force and time.monotonic() < self._retry_at):
+            return
+        batch, self.buffer = self.buffer, []
+        try:
+            conn = sqlite3.connect(self.db, timeout=1)
+            try:
+                with conn:
+                    ensure_error_tables(conn)
+                    _upsert_groups(conn, batch)
+                    conn.executemany(
+                        "INSERT INTO error_logs (timestamp, error_message, fingerprint) VALUES (?, ?, ?)",
+                        [occ[:3] for occ in batch]
+                    )
+                    # keep error_logs a fixed-size ring of recent occurrences
+                    conn.execute(
+                        "DELETE FROM error_logs WHERE id <= (SELECT MAX(id) FROM error_logs) - ?",
+                        (RAW_LOG_CAP,)
+                    )
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            # keep the newest rows, the file log still has everything
+            self.buffer = (batch + self.buffer)[-BATCH_SIZE:]
+            self._retry_at = time.monotonic() + DB_RETRY_SECONDS
+            print(f"error_logs write failed, retrying later: {e}", file=sys.stderr)
+
+
+class _BatchingListener(QueueListener):
+    """Flushes the DB handler whenever the queue drains, batching bursts."""
+    def __init__(self, q, db_handler, *handlers):
+        super().__init__(q, db_handler, *handlers, respect_handler_level=True)
+        self.db_handler = db_handler
+
+    def dequeue(self, block):
+        while True:
+            try:
+                return self.queue.get(timeout=DB_RETRY_SECONDS)
+            except queue.Empty:
+                # idle: retry anything left over from a failed write
+                self.db_handler.flush()
+
+    def enqueue_sentinel(self):
+        # block rather than fail if a storm has filled the queue
+        self.queue.put(self._sentinel)
+
+    def handle(self, record):
+        super().handle(record)
+        if self.queue.empty():
+            self.db_handler.flush()
+
+
+def _gzip_rotator(source, dest):
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def _make_file_handler():
+    handler = RotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8", delay=True
+    )
+    handler.namer = lambda name: name + ".gz"
+    handler.rotator = _gzip_rotator
+    handler.setLevel(logging.ERROR)
+    handler.setFormatter(logging.Formatter(FORMAT))
+    return handler
+
+
+_logger = logging.getLogger("vet_management")
+_logger.setLevel(logging.ERROR)
+_logger.propagate = False
+_queue = queue.Queue(QUEUE_SIZE)
+_queue_handler = _DroppingQueueHandler(_queue)
+_logger.addHandler(_queue_handler)
+
+_db_handler = DatabaseHandler()
+_listener = _BatchingListener(_queue, _db_handler, _make_file_handler())
+_listener_lock = threading.Lock()
+_started = False
+
+
+def _ensure_started():
+    global _started
+    with _listener_lock:
+        if not _started:
+            _listener.start()
+            _started = True
+
+
+def shutdown():
+    """Drain the queue and write everything still buffered (runs at exit)."""
+    global _started
+    with _listener_lock:
+        if not _started:
+            return
+        _listener.stop()
+        _started = False
+    _db_handler.flush(force=True)
+    if _queue_handler.dropped:
+        print(f"{_queue_handler.dropped} error log record(s) dropped", file=sys.stderr)
+
+atexit.register(shutdown)
 
-# Call setup function at the start
-setup_error_logging()
 
 def log_error(error_message):
-    """Log errors to both a file and the database for debugging."""
-    logging.error(error_message)
-
-    conn = sqlite3.connect("vet_management.db")
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO error_logs (timestamp, error_message) VALUES (datetime('now'), ?)", (error_message,))
-    conn.commit()
-    conn.close()
+    """Log errors to both a file and the database for debugging (asynchronously)."""
+    _ensure_started()
+    # the traceback is only reachable on the caller's thread
+    _logger.error(error_message, extra={"stack_signature": stack_signature(sys.exc_info()[2])})
@@ -1,9 +1,10 @@
 import sys
 import traceback
-from PySide6.QtCore import Qt, QTimer
+from PySide6.QtCore import Qt, QTimer, QDate, QModelIndex
+from PySide6.QtGui import QStandardItemModel, QStandardItem
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QWidget,
-    QLabel, QStackedWidget, QPushButton, QMessageBox
+    QLabel, QStackedWidget, QPushButton, QMessageBox, QLineEdit, QCompleter
 )
 from patient_management import PatientManagementScreen
 from appointment_scheduling import AppointmentSchedulingScreen
@@ -11,6 +12,7 @@ from notifications_reminders import NotificationsRemindersScreen
 from daily_appointments_calendar import DailyAppointmentsCalendar
 from billing_invoicing import BillingInvoicingScreen
 from error_log_viewer import ErrorLogViewer
+from perf_monitor import PerformanceDialog
 from logger import log_error
 from user_management import UserManagementScreen
 from user_password_dialog import ChangeMyPasswordDialog
@@ -18,6 +20,8 @@ from reports_analytics import ReportsAnalyticsScreen
 from medical_records import MedicalRecordsScreen
 from consent_dialog import ConsentDialog
 from consent_forms import ConsentFormsScreen
+import inventory
+import global_search
 
 # Inventory import with fallback
 try:
@@ -60,6 +64,7 @@ class MainWindow(QMainWindow):
         self.user_mgmt_button    = QPushButton("User Management")
         self.my_account_button   = QPushButton("My Account")
         self.error_log_button    = QPushButton("View Error Logs")
+        self.perf_button         = QPushButton("UI Performance")
         self.fullscreen_button   = QPushButton("Exit Full Screen")
 
         # Connect buttons
@@ -76,6 +81,7 @@ class MainWindow(QMainWindow):
         self.user_mgmt_button.clicked.connect(lambda: self.display_screen(10))
         self.my_account_button.clicked.connect(self.open_account_settings)
         self.error_log_button.clicked.connect(self.open_error_logs)
+        self.perf_button.clicked.connect(self.open_performance)
         self.fullscreen_button.clicked.connect(self.toggle_fullscreen)
 
         # Sidebar layout
@@ -89,6 +95,7 @@ class MainWindow(QMainWindow):
             sidebar_layout.addWidget(w)
         sidebar_layout.addStretch(1)
         sidebar_layout.addWidget(self.error_log_button)
+        sidebar_layout.addWidget(self.perf_button)
         sidebar_layout.addWidget(self.fullscreen_button)
 
         # Screens
@@ -115,6 +122,8 @@ class MainWindow(QMainWindow):
         self.appointment_screen.reminders_list_updated.connect(self.notifications_screen.reload_reminders)
         self.appointment_screen.navigate_to_billing_signal.connect(self.navigate_to_billing_screen)
         self.billing_screen.invoiceSelected.connect(self.notifications_screen.load_reminders)
+        if hasattr(self.inventory_screen, "alerts_changed"):
+            self.inventory_screen.alerts_changed.connect(self.update_stock_badge)
 
         # Stacked widget
         self.stacked = QStackedWidget()
@@ -126,6 +135,25 @@ class MainWindow(QMainWindow):
         ):
             self.stacked.addWidget(screen)
 
+        # Omnibox: one search box over every entity, backed by global_search
+        self.omnibox = QLineEdit()
+        self.omnibox.setPlaceholderText(
+            "Search patients, appointments, invoices, prescriptions, consents, records…"
+        )
+        self.omnibox_model = QStandardItemModel(self)
+        self.omnibox_completer = QCompleter(self.omnibox_model, self)
+        # rows are already ranked by the index; don't let the completer re-filter
+        self.omnibox_completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        self.omnibox_completer.setMaxVisibleItems(global_search.RESULT_LIMIT)
+        self.omnibox_completer.activated[QModelIndex].connect(self.open_search_hit)
+        self.omnibox.setCompleter(self.omnibox_completer)
+        self.omnibox_hits = []
+        self.omnibox_timer = QTimer(self)
+        self.omnibox_timer.setSingleShot(True)
+        self.omnibox_timer.setInterval(150)
+        self.omnibox_timer.timeout.connect(self.run_omnibox_search)
+        self.omnibox.textEdited.connect(self.omnibox_timer.start)
+
         # Calendar
         self.calendar_widget = DailyAppointmentsCalendar()
 
@@ -135,16 +163,133 @@ class MainWindow(QMainWindow):
         sidebar_plus_cal.addWidget(self.calendar_widget, 2)
         sidebar_plus_cal.addLayout(sidebar_layout, 3)
 
+        content_layout = QVBoxLayout()
+        content_layout.addWidget(self.omnibox)
+        content_layout.addWidget(self.stacked)
+
         main_layout.addLayout(sidebar_plus_cal, 2)
-        main_layout.addWidget(self.stacked, 5)
+        main_layout.addLayout(content_layout, 5)
 
         container = QWidget()
         container.setLayout(main_layout)
         self.setCentralWidget(container)
 
+        # Low-stock badge: poll the (indexed) alert queue, no item rescans
+        self.stock_alert_timer = QTimer(self)
+        self.stock_alert_timer.timeout.connect(self.poll_stock_alerts)
+        self.stock_alert_timer.start(30000)  # every 30s
+        self.poll_stock_alerts()
+
     def display_screen(self, idx):
         self.stacked.setCurrentIndex(idx)
 
+    def poll_stock_alerts(self):
+        try:
+            self.update_stock_badge(inventory.pending_alert_count())
+        except Exception as e:
+            log_error(f"Stock alert poll failed: {e}")
+
+    def update_stock_badge(self, count):
+        if count:
+            self.inventory_button.setText(f"Inventory Management ⚠ {count}")
+            self.inventory_button.setToolTip(f"{count} item(s) at or below reorder level")
+        else:
+            self.inventory_button.setText("Inventory Management")
+            self.inventory_button.setToolTip("")
+
+    # ── Omnibox ──────────────────────────────────────────────────────────
+    OMNIBOX_LABELS = {
+        "patient": "Patient", "appointment": "Appointment", "invoice": "Invoice",
+        "prescription": "Prescription", "consent": "Consent", "record": "Record",
+    }
+
+    def run_omnibox_search(self):
+        try:
+            self.omnibox_hits = global_search.search(self.omnibox.text())
+        except Exception as e:
+            log_error(f"Omnibox search failed: {e}")
+            self.omnibox_hits = []
+        self.omnibox_model.clear()
+        for i, hit in enumerate(self.omnibox_hits):
+            text = f"{self.OMNIBOX_LABELS[hit.kind]}: {hit.title}"
+            if hit.kind != "patient" and hit.patient_name:
+                text += f" — {hit.patient_name}"
+            if hit.date:
+                text += f"  ({hit.date[:10]})"
+            item = QStandardItem(text)
+            item.setToolTip(hit.detail)
+            item.setData(i, Qt.UserRole)
+            self.omnibox_model.appendRow(item)
+        if self.omnibox_hits:
+            self.omnibox_completer.complete()
+
+    def open_search_hit(self, index):
+        row = index.data(Qt.UserRole)
+        if row is None or row >= len(self.omnibox_hits):
+            return
+        hit = self.omnibox_hits[row]
+        QTimer.singleShot(0, self.omnibox.clear)
+        try:
+            if hit.kind == "patient":
+                self.patient_screen.focus_on_patient(hit.ref_id, hit.title)
+                self.display_screen(self.stacked.indexOf(self.patient_screen))
+            elif hit.kind == "appointment":
+                self.appointment_screen.load_patient_details(hit.patient_id, hit.patient_name)
+                self._select_row(self.appointment_screen.appointment_table, hit.ref_id)
+                self.display_screen(self.stacked.indexOf(self.appointment_screen))
+            elif hit.kind == "invoice":
+                screen = self.billing_screen
+                screen.search_input.clear()
+                screen.load_invoices()
+                self._widen_date_range(screen.start_date, screen.end_date, hit.date)
+                self._select_row(screen.invoice_table, hit.ref_id)
+                self.display_screen(self.stacked.indexOf(screen))
+            elif hit.kind == "prescription" and hasattr(self.prescription_screen, "table"):
+                self.prescription_screen.refresh()
+                self._select_row(self.prescription_screen.table, hit.ref_id)
+                self.display_screen(self.stacked.indexOf(self.prescription_screen))
+            elif hit.kind == "consent":
+                screen = self.consent_screen
+                screen.search_input.clear()
+                self._widen_date_range(screen.date_from, screen.date_to, hit.date)
+                screen.load_forms()
+                self._select_row(screen.table, hit.ref_id)
+                self.display_screen(self.stacked.indexOf(screen))
+            elif hit.kind == "record":
+                screen = self.medrec_screen
+                day = QDate.fromString(hit.date[:10], "yyyy-MM-dd")
+                for w in (screen.patient_filter, screen.vet_filter, screen.text_filter):
+                    w.clear()
+                screen.start_date.setDate(day)
+                screen.end_date.setDate(day)
+                screen.load_records(page=0)
+                self._select_row(screen.table, hit.ref_id)
+                self.display_screen(self.stacked.indexOf(screen))
+        except Exception as e:
+            log_error(f"Omnibox navigation to {hit.kind} #{hit.ref_id} failed: {e}")
+
+    @staticmethod
+    def _widen_date_range(start_edit, end_edit, date_text):
+        """Make sure a screen's From/To filter includes `date_text`."""
+        day = QDate.fromString((date_text or "")[:10], "yyyy-MM-dd")
+        if not day.isValid():
+            return
+        if day < start_edit.date():
+            start_edit.setDate(day)
+        if day > end_edit.date():
+            end_edit.setDate(day)
+
+    @staticmethod
+    def _select_row(table, ref_id):
+        """Select the row whose first column is `ref_id`; False if it isn't listed."""
+        for r in range(table.rowCount()):
+            item = table.item(r, 0)
+            if item is not None and item.text() == str(ref_id):
+                table.selectRow(r)
+                table.scrollToItem(item)
+                return True
+        return False
+
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_Escape:
             self.showNormal()
@@ -152,6 +297,9 @@ class MainWindow(QMainWindow):
     def open_error_logs(self):
         ErrorLogViewer().exec()
 
+    def open_performance(self):
+        PerformanceDialog(self).exec()
+
     def toggle_fullscreen(self):
         if self.isFullScreen():
             self.showNormal()
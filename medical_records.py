@@ -1,5 +1,5 @@
 # medical_records.py
-import os, shutil, json, sqlite3
+import os, shutil, json, sqlite3, html
 from datetime import datetime
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QFormLayout, QTableWidget, QTableWidgetItem,
@@ -8,6 +8,8 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Qt, QDate
 
+import record_search
+
 DB = "vet_management.db"
 ATTACH_DIR = "attachments"  # will be created if missing
 
@@ -24,27 +26,43 @@ class MedicalRecordsScreen(QWidget):
         top = QHBoxLayout()
         self.patient_filter = QLineEdit(); self.patient_filter.setPlaceholderText("Filter by patient name…")
         self.vet_filter     = QLineEdit(); self.vet_filter.setPlaceholderText("Filter by vet…")
+        self.text_filter    = QLineEdit(); self.text_filter.setPlaceholderText("Search notes… (\"phrase\", prefix*)")
+        self.text_filter.returnPressed.connect(self.load_records)
         self.start_date     = QDateEdit(QDate.currentDate().addMonths(-1)); self.start_date.setCalendarPopup(True)
         self.end_date       = QDateEdit(QDate.currentDate()); self.end_date.setCalendarPopup(True)
         refresh = QPushButton("Apply Filters")
-        refresh.clicked.connect(self.load_records)
+        refresh.clicked.connect(lambda: self.load_records(page=0))
 
         top.addWidget(QLabel("Patient:")); top.addWidget(self.patient_filter)
         top.addWidget(QLabel("Vet:"));     top.addWidget(self.vet_filter)
+        top.addWidget(QLabel("Notes:"));   top.addWidget(self.text_filter)
         top.addWidget(QLabel("From:"));    top.addWidget(self.start_date)
         top.addWidget(QLabel("To:"));      top.addWidget(self.end_date)
         top.addWidget(refresh)
         main.addLayout(top)
 
         # === Table ===
-        self.table = QTableWidget(0, 8)
+        self.table = QTableWidget(0, 9)
         self.table.setHorizontalHeaderLabels([
-            "ID","Date","Patient","Appointment","Vet","Chief Complaint","Diagnosis","Follow‑Up"
+            "ID","Date","Patient","Appointment","Vet","Chief Complaint","Diagnosis","Follow‑Up","Match"
         ])
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         self.table.itemSelectionChanged.connect(self.on_select_row)
         main.addWidget(self.table)
 
+        # === Paging ===
+        self.page = 0
+        pager = QHBoxLayout()
+        self.prev_button = QPushButton("◀ Previous")
+        self.prev_button.clicked.connect(lambda: self.load_records(page=self.page - 1))
+        self.next_button = QPushButton("Next ▶")
+        self.next_button.clicked.connect(lambda: self.load_records(page=self.page + 1))
+        self.page_label = QLabel()
+        pager.addWidget(self.prev_button)
+        pager.addWidget(self.page_label)
+        pager.addWidget(self.next_button)
+        main.addLayout(pager)
+
         # === Form ===
         form = QFormLayout()
         self.patient_picker = QComboBox()
@@ -121,37 +139,29 @@ class MedicalRecordsScreen(QWidget):
         self.appt_picker.insertItem(0, "(None)", None)
         self.appt_picker.setCurrentIndex(0)
 
-    def _filters(self):
-        return (
-            f"%{self.patient_filter.text().strip()}%",
-            f"%{self.vet_filter.text().strip()}%",
-            self.start_date.date().toString("yyyy-MM-dd"),
-            self.end_date.date().toString("yyyy-MM-dd"),
+    def load_records(self, page=0):
+        """Load one page of records matching the filters and note search."""
+        self.page = max(page, 0)
+        rows, has_next = record_search.search_records(
+            text=self.text_filter.text().strip(),
+            patient=self.patient_filter.text().strip(),
+            vet=self.vet_filter.text().strip(),
+            start_date=self.start_date.date().toString("yyyy-MM-dd"),
+            end_date=self.end_date.date().toString("yyyy-MM-dd"),
+            page=self.page,
         )
 
-    def load_records(self):
         self.table.setRowCount(0)
-        conn = sqlite3.connect(DB); cur = conn.cursor()
-        cur.execute("""
-            SELECT mr.record_id, mr.date_created, p.name,
-                   COALESCE(mr.appointment_id, ''),
-                   COALESCE(mr.vet_name,''),
-                   COALESCE(mr.chief_complaint,''),
-                   COALESCE(mr.diagnosis,''),
-                   COALESCE(mr.follow_up_date,'')
-              FROM medical_records mr
-              JOIN patients p ON mr.patient_id = p.patient_id
-             WHERE p.name LIKE ? AND COALESCE(mr.vet_name,'') LIKE ?
-               AND DATE(mr.date_created) BETWEEN DATE(?) AND DATE(?)
-             ORDER BY mr.date_created DESC
-        """, self._filters())
-        rows = cur.fetchall()
-        conn.close()
-
         for r, row in enumerate(rows):
             self.table.insertRow(r)
-            for c, val in enumerate(row):
+            for c, val in enumerate(row[:-1]):
                 self.table.setItem(r, c, QTableWidgetItem(str(val)))
+            if row[-1]:
+                self.table.setCellWidget(r, 8, QLabel(_highlight(row[-1])))
+
+        self.prev_button.setEnabled(self.page > 0)
+        self.next_button.setEnabled(has_next)
+        self.page_label.setText(f"Page {self.page + 1}")
 
     # ---------- UI events ----------
     def on_new(self):
@@ -236,7 +246,7 @@ class MedicalRecordsScreen(QWidget):
         conn.commit(); conn.close()
 
         QMessageBox.information(self, "Saved", "Medical record saved.")
-        self.load_records()
+        self.load_records(page=self.page)
 
     def on_delete(self):
         if not self.selected_record_id:
@@ -247,7 +257,7 @@ class MedicalRecordsScreen(QWidget):
         cur.execute("DELETE FROM medical_records WHERE record_id=?", (self.selected_record_id,))
         conn.commit(); conn.close()
         self.on_new()
-        self.load_records()
+        self.load_records(page=self.page)
 
     # ---------- Attachments ----------
     def on_add_attachment(self):
@@ -308,6 +318,12 @@ class MedicalRecordsScreen(QWidget):
         self.chief_input.setFocus()
 
 
+def _highlight(snippet: str) -> str:
+    """Rich text for a search snippet: escaped, with the matched words in bold."""
+    return (html.escape(snippet)
+            .replace(record_search.HIT_START, "<b>")
+            .replace(record_search.HIT_END, "</b>"))
+
 def _guess_mime(fn: str) -> str:
     low = fn.lower()
     if low.endswith((".png",".jpg",".jpeg",".webp",".bmp")): return "image"
@@ -13,6 +13,8 @@ except ImportError:
 
 smtp_email = os.getenv('SMTP_EMAIL')
 smtp_password = os.getenv('SMTP_PASSWORD')
+# optional: recipient of the daily low-stock digest
+low_stock_email = os.getenv('LOW_STOCK_EMAIL')
 
 def send_email(to_email, subject, message):
     """Send an email notification using SMTP."""
@@ -48,29 +50,52 @@ def send_sms(to_phone, message):
     print(f"SMS to {to_phone}: {message}")
     return True
 
-# def send_low_stock_summary(to_email: str) -> bool:
-#     """
-#     Query for items whose on_hand ≤ reorder_threshold,
-#     build a plain-text list, and e-mail it.
-#     """
-#     conn = sqlite3.connect("vet_management.db")
-#     cur = conn.cursor()
-#     cur.execute("""
-#       SELECT name, on_hand, reorder_threshold
-#         FROM items
-#        WHERE on_hand <= reorder_threshold
-#     """)
-#     rows = cur.fetchall()
-#     conn.close()
-#
-#     if not rows:
-#         # nothing to report
-#         return False
-#
-#     lines = ["Low-Stock Alert:", ""]
-#     for name, on_hand, thr in rows:
-#         lines.append(f" • {name:20} on_hand={on_hand:3}  reorder_threshold={thr}")
-#
-#     body = "\n".join(lines)
-#     subject = "🐾 Daily Low-Stock Summary"
-#     return send_email(to_email, subject, body)
+def send_low_stock_summary(to_email: str) -> bool:
+    """
+    E-mail the low-stock alerts queued since the last digest, at most
+    once per day. Returns True if a digest was sent.
+    """
+    conn = sqlite3.connect("vet_management.db")
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT 1 FROM stock_alerts WHERE DATE(emailed_at) = DATE('now', 'localtime') LIMIT 1")
+        if cur.fetchone():
+            # already sent today
+            return False
+        cur.execute("""
+          SELECT a.alert_id, i.name, a.on_hand, a.reorder_threshold
+            FROM stock_alerts a
+            JOIN items i ON i.item_id = a.item_id
+           WHERE a.status = 'Pending'
+             AND a.emailed_at IS NULL
+           ORDER BY i.name
+        """)
+        rows = cur.fetchall()
+    except sqlite3.OperationalError:
+        # inventory tables not created yet
+        return False
+    finally:
+        conn.close()
+
+    if not rows:
+        # nothing to report
+        return False
+
+    lines = ["Low-Stock Alert:", ""]
+    for _, name, on_hand, thr in rows:
+        lines.append(f" • {name:20} on_hand={on_hand:3}  reorder_threshold={thr}")
+
+    body = "\n".join(lines)
+    subject = "🐾 Daily Low-Stock Summary"
+    if not send_email(to_email, subject, body):
+        return False
+
+    conn = sqlite3.connect("vet_management.db")
+    cur = conn.cursor()
+    cur.executemany(
+        "UPDATE stock_alerts SET emailed_at = datetime('now', 'localtime') WHERE alert_id = ?",
+        [(alert_id,) for alert_id, *_ in rows]
+    )
+    conn.commit()
+    conn.close()
+    return True
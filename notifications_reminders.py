@@ -2,8 +2,18 @@ from PySide6.QtWidgets import (QWidget, QVBoxLayout, QTableWidget, QTableWidgetI
                                QMessageBox, QHeaderView, QInputDialog)
 from PySide6.QtCore import QTimer
 import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from notifications import send_email
+from notifications import send_email, send_low_stock_summary, low_stock_email
+from logger import log_error
+from perf_monitor import timed
+
+# the low-stock digest talks to SMTP, so it never runs on the GUI thread
+_digest_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="low-stock-digest")
+
+def _log_digest_failure(future):
+    if future.exception() is not None:
+        log_error(f"Low-stock digest failed: {future.exception()}")
 
 class NotificationsRemindersScreen(QWidget):
     def __init__(self):
@@ -146,6 +156,7 @@ class NotificationsRemindersScreen(QWidget):
             for col_index, col_data in enumerate(row_data):
                 self.reminders_table.setItem(row_index, col_index, QTableWidgetItem(str(col_data)))
 
+    @timed("reminders.check_and_send_notifications")
     def check_and_send_notifications(self):
         """Check & send notifications for pending reminders (appointments + invoices)."""
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -235,6 +246,14 @@ class NotificationsRemindersScreen(QWidget):
 
         conn.commit()
         conn.close()
+
+        # Optional daily low-stock digest (no-op once sent today); skipped
+        # while the previous one is still waiting on the mail server
+        digest = getattr(self, '_digest', None)
+        if low_stock_email and (digest is None or digest.done()):
+            self._digest = _digest_executor.submit(send_low_stock_summary, low_stock_email)
+            self._digest.add_done_callback(_log_digest_failure)
+
         self.load_reminders()
 
     def mark_as_triggered(self):
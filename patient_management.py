@@ -1,5 +1,4 @@
 import sqlite3
-import csv
 from datetime import datetime
 
 from PySide6.QtWidgets import (
@@ -7,7 +6,11 @@ from PySide6.QtWidgets import (
     QLineEdit, QComboBox, QSpinBox, QPushButton, QMessageBox, QDialog, QDialogButtonBox,
     QFileDialog, QHeaderView
 )
-from PySide6.QtCore import Signal
+from PySide6.QtCore import Signal, QTimer
+
+import csv_export
+import csv_export_dialog
+import patient_search
 
 
 class PatientManagementScreen(QWidget):
@@ -29,8 +32,14 @@ class PatientManagementScreen(QWidget):
 
         # ─── Search & Filters ───────────────────────────────────────────────────────
         self.search_input = QLineEdit()
-        self.search_input.setPlaceholderText("Search by name, breed, or owner…")
+        self.search_input.setPlaceholderText("Search by name, breed, owner, phone or email…")
         self.search_input.returnPressed.connect(self.search_patients)
+        # search as you type, once typing pauses
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.search_patients)
+        self.search_input.textChanged.connect(self.search_timer.start)
         search_layout.addWidget(self.search_input)
 
         self.species_filter = QComboBox()
@@ -259,72 +268,50 @@ class PatientManagementScreen(QWidget):
 
 
     def export_to_csv(self):
+        """Stream the patients matching the current search and filters straight from the database."""
         default_fn = f"patients_{datetime.now():%Y%m%d_%H%M%S}.csv"
         path, _ = QFileDialog.getSaveFileName(self, "Save CSV", default_fn, "CSV Files (*.csv)")
         if not path:
             return
 
-        rows = []
-        for r in range(self.patient_table.rowCount()):
-            rows.append([self.patient_table.item(r, c).text()
-                         for c in range(self.patient_table.columnCount())])
-
-        if not rows:
-            QMessageBox.warning(self, "No Data", "Nothing to export.")
-            return
-
-        try:
-            with open(path, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow([self.patient_table.horizontalHeaderItem(c).text()
-                                 for c in range(self.patient_table.columnCount())])
-                writer.writerows(rows)
-            QMessageBox.information(self, "Exported", f"Saved to {path}")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+        csv_export_dialog.start_export(self, path, self.export_query)
 
 
     def search_patients(self):
-        term    = self.search_input.text().strip()
+        self.search_timer.stop()
         species = self.species_filter.currentText()
-        min_age = self.min_age_filter.value()
-        max_age = self.max_age_filter.value()
+        filters = dict(
+            species=None if species == "All Species" else species,
+            min_age=self.min_age_filter.value(),
+            max_age=self.max_age_filter.value(),
+        )
+        term = self.search_input.text().strip()
+        rows = patient_search.search_patients(term, **filters)
+        self.export_query = patient_search.export_query(term, **filters)
+        self._populate_table(rows)
 
-        query = ("""
+
+    def load_patients(self):
+        conn = sqlite3.connect("vet_management.db")
+        cur  = conn.cursor()
+        cur.execute("""
             SELECT patient_id, name, species, breed,
                    age_years || 'y ' || age_months || 'm' AS age,
                    owner_name, owner_contact, owner_email
               FROM patients
-             WHERE 1=1
         """)
-        params = []
-
-        if term:
-            query += " AND (name LIKE ? OR breed LIKE ? OR owner_name LIKE ?)"
-            pat = f"%{term}%"
-            params += [pat, pat, pat]
-
-        if species != "All Species":
-            query += " AND lower(species)=?"
-            params.append(species.lower())
-
-        if min_age > 0:
-            query += " AND age_years >= ?"
-            params.append(min_age)
-        if max_age > 0:
-            query += " AND age_years <= ?"
-            params.append(max_age)
-
-        conn = sqlite3.connect("vet_management.db")
-        cur  = conn.cursor()
-        cur.execute(query, params)
         rows = cur.fetchall()
         conn.close()
 
+        self.export_query = patient_search.export_query("")
         self._populate_table(rows)
 
 
-    def load_patients(self):
+    def focus_on_patient(self, patient_id: int, patient_name: str | None = None):
+        """Show just this patient in the table and load it into the form."""
+        self.search_input.blockSignals(True)
+        self.search_input.clear()
+        self.search_input.blockSignals(False)
         conn = sqlite3.connect("vet_management.db")
         cur  = conn.cursor()
         cur.execute("""
@@ -332,11 +319,20 @@ class PatientManagementScreen(QWidget):
                    age_years || 'y ' || age_months || 'm' AS age,
                    owner_name, owner_contact, owner_email
               FROM patients
-        """)
+             WHERE patient_id = ?
+        """, (patient_id,))
         rows = cur.fetchall()
         conn.close()
 
+        self.export_query = csv_export.ExportQuery("""
+            SELECT patient_id, name, species, breed, age_years, age_months,
+                   owner_name, owner_contact, owner_email
+              FROM patients
+             WHERE patient_id = ?
+        """, (patient_id,), patient_search.EXPORT_HEADER)
         self._populate_table(rows)
+        if rows:
+            self.patient_table.selectRow(0)
 
 
     def _populate_table(self, rows):
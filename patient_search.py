@@ -0,0 +1,268 @@
+# patient_search.py
+"""
+Full-text search over patients and their owners.
+
+Two FTS5 indexes use `patients` as their external content table:
+
+* patients_fts      — unicode61 words with prefix indexes, so "bel" or
+                      "jo sm" match as you type; ranked with bm25.
+* patients_trigram  — trigram tokens for substring hits inside words,
+                      phone numbers and e-mail addresses ("5512", "mail.c").
+
+Both are kept in sync by triggers on `patients`, so every writer
+(including other screens and scripts) is covered.
+"""
+import re
+import sqlite3
+
+import csv_export
+
+DB = "vet_management.db"
+SEARCH_LIMIT = 200
+COMPLETION_LIMIT = 20
+# complete_names() sorts only the first RANK_CANDIDATES word matches A–Z,
+# which keeps one- and two-letter prefixes (tens of thousands of hits) interactive
+RANK_CANDIDATES = 500
+
+_COLUMNS = "name, species, breed, owner_name, owner_contact, owner_email"
+# bm25 weights, same order as _COLUMNS: a hit on the pet's or owner's name
+# ranks above one on species or breed
+_WEIGHTS = "10.0, 1.0, 2.0, 6.0, 4.0, 4.0"
+
+_FTS_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS trg_patients_fts_ai AFTER INSERT ON patients BEGIN
+    INSERT INTO patients_fts     (rowid, {cols}) VALUES (new.patient_id, {new});
+    INSERT INTO patients_trigram (rowid, {cols}) VALUES (new.patient_id, {new});
+END;
+CREATE TRIGGER IF NOT EXISTS trg_patients_fts_ad AFTER DELETE ON patients BEGIN
+    INSERT INTO patients_fts     (patients_fts, rowid, {cols}) VALUES ('delete', old.patient_id, {old});
+    INSERT INTO patients_trigram (patients_trigram, rowid, {cols}) VALUES ('delete', old.patient_id, {old});
+END;
+CREATE TRIGGER IF NOT EXISTS trg_patients_fts_au AFTER UPDATE ON patients BEGIN
+    INSERT INTO patients_fts     (patients_fts, rowid, {cols}) VALUES ('delete', old.patient_id, {old});
+    INSERT INTO patients_trigram (patients_trigram, rowid, {cols}) VALUES ('delete', old.patient_id, {old});
+    INSERT INTO patients_fts     (rowid, {cols}) VALUES (new.patient_id, {new});
+    INSERT INTO patients_trigram (rowid, {cols}) VALUES (new.patient_id, {new});
+END;
+""".format(
+    cols=_COLUMNS,
+    new=", ".join("new." + c.strip() for c in _COLUMNS.split(",")),
+    old=", ".join("old." + c.strip() for c in _COLUMNS.split(",")),
+)
+
+# ── Schema ───────────────────────────────────────────────────────────────
+def ensure_search_tables():
+    conn = sqlite3.connect(DB)
+    cur = conn.cursor()
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='patients'")
+    if cur.fetchone() is None:
+        conn.close()
+        return  # init_db.py has not run yet
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='patients_fts'")
+    fresh = cur.fetchone() is None
+    cur.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS patients_fts USING fts5(
+            {_COLUMNS},
+            content='patients', content_rowid='patient_id',
+            tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+        )
+    """)
+    cur.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS patients_trigram USING fts5(
+            {_COLUMNS},
+            content='patients', content_rowid='patient_id',
+            tokenize='trigram'
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_patients_name_nocase ON patients (name COLLATE NOCASE)")
+    cur.executescript(_FTS_TRIGGERS)
+    if fresh:
+        cur.execute("INSERT INTO patients_fts (patients_fts) VALUES ('rebuild')")
+        cur.execute("INSERT INTO patients_trigram (patients_trigram) VALUES ('rebuild')")
+    conn.commit()
+    conn.close()
+
+# ── Query building ───────────────────────────────────────────────────────
+def prefix_query(term):
+    """FTS5 query matching every word of `term` as a word prefix, e.g. 'jo sm' → "jo"* AND "sm"*."""
+    words = re.findall(r"\w+", term or "")
+    return " AND ".join(f'"{w}"*' for w in words)
+
+def trigram_query(term):
+    """FTS5 trigram query for every whitespace-separated piece of ≥ 3 characters."""
+    pieces = [p for p in (term or "").split() if len(p) >= 3]
+    return " AND ".join('"' + p.replace('"', '""') + '"' for p in pieces)
+
+def _substring_match(term):
+    """
+    (condition on `p`, params) for patients containing every piece of
+    `term`. The trigram index cannot look up pieces shorter than 3
+    characters, so a term with one ("an", "al smith") is matched with LIKE
+    over the indexed columns instead, as the search did before the index.
+    """
+    pieces = (term or "").split()
+    if not pieces:
+        return "", []
+    if all(len(p) >= 3 for p in pieces):
+        return ("p.patient_id IN (SELECT rowid FROM patients_trigram WHERE patients_trigram MATCH ?)",
+                [trigram_query(term)])
+    columns = _COLUMNS.split(", ")
+    any_column = "(" + " OR ".join(f"p.{c} LIKE ? ESCAPE '\\'" for c in columns) + ")"
+    params = []
+    for piece in pieces:
+        params += ["%" + re.sub(r"([\\%_])", r"\\\1", piece) + "%"] * len(columns)
+    return " AND ".join([any_column] * len(pieces)), params
+
+# ── Search ───────────────────────────────────────────────────────────────
+_FIELDS = """p.patient_id, p.name, p.species, p.breed,
+               p.age_years || 'y ' || p.age_months || 'm' AS age,
+               p.owner_name, p.owner_contact, p.owner_email"""
+
+# bm25() inside the MATCH query lets FTS5 rank every hit before the LIMIT
+_SELECT = """
+    SELECT {fields}
+      FROM {fts} f
+      JOIN patients p ON p.patient_id = f.rowid
+     WHERE {fts} MATCH ? {filters}
+     ORDER BY bm25({fts}, {weights})
+     LIMIT ?
+"""
+
+def search_patients(term, species=None, min_age=0, max_age=0, limit=SEARCH_LIMIT):
+    """
+    Patients matching `term`, best first, as
+    (patient_id, name, species, breed, age, owner_name, owner_contact, owner_email).
+
+    Word-prefix hits come first, ranked by bm25; if there is room left,
+    substring hits follow: ranked from the trigram index, or A–Z from a
+    LIKE scan when a piece of the term is shorter than 3 characters. An
+    empty term returns every patient passing the filters.
+    """
+    filters, params = "", []
+    if species:
+        filters += " AND lower(p.species) = ?"
+        params.append(species.lower())
+    if min_age > 0:
+        filters += " AND p.age_years >= ?"
+        params.append(min_age)
+    if max_age > 0:
+        filters += " AND p.age_years <= ?"
+        params.append(max_age)
+
+    conn = sqlite3.connect(DB)
+    cur = conn.cursor()
+    try:
+        words = prefix_query(term)
+        if not words:
+            cur.execute(f"""
+                SELECT {_FIELDS}
+                  FROM patients p
+                 WHERE 1=1 {filters}
+            """, params)
+            return cur.fetchall()
+
+        cur.execute(
+            _SELECT.format(fields=_FIELDS, fts="patients_fts", weights=_WEIGHTS, filters=filters),
+            [words] + params + [limit]
+        )
+        rows = cur.fetchall()
+        if len(rows) >= limit:
+            return rows
+
+        seen = {r[0] for r in rows}
+        if all(len(p) >= 3 for p in term.split()):
+            cur.execute(
+                _SELECT.format(fields=_FIELDS, fts="patients_trigram", weights=_WEIGHTS, filters=filters),
+                [trigram_query(term)] + params + [limit]
+            )
+        else:
+            match, match_params = _substring_match(term)
+            cur.execute(f"""
+                SELECT {_FIELDS}
+                  FROM patients p
+                 WHERE {match} {filters}
+                 ORDER BY p.name COLLATE NOCASE, p.patient_id
+                 LIMIT ?
+            """, match_params + params + [limit])
+        rows += [r for r in cur.fetchall() if r[0] not in seen][:limit - len(rows)]
+        return rows
+    finally:
+        conn.close()
+
+
+EXPORT_HEADER = ["Patient ID", "Name", "Species", "Breed", "Age (Years)", "Age (Months)",
+                 "Owner Name", "Owner Contact", "Owner Email"]
+
+def export_query(term, species=None, min_age=0, max_age=0):
+    """
+    csv_export.ExportQuery for every patient search_patients() would
+    match, in patient_id order: no ranking and no SEARCH_LIMIT, with the
+    age as separate year and month columns.
+    """
+    filters, params = "", []
+    words = prefix_query(term)
+    if words:
+        substr, substr_params = _substring_match(term)
+        filters += (" AND (p.patient_id IN (SELECT rowid FROM patients_fts WHERE patients_fts MATCH ?)"
+                    f" OR {substr})")
+        params += [words] + substr_params
+    if species:
+        filters += " AND lower(p.species) = ?"
+        params.append(species.lower())
+    if min_age > 0:
+        filters += " AND p.age_years >= ?"
+        params.append(min_age)
+    if max_age > 0:
+        filters += " AND p.age_years <= ?"
+        params.append(max_age)
+    return csv_export.ExportQuery(f"""
+        SELECT p.patient_id, p.name, p.species, p.breed, p.age_years, p.age_months,
+               p.owner_name, p.owner_contact, p.owner_email
+          FROM patients p
+         WHERE 1=1 {filters}
+         ORDER BY p.patient_id
+    """, params, EXPORT_HEADER)
+
+
+def complete_names(text, limit=COMPLETION_LIMIT):
+    """
+    Up to `limit` (patient_id, name) pairs for a name completer, A–Z.
+
+    Names starting with `text` come from a range scan on
+    ix_patients_name_nocase and stop after `limit` rows; if that leaves
+    room, names with a later word starting with `text` ("whi" → "Mr
+    Whiskers") are added from patients_fts.
+    """
+    text = (text or "").strip()
+    if not text:
+        return []
+    like = re.sub(r"([\\%_])", r"\\\1", text) + "%"
+    conn = sqlite3.connect(DB)
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT patient_id, name
+              FROM patients
+             WHERE name LIKE ? ESCAPE '\\'
+             ORDER BY name COLLATE NOCASE, patient_id
+             LIMIT ?
+        """, (like, limit))
+        rows = cur.fetchall()
+
+        words = prefix_query(text)
+        if words and len(rows) < limit:
+            seen = {r[0] for r in rows}
+            cur.execute(f"""
+                SELECT patient_id, name FROM (
+                    SELECT p.patient_id, p.name
+                      FROM patients_fts f
+                      JOIN patients p ON p.patient_id = f.rowid
+                     WHERE patients_fts MATCH ?
+                     LIMIT {RANK_CANDIDATES}
+                )
+                 ORDER BY name COLLATE NOCASE, patient_id
+            """, ("{name}: (" + words + ")",))
+            rows += [r for r in cur.fetchall() if r[0] not in seen][:limit - len(rows)]
+        return rows
+    finally:
+        conn.close()
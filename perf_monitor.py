@@ -0,0 +1,278 @@
+# perf_monitor.py
+"""
+UI responsiveness instrumentation.
+
+* A heartbeat QTimer on the GUI thread measures event-loop lag; a
+  watchdog thread notices when the heartbeat stops and samples the GUI
+  thread's Python stack once the stall passes STALL_THRESHOLD_MS.
+* @timed("name") wraps a slot in a timing span and records its latency
+  in a per-action histogram.
+
+Everything is kept in memory; PerformanceDialog shows it and exports
+it as JSON.
+"""
+import functools
+import inspect
+import json
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from PySide6.QtCore import QObject, QTimer
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
+    QPushButton, QPlainTextEdit, QLabel, QHeaderView, QFileDialog, QMessageBox
+)
+
+HEARTBEAT_MS = 50
+STALL_THRESHOLD_MS = 500
+MAX_STALLS = 100
+# histogram bucket upper bounds in ms; the last bucket is open-ended
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        i = 0
+        while i < len(BUCKETS_MS) and ms > BUCKETS_MS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile, capped at the max seen."""
+        n = self.count
+        if not n:
+            return 0.0
+        rank, seen = p / 100.0 * n, 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return min(float(BUCKETS_MS[i]), round(self.max_ms, 2)) if i < len(BUCKETS_MS) else round(self.max_ms, 2)
+        return self.max_ms
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 2) if self.count else 0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "max_ms": round(self.max_ms, 2),
+            "buckets_ms": list(BUCKETS_MS) + ["inf"],
+            "counts": list(self.counts),
+        }
+
+
+class _Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.actions = {}                 # name → LatencyHistogram
+        self.loop_lag = LatencyHistogram()
+        self.stalls = []                  # newest last, capped at MAX_STALLS
+        self.current_action = None
+
+    def record(self, name, ms):
+        with self.lock:
+            self.actions.setdefault(name, LatencyHistogram()).add(ms)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "generated_at": datetime.now().isoformat(timespec="seconds"),
+                "stall_threshold_ms": STALL_THRESHOLD_MS,
+                "event_loop_lag": self.loop_lag.to_dict(),
+                "actions": {k: h.to_dict() for k, h in sorted(self.actions.items())},
+                "stalls": list(self.stalls),
+            }
+
+stats = _Stats()
+
+
+def timed(name):
+    """
+    Decorator recording how long a slot takes under `name`.
+
+    Qt passes extra arguments (e.g. clicked's `checked`) to any callable
+    that seems to accept them, so the wrapper forwards only as many
+    positional arguments as the wrapped function takes.
+    """
+    def decorate(func):
+        params = inspect.signature(func).parameters.values()
+        if any(p.kind == p.VAR_POSITIONAL for p in params):
+            max_args = None
+        else:
+            max_args = sum(p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD) for p in params)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if max_args is not None:
+                args = args[:max_args]
+            outer, stats.current_action = stats.current_action, name
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats.record(name, (time.perf_counter() - start) * 1000)
+                stats.current_action = outer
+        return wrapper
+    return decorate
+
+
+class StallWatchdog(QObject):
+    """Heartbeat on the GUI thread plus a watcher thread that samples stalls."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._gui_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop = threading.Event()
+        self._timer = QTimer(self)
+        self._timer.setInterval(HEARTBEAT_MS)
+        self._timer.timeout.connect(self._beat)
+        self._thread = threading.Thread(target=self._watch, name="ui-watchdog", daemon=True)
+
+    def start(self):
+        self._last_beat = time.monotonic()
+        self._timer.start()
+        self._thread.start()
+
+    def stop(self):
+        self._timer.stop()
+        self._stop.set()
+
+    def _beat(self):
+        now = time.monotonic()
+        lag_ms = max(0.0, (now - self._last_beat) * 1000 - HEARTBEAT_MS)
+        self._last_beat = now
+        with stats.lock:
+            stats.loop_lag.add(lag_ms)
+            if stats.stalls and stats.stalls[-1].get("open"):
+                stall = stats.stalls[-1]
+                stall["open"] = False
+                stall["duration_ms"] = round(lag_ms + HEARTBEAT_MS, 1)
+
+    def _watch(self):
+        sampled_beat = None
+        while not self._stop.wait(HEARTBEAT_MS / 1000):
+            beat = self._last_beat
+            stalled_ms = (time.monotonic() - beat) * 1000
+            if stalled_ms < STALL_THRESHOLD_MS or sampled_beat == beat:
+                continue
+            # one stack sample per stall, taken while the GUI thread is stuck
+            sampled_beat = beat
+            frame = sys._current_frames().get(self._gui_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else ""
+            with stats.lock:
+                stats.stalls.append({
+                    "at": datetime.now().isoformat(timespec="seconds"),
+                    "action": stats.current_action,
+                    "duration_ms": round(stalled_ms, 1),
+                    "open": True,
+                    "stack": stack,
+                })
+                del stats.stalls[:-MAX_STALLS]
+
+
+_watchdog = None
+
+def start_watchdog(parent=None):
+    """Start the singleton watchdog; call once after QApplication exists."""
+    global _watchdog
+    if _watchdog is None:
+        _watchdog = StallWatchdog(parent)
+        _watchdog.start()
+    return _watchdog
+
+
+def export_json(path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(stats.snapshot(), f, indent=2)
+
+
+class PerformanceDialog(QDialog):
+    """Per-action latency and recorded UI stalls."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("UI Performance")
+        self.setGeometry(200, 200, 900, 600)
+        layout = QVBoxLayout(self)
+
+        self.lag_label = QLabel()
+        layout.addWidget(self.lag_label)
+
+        self.action_table = QTableWidget(0, 6)
+        self.action_table.setHorizontalHeaderLabels(
+            ["Action", "Count", "Mean (ms)", "p50 (ms)", "p95 (ms)", "Max (ms)"]
+        )
+        self.action_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.action_table)
+
+        self.stall_table = QTableWidget(0, 3)
+        self.stall_table.setHorizontalHeaderLabels(["When", "Action", "Duration (ms)"])
+        self.stall_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.stall_table.itemSelectionChanged.connect(self.show_stack)
+        layout.addWidget(self.stall_table)
+
+        self.stack_view = QPlainTextEdit()
+        self.stack_view.setReadOnly(True)
+        layout.addWidget(self.stack_view)
+
+        btns = QHBoxLayout()
+        refresh_btn = QPushButton("Refresh")
+        refresh_btn.clicked.connect(self.refresh)
+        export_btn = QPushButton("Export JSON")
+        export_btn.clicked.connect(self.on_export)
+        btns.addWidget(refresh_btn)
+        btns.addWidget(export_btn)
+        layout.addLayout(btns)
+
+        self.refresh()
+
+    def refresh(self):
+        snap = stats.snapshot()
+        lag = snap["event_loop_lag"]
+        self.lag_label.setText(
+            f"Event-loop lag — p50: {lag['p50_ms']} ms, p95: {lag['p95_ms']} ms, "
+            f"max: {lag['max_ms']} ms over {lag['count']} heartbeats"
+        )
+
+        self.action_table.setRowCount(0)
+        for name, h in snap["actions"].items():
+            r = self.action_table.rowCount()
+            self.action_table.insertRow(r)
+            for c, v in enumerate((name, h["count"], h["mean_ms"], h["p50_ms"], h["p95_ms"], h["max_ms"])):
+                self.action_table.setItem(r, c, QTableWidgetItem(str(v)))
+
+        self._stalls = list(reversed(snap["stalls"]))
+        self.stall_table.setRowCount(0)
+        for r, s in enumerate(self._stalls):
+            self.stall_table.insertRow(r)
+            for c, v in enumerate((s["at"], s["action"] or "", s["duration_ms"])):
+                self.stall_table.setItem(r, c, QTableWidgetItem(str(v)))
+        self.stack_view.clear()
+
+    def show_stack(self):
+        r = self.stall_table.currentRow()
+        if 0 <= r < len(self._stalls):
+            self.stack_view.setPlainText(self._stalls[r]["stack"])
+
+    def on_export(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export Performance Data",
+            f"ui_performance_{datetime.now():%Y%m%d_%H%M%S}.json", "*.json"
+        )
+        if not path:
+            return
+        export_json(path)
+        QMessageBox.information(self, "Exported", f"Saved to {path}")
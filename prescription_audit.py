@@ -1,18 +1,130 @@
-import sqlite3, json
+import sqlite3, json, threading, atexit
+from datetime import datetime, timezone
 DB = "vet_management.db"
 
-def log_history(prescription_id, action, changes=None, user_id=None):
+# ── Index for per-prescription audit queries ──────────────────────────────
+def ensure_history_index():
     conn = sqlite3.connect(DB)
-    cur  = conn.cursor()
-    cur.execute("""
-      INSERT INTO prescription_history
-        (prescription_id, user_id, action, changes_json)
-      VALUES (?, ?, ?, ?)
-    """, (
+    cur = conn.cursor()
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='prescription_history'")
+    if cur.fetchone():
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS ix_prescription_history_rx_ts
+                ON prescription_history (prescription_id, timestamp)
+        """)
+        conn.commit()
+    conn.close()
+
+_INSERT = """
+  INSERT INTO prescription_history
+    (prescription_id, user_id, action, timestamp, changes_json)
+  VALUES (?, ?, ?, ?, ?)
+"""
+
+class AuditWriter:
+    """
+    Buffers audit rows in memory and writes them with one executemany per
+    batch, either when `max_batch` rows are pending or every `interval`
+    seconds, whichever comes first. Call flush() wherever a reader needs
+    the rows on disk; close() (registered with atexit) flushes the rest.
+    """
+    def __init__(self, db=DB, max_batch=50, interval=2.0):
+        self.db = db
+        self.max_batch = max_batch
+        self.interval = interval
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = None
+
+    def append(self, row):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("audit writer is closed")
+            self._pending.append(row)
+            full = len(self._pending) >= self.max_batch
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="audit-writer", daemon=True
+                )
+                self._thread.start()
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # DB busy: rows stay queued for the next tick
+                pass
+
+    def flush(self):
+        """Write everything queued so far; returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            try:
+                conn = sqlite3.connect(self.db, timeout=10)
+                try:
+                    with conn:
+                        conn.executemany(_INSERT, batch)
+                finally:
+                    conn.close()
+            except sqlite3.Error:
+                with self._lock:
+                    self._pending[:0] = batch
+                raise
+            return len(batch)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        self._wake.set()
+        self.flush()
+
+writer = AuditWriter()
+atexit.register(writer.close)
+
+def _row(prescription_id, action, changes, user_id):
+    return (
         prescription_id,
         user_id,
         action,
+        # stamped now, not at flush time; same format as CURRENT_TIMESTAMP
+        datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
         json.dumps(changes) if changes else None
-    ))
-    conn.commit()
+    )
+
+def log_history(prescription_id, action, changes=None, user_id=None, cur=None):
+    """
+    Queue an audit row for the buffered writer. Pass `cur` to write it
+    inside the caller's transaction instead, so it commits (or rolls
+    back) with the change it describes.
+    """
+    row = _row(prescription_id, action, changes, user_id)
+    if cur is not None:
+        cur.execute(_INSERT, row)
+    else:
+        writer.append(row)
+
+def get_history(prescription_id):
+    """Audit rows for one prescription, oldest first (flushes the buffer first)."""
+    writer.flush()
+    conn = sqlite3.connect(DB)
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT history_id, user_id, action, timestamp, changes_json
+          FROM prescription_history
+         WHERE prescription_id = ?
+         ORDER BY timestamp, history_id
+    """, (prescription_id,))
+    rows = cur.fetchall()
     conn.close()
+    return rows
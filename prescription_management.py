@@ -2,12 +2,15 @@
 
 import sqlite3
 import inventory
+from item_catalogue import catalogue
+from prescription_audit import log_history
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QFormLayout,
     QTableWidget, QTableWidgetItem, QComboBox, QLineEdit,
-    QPlainTextEdit, QPushButton, QMessageBox
+    QPlainTextEdit, QPushButton, QMessageBox, QInputDialog
 )
 from PySide6.QtCore import Qt
+from perf_monitor import timed
 
 DB = "vet_management.db"
 
@@ -57,8 +60,12 @@ def create_prescription(patient_id, medication, dosage, instructions):
           (patient_id, medication, dosage, instructions, date_issued)
         VALUES (?, ?, ?, ?, datetime('now'))
     """, (patient_id, medication, dosage, instructions))
+    prescription_id = cur.lastrowid
     conn.commit()
     conn.close()
+    log_history(prescription_id, "Created",
+                {"patient_id": patient_id, "medication": medication,
+                 "dosage": dosage, "instructions": instructions})
 
 def update_prescription(prescription_id, **fields):
     cols, vals = zip(*fields.items())
@@ -72,6 +79,7 @@ def update_prescription(prescription_id, **fields):
     """, (*vals, prescription_id))
     conn.commit()
     conn.close()
+    log_history(prescription_id, "Updated", fields)
 
 def delete_prescription(prescription_id):
     conn = sqlite3.connect(DB)
@@ -79,6 +87,105 @@ def delete_prescription(prescription_id):
     cur.execute("DELETE FROM prescriptions WHERE prescription_id=?", (prescription_id,))
     conn.commit()
     conn.close()
+    log_history(prescription_id, "Deleted")
+
+# ── Dispensing API ───────────────────────────────────────────────────────
+def _dispense(cur, prescription_id, quantity, user_id):
+    """Dispense one prescription on `cur`; raises ValueError if it can't be."""
+    if quantity < 1:
+        raise ValueError("Quantity must be at least 1.")
+    cur.execute("""
+        SELECT medication, dispensed FROM prescriptions WHERE prescription_id = ?
+    """, (prescription_id,))
+    row = cur.fetchone()
+    if not row:
+        raise ValueError(f"Prescription #{prescription_id} not found.")
+    med_name, dispensed = row
+    if dispensed:
+        raise ValueError(f"Prescription #{prescription_id} is already dispensed.")
+    item = catalogue.resolve(med_name)
+    if not item:
+        raise ValueError(f"No inventory item named “{med_name}” found.")
+
+    # deducts only what the prescription has not taken yet, so a retry can never double-deduct
+    inventory.apply_source_deductions(
+        cur, "prescription", prescription_id, {item.item_id: quantity},
+        f"Dispensed Rx #{prescription_id}"
+    )
+    cur.execute("""
+        UPDATE prescriptions
+           SET dispensed = 1,
+               date_dispensed = datetime('now')
+         WHERE prescription_id = ?
+    """, (prescription_id,))
+    log_history(prescription_id, "Dispensed",
+                {"item_id": item.item_id, "item": item.name, "quantity": quantity},
+                user_id=user_id, cur=cur)
+    return item.name
+
+def dispense_prescription(prescription_id, quantity=1, user_id=None):
+    """
+    Deduct stock, mark the prescription dispensed and write its audit row
+    in a single BEGIN IMMEDIATE transaction. Returns the item name;
+    raises ValueError (nothing written) if it can't be dispensed.
+    """
+    conn = sqlite3.connect(DB, isolation_level=None)
+    cur = conn.cursor()
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        name = _dispense(cur, prescription_id, quantity, user_id)
+        cur.execute("COMMIT")
+        return name
+    except Exception:
+        if conn.in_transaction:
+            cur.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+def dispense_many(requests, user_id=None):
+    """
+    Dispense a queue of (prescription_id, quantity) pairs in one
+    transaction. Each prescription runs in its own savepoint, so one that
+    fails is skipped without undoing the rest.
+    Returns [(prescription_id, item name or None, error or None)].
+    """
+    results = []
+    conn = sqlite3.connect(DB, isolation_level=None)
+    cur = conn.cursor()
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        for prescription_id, quantity in requests:
+            cur.execute("SAVEPOINT rx")
+            try:
+                name = _dispense(cur, prescription_id, quantity, user_id)
+            except ValueError as e:
+                cur.execute("ROLLBACK TO rx")
+                results.append((prescription_id, None, str(e)))
+            else:
+                results.append((prescription_id, name, None))
+            cur.execute("RELEASE rx")
+        cur.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            cur.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return results
+
+def get_dispense_queue():
+    """Prescription ids not yet dispensed, oldest first."""
+    conn = sqlite3.connect(DB)
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT prescription_id FROM prescriptions
+         WHERE dispensed = 0
+         ORDER BY date_issued, prescription_id
+    """)
+    rows = [r[0] for r in cur.fetchall()]
+    conn.close()
+    return rows
 
 # ── GUI ──────────────────────────────────────────────────────────────────
 class PrescriptionManagementScreen(QWidget):
@@ -118,7 +225,9 @@ class PrescriptionManagementScreen(QWidget):
         self.save_btn     = QPushButton("Save")
         self.delete_btn   = QPushButton("Delete")
         self.dispense_btn = QPushButton("Dispense")
-        for b in (self.new_btn, self.save_btn, self.delete_btn, self.dispense_btn):
+        self.dispense_queue_btn = QPushButton("Dispense Queue")
+        for b in (self.new_btn, self.save_btn, self.delete_btn, self.dispense_btn,
+                  self.dispense_queue_btn):
             btns.addWidget(b)
         main.addLayout(btns)
 
@@ -127,6 +236,7 @@ class PrescriptionManagementScreen(QWidget):
         self.save_btn.clicked.connect(self.on_save)
         self.delete_btn.clicked.connect(self.on_delete)
         self.dispense_btn.clicked.connect(self.on_dispense)
+        self.dispense_queue_btn.clicked.connect(self.on_dispense_queue)
 
         self.dispense_btn.setEnabled(False)
         self.refresh()
@@ -220,60 +330,56 @@ class PrescriptionManagementScreen(QWidget):
         delete_prescription(self.selected_prescription_id)
         self.refresh()
 
+    @timed("prescriptions.on_dispense")
     def on_dispense(self):
-        """Deduct one unit of the medication from stock and mark dispensed."""
+        """Deduct the medication from stock and mark dispensed, atomically."""
         pid = self.selected_prescription_id
         if not pid:
             return
 
-        # 1) Get medication name
-        conn = sqlite3.connect(DB)
-        cur = conn.cursor()
-        cur.execute("SELECT medication FROM prescriptions WHERE prescription_id = ?", (pid,))
-        res = cur.fetchone()
-        conn.close()
-        if not res:
-            QMessageBox.warning(self, "Error", "Couldn’t find that prescription.")
+        qty, ok = QInputDialog.getInt(self, "Dispense", "Quantity:", 1, 1, 1000)
+        if not ok:
             return
-        med_name = res[0]
 
-        # 2) Lookup SKU
-        conn = sqlite3.connect(DB)
-        cur = conn.cursor()
-        cur.execute("SELECT item_id FROM items WHERE name = ?", (med_name,))
-        row = cur.fetchone()
-        conn.close()
-        if not row:
-            QMessageBox.warning(self, "No SKU",
-                                f"No inventory item named “{med_name}” found.")
-            return
-        item_id = row[0]
-
-        # 3) Deduct stock
         try:
-            inventory.adjust_stock(
-                item_id, -1,
-                f"Dispensed Rx #{pid}"
-            )
-        except Exception as e:
+            med_name = dispense_prescription(pid, qty)
+        except ValueError as e:
+            QMessageBox.warning(self, "Cannot Dispense", str(e))
+            return
+        except sqlite3.Error as e:
             QMessageBox.critical(self, "Error",
-                                 f"Could not adjust stock:\n{e}")
+                                 f"Could not dispense:\n{e}")
             return
 
-        # 4) Mark dispensed
-        conn = sqlite3.connect(DB)
-        cur  = conn.cursor()
-        cur.execute("""
-            UPDATE prescriptions
-               SET dispensed = 1,
-                   date_dispensed = datetime('now')
-             WHERE prescription_id = ?
-        """, (pid,))
-        conn.commit()
-        conn.close()
-
         QMessageBox.information(self, "Dispensed",
-                                f"1 × “{med_name}” removed from stock.")
+                                f"{qty} × “{med_name}” removed from stock.")
         self.dispense_btn.setEnabled(False)
         # Refresh the little checkmark in the table:
         self.refresh()
+
+    @timed("prescriptions.on_dispense_queue")
+    def on_dispense_queue(self):
+        """Dispense every outstanding prescription (1 unit each) in one go."""
+        queue = get_dispense_queue()
+        if not queue:
+            QMessageBox.information(self, "Dispense Queue", "Nothing left to dispense.")
+            return
+        if QMessageBox.question(
+            self, "Dispense Queue",
+            f"Dispense {len(queue)} outstanding prescription(s), 1 unit each?"
+        ) != QMessageBox.Yes:
+            return
+
+        try:
+            results = dispense_many([(pid, 1) for pid in queue])
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "Error", f"Could not dispense:\n{e}")
+            return
+
+        done = [r for r in results if r[2] is None]
+        failed = [f"Rx #{pid}: {err}" for pid, _, err in results if err]
+        msg = f"{len(done)} prescription(s) dispensed."
+        if failed:
+            msg += "\n\nSkipped:\n" + "\n".join(failed)
+        QMessageBox.information(self, "Dispense Queue", msg)
+        self.refresh()
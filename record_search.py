@@ -0,0 +1,160 @@
+# record_search.py
+"""
+Full-text search over the SOAP fields of medical_records.
+
+medical_records_fts is an FTS5 index with medical_records as its external
+content table, kept current by triggers. Searches return one page of
+records, newest first, each with a short snippet of the best-matching
+field; matched words are wrapped in HIT_START / HIT_END so the screen can
+highlight them after escaping the text.
+"""
+import re
+import sqlite3
+
+DB = "vet_management.db"
+PAGE_SIZE = 50
+HIT_START, HIT_END = "\x02", "\x03"
+
+_COLUMNS = ("chief_complaint", "subjective", "objective", "assessment", "plan", "diagnosis")
+
+def _trigger_values(prefix):
+    return ", ".join(f"{prefix}.{c}" for c in _COLUMNS)
+
+_FTS_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS trg_medical_records_fts_ai AFTER INSERT ON medical_records BEGIN
+    INSERT INTO medical_records_fts (rowid, {cols}) VALUES (new.record_id, {new});
+END;
+CREATE TRIGGER IF NOT EXISTS trg_medical_records_fts_ad AFTER DELETE ON medical_records BEGIN
+    INSERT INTO medical_records_fts (medical_records_fts, rowid, {cols})
+    VALUES ('delete', old.record_id, {old});
+END;
+CREATE TRIGGER IF NOT EXISTS trg_medical_records_fts_au
+AFTER UPDATE OF {cols} ON medical_records BEGIN
+    INSERT INTO medical_records_fts (medical_records_fts, rowid, {cols})
+    VALUES ('delete', old.record_id, {old});
+    INSERT INTO medical_records_fts (rowid, {cols}) VALUES (new.record_id, {new});
+END;
+""".format(cols=", ".join(_COLUMNS), new=_trigger_values("new"), old=_trigger_values("old"))
+
+# ── Schema ───────────────────────────────────────────────────────────────
+def ensure_record_index():
+    conn = sqlite3.connect(DB)
+    cur = conn.cursor()
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='medical_records'")
+    if cur.fetchone() is None:
+        conn.close()
+        return  # init_db.py has not run yet
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='medical_records_fts'")
+    fresh = cur.fetchone() is None
+    cur.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS medical_records_fts USING fts5(
+            {", ".join(_COLUMNS)},
+            content='medical_records', content_rowid='record_id',
+            tokenize='porter unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    """)
+    cur.executescript(_FTS_TRIGGERS)
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_medical_records_date ON medical_records (date_created)")
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_medical_records_patient ON medical_records (patient_id, date_created)")
+    if fresh:
+        cur.execute("INSERT INTO medical_records_fts (medical_records_fts) VALUES ('rebuild')")
+    conn.commit()
+    conn.close()
+
+# ── Search ───────────────────────────────────────────────────────────────
+def match_query(text):
+    """
+    FTS5 query for free text typed by a vet: every word must appear,
+    "quoted phrases" are kept together and a trailing * makes a word a
+    prefix ("pancrea*" → pancreatitis).
+    """
+    terms = []
+    for phrase, word, star in re.findall(r'"([^"]+)"|(\w+)(\*?)', text or ""):
+        if phrase:
+            words = re.findall(r"\w+", phrase)
+            if words:
+                terms.append('"' + " ".join(words) + '"')
+        else:
+            terms.append(f'"{word}"{star}')
+    return " AND ".join(terms)
+
+def search_records(text="", patient="", vet="", start_date=None, end_date=None, page=0):
+    """
+    One page of records as
+    (record_id, date_created, patient, appointment_id, vet, chief_complaint,
+     diagnosis, follow_up_date, snippet), newest first. `snippet` is ''
+    when `text` is empty. Returns (rows, has_next).
+    """
+    where, params = [], []
+    query = match_query(text)
+    if query:
+        where.append("medical_records_fts MATCH ?")
+        params.append(query)
+    if patient:
+        where.append("p.name LIKE ?")
+        params.append(f"%{patient}%")
+    if vet:
+        where.append("mr.vet_name LIKE ?")
+        params.append(f"%{vet}%")
+    # date_created is 'YYYY-MM-DD HH:MM:SS', so plain comparisons keep the index usable
+    if start_date:
+        where.append("mr.date_created >= ?")
+        params.append(start_date)
+    if end_date:
+        where.append("mr.date_created < DATE(?, '+1 day')")
+        params.append(end_date)
+
+    if query:
+        source = """
+              FROM medical_records_fts
+              JOIN medical_records mr ON mr.record_id = medical_records_fts.rowid
+        """
+        # records are stamped with CURRENT_TIMESTAMP on insert, so rowid order
+        # is date order; FTS5 walks rowids newest first and stops at the page
+        # instead of sorting every match of a common word
+        order = "medical_records_fts.rowid DESC"
+    else:
+        source = "FROM medical_records mr"
+        order = "mr.date_created DESC, mr.record_id DESC"
+
+    conn = sqlite3.connect(DB)
+    cur = conn.cursor()
+    # pick the page first; snippets are then built for PAGE_SIZE rows only
+    cur.execute(f"""
+        SELECT mr.record_id
+          {source}
+          JOIN patients p ON mr.patient_id = p.patient_id
+         {"WHERE " + " AND ".join(where) if where else ""}
+         ORDER BY {order}
+         LIMIT ? OFFSET ?
+    """, params + [PAGE_SIZE + 1, max(page, 0) * PAGE_SIZE])
+    ids = [r[0] for r in cur.fetchall()]
+    has_next = len(ids) > PAGE_SIZE
+    ids = ids[:PAGE_SIZE]
+
+    snippets = {}
+    if query and ids:
+        cur.execute(f"""
+            SELECT rowid,
+                   snippet(medical_records_fts, -1, '{HIT_START}', '{HIT_END}', '…', 12)
+              FROM medical_records_fts
+             WHERE medical_records_fts MATCH ?
+               AND rowid IN ({",".join("?" * len(ids))})
+        """, [query] + ids)
+        snippets = dict(cur.fetchall())
+
+    cur.execute(f"""
+        SELECT mr.record_id, mr.date_created, p.name,
+               COALESCE(mr.appointment_id, ''),
+               COALESCE(mr.vet_name,''),
+               COALESCE(mr.chief_complaint,''),
+               COALESCE(mr.diagnosis,''),
+               COALESCE(mr.follow_up_date,'')
+          FROM medical_records mr
+          JOIN patients p ON mr.patient_id = p.patient_id
+         WHERE mr.record_id IN ({",".join("?" * len(ids)) or "NULL"})
+    """, ids)
+    by_id = {row[0]: row for row in cur.fetchall()}
+    rows = [by_id[i] + (snippets.get(i, ""),) for i in ids]
+    conn.close()
+    return rows, has_next
@@ -0,0 +1,130 @@
+# reorder_forecast.py
+"""
+Consumption-velocity reorder suggestions.
+
+Outgoing stock_movements are pivoted into one (items × days) NumPy
+matrix, and every statistic below is computed column-wise over all
+items in a single pass instead of per SKU.
+"""
+import sqlite3
+from datetime import date, timedelta
+from statistics import NormalDist
+
+import numpy as np
+
+import inventory
+
+DB = inventory.DB
+
+def load_daily_consumption(history_days=90, end=None):
+    """
+    Return (item_ids, usage) where usage[i, d] is the quantity of
+    item_ids[i] taken out of stock on day d of the window ending `end`.
+    """
+    end = end or date.today()
+    start = end - timedelta(days=history_days - 1)
+
+    conn = sqlite3.connect(DB)
+    cur = conn.cursor()
+    cur.execute("SELECT item_id FROM items ORDER BY item_id")
+    item_ids = np.fromiter((r[0] for r in cur.fetchall()), dtype=np.int64)
+    cur.execute("""
+        SELECT item_id,
+               CAST(julianday(DATE(timestamp)) - julianday(?) AS INTEGER) AS day,
+               -SUM(change_qty)
+          FROM stock_movements
+         WHERE change_qty < 0
+           AND timestamp >= ? AND timestamp < DATE(?, '+1 day')
+         GROUP BY item_id, day
+    """, (start.isoformat(), start.isoformat(), end.isoformat()))
+    rows = np.array(cur.fetchall(), dtype=np.float64).reshape(-1, 3)
+    conn.close()
+
+    usage = np.zeros((item_ids.size, history_days), dtype=np.float64)
+    if rows.size:
+        # items are sorted, so searchsorted maps item_id → row index
+        idx = np.searchsorted(item_ids, rows[:, 0].astype(np.int64))
+        known = (idx < item_ids.size) & (item_ids[np.minimum(idx, item_ids.size - 1)] == rows[:, 0])
+        np.add.at(usage, (idx[known], rows[known, 1].astype(np.int64)), rows[known, 2])
+    return item_ids, usage
+
+def forecast(usage, on_hand, lead_time_days=7, review_days=14,
+             service_level=0.95, window=7, threshold=None):
+    """
+    Vectorized statistics for every row of `usage` (items × days).
+
+    Returns a dict of arrays: avg_daily, std_daily, recent_daily (rolling
+    mean over the last `window` days), days_of_cover, reorder_point and
+    order_qty. The reorder point covers expected demand over the lead
+    time plus safety stock for the target service level; the order
+    quantity tops stock up to the higher of the reorder point and the
+    static `threshold`, plus one review period's demand, so an item with
+    no recent usage is still brought back above its threshold.
+    """
+    on_hand = np.asarray(on_hand, dtype=np.float64)
+    threshold = np.zeros_like(on_hand) if threshold is None else np.asarray(threshold, dtype=np.float64)
+    n_days = usage.shape[1]
+
+    avg = usage.mean(axis=1)
+    std = usage.std(axis=1, ddof=1) if n_days > 1 else np.zeros_like(avg)
+
+    window = max(1, min(window, n_days))
+    csum = np.cumsum(usage, axis=1)
+    rolling = (csum[:, window - 1:] - np.pad(csum, ((0, 0), (1, 0)))[:, :n_days - window + 1]) / window
+    recent = rolling[:, -1]
+
+    # plan on whichever rate is higher so a recent surge is not averaged away
+    rate = np.maximum(avg, recent)
+    z = NormalDist().inv_cdf(service_level)
+    safety = z * std * np.sqrt(lead_time_days)
+    reorder_point = np.ceil(rate * lead_time_days + safety)
+    target = np.maximum(rate * lead_time_days + safety, threshold) + rate * review_days
+    order_qty = np.maximum(0, np.ceil(target - on_hand))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cover = np.where(rate > 0, np.maximum(on_hand, 0) / rate, np.inf)
+
+    return {
+        "avg_daily": avg,
+        "std_daily": std,
+        "recent_daily": recent,
+        "days_of_cover": cover,
+        "reorder_point": reorder_point,
+        "order_qty": order_qty,
+    }
+
+def reorder_suggestions(history_days=90, lead_time_days=7, review_days=14,
+                        service_level=0.95, window=7, only_needed=True):
+    """
+    One row per item for the reorder report:
+    (item_id, name, on_hand, reorder_threshold, avg_daily, std_daily,
+     recent_daily, days_of_cover, suggested_reorder_point, suggested_order_qty)
+
+    With `only_needed`, items above both their static threshold and the
+    suggested reorder point are left out. days_of_cover is None for an
+    item with no usage, so the column stays numeric (an empty CSV cell).
+    """
+    items = inventory.get_all_items()
+    item_ids, usage = load_daily_consumption(history_days)
+    # get_all_items has no ORDER BY; align on the sorted id array
+    by_id = {row[0]: row for row in items}
+    on_hand = np.array([by_id[i][5] for i in item_ids], dtype=np.float64)
+    threshold = np.array([by_id[i][6] for i in item_ids], dtype=np.float64)
+
+    f = forecast(usage, on_hand, lead_time_days, review_days, service_level, window, threshold)
+    needed = (on_hand <= threshold) | (on_hand <= f["reorder_point"])
+
+    rows = []
+    for k in (np.flatnonzero(needed) if only_needed else range(item_ids.size)):
+        item = by_id[int(item_ids[k])]
+        cover = f["days_of_cover"][k]
+        rows.append((
+            item[0], item[1], item[5], item[6],
+            round(float(f["avg_daily"][k]), 2),
+            round(float(f["std_daily"][k]), 2),
+            round(float(f["recent_daily"][k]), 2),
+            None if np.isinf(cover) else round(float(cover), 1),
+            int(f["reorder_point"][k]),
+            int(f["order_qty"][k]),
+        ))
+    return rows
@@ -0,0 +1,120 @@
+# report_cache.py
+"""
+In-memory cache for Reports & Analytics results and chart images.
+
+Entries are keyed by (report id, parameters, data versions). Each source
+table has a counter in report_data_versions that triggers bump on every
+insert, update and delete, so any write to a table a report reads
+produces a new key and the stale entry simply ages out of the LRU.
+
+An entry holds named parts ("data", "png", ...) and the cache evicts the
+least recently used entries once their estimated size passes MAX_BYTES.
+"""
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+
+DB = "vet_management.db"
+MAX_BYTES = 32 * 1024 * 1024
+
+# tables whose writes invalidate cached reports
+TRACKED_TABLES = ("invoices", "invoice_items", "payment_history", "appointments", "patients",
+                  "vet_roster")
+
+# ── Schema ───────────────────────────────────────────────────────────────
+def ensure_version_table():
+    conn = sqlite3.connect(DB)
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS report_data_versions (
+            table_name  TEXT PRIMARY KEY,
+            version     INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    tables = {r[0] for r in cur.fetchall()}
+    for table in TRACKED_TABLES:
+        if table not in tables:
+            continue  # init_db.py has not created it yet
+        cur.execute("INSERT OR IGNORE INTO report_data_versions (table_name) VALUES (?)", (table,))
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            cur.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event.lower()}
+                AFTER {event} ON {table} BEGIN
+                    UPDATE report_data_versions SET version = version + 1
+                     WHERE table_name = '{table}';
+                END
+            """)
+    conn.commit()
+    conn.close()
+
+def versions(tables):
+    """Current version counters for `tables`, in the order given."""
+    conn = sqlite3.connect(f"file:{DB}?mode=ro", uri=True)
+    try:
+        found = dict(conn.execute(
+            f"SELECT table_name, version FROM report_data_versions "
+            f"WHERE table_name IN ({','.join('?' * len(tables))})",
+            list(tables)
+        ).fetchall())
+    finally:
+        conn.close()
+    return tuple(found.get(t, 0) for t in tables)
+
+# ── LRU ──────────────────────────────────────────────────────────────────
+_lock = threading.Lock()
+_entries = OrderedDict()        # key → {part: value}
+_sizes = {}                     # key → estimated bytes
+_total = 0
+
+def _size_of(value):
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_size_of(v) for v in value)
+    return sys.getsizeof(value)
+
+def make_key(report_id, params, tables):
+    return (report_id, tuple(params), versions(tables))
+
+def get(key, part="data"):
+    """Cached `part` of `key`, or None."""
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None or part not in entry:
+            return None
+        _entries.move_to_end(key)
+        return entry[part]
+
+def put(key, part, value):
+    global _total
+    with _lock:
+        entry = _entries.setdefault(key, {})
+        entry[part] = value
+        _entries.move_to_end(key)
+        size = sum(_size_of(v) for v in entry.values())
+        _total += size - _sizes.get(key, 0)
+        _sizes[key] = size
+        while _total > MAX_BYTES and len(_entries) > 1:
+            old, _ = _entries.popitem(last=False)
+            _total -= _sizes.pop(old)
+
+def clear():
+    global _total
+    with _lock:
+        _entries.clear()
+        _sizes.clear()
+        _total = 0
+
+def fetch(report_id, params, tables, query):
+    """
+    (key, data) for a report: `query(*params)` runs only when no entry
+    exists for the current data versions of `tables`.
+    """
+    key = make_key(report_id, params, tables)
+    data = get(key)
+    if data is None:
+        data = query(*params)
+        put(key, "data", data)
+    return key, data
@@ -0,0 +1,282 @@
+# report_charts.py
+"""
+Charts and PDF layouts for the analytics reports, without any Qt.
+
+* ChartFigure keeps one Figure and Axes per chart. Showing new data
+  resizes the existing bars when the categories are unchanged and only
+  redraws the axes otherwise; no Figure or canvas is recreated.
+* render_png() draws an export chart on the Agg backend into a reused
+  per-report figure and caches the PNG bytes in report_cache, so it is safe
+  to call from worker threads and repeat exports cost nothing.
+* chart_image() wraps those bytes in a reportlab ImageReader, which
+  decodes them through PIL, and caches the reader next to them, so a
+  repeat export skips the decode. reportlab still Flate-compresses the
+  pixels into every PDF; write_pdf() lays a report out around it.
+
+The Reports & Analytics screen wraps ChartFigure.figure in a Qt canvas;
+the command-line report generator uses this module on its own.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas as pdf_canvas
+
+import appointment_heatmap
+import report_cache
+
+DAYS = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+SCREEN_FIGSIZE = (6, 4)
+EXPORT_FIGSIZE = (6, 3.5)
+EXPORT_DPI = 100
+
+# ── Charts ───────────────────────────────────────────────────────────────
+def _series(report_id, data):
+    """(labels, values) for a report's rows."""
+    if report_id == "busiest_days":
+        return DAYS, list(data)
+    if report_id == "vet_utilization":
+        data = [(row[0], row[1:]) for row in data.summary]
+    if not data:
+        return (), ()
+    labels, values = zip(*data)
+    return list(labels), list(values)
+
+def _draw(ax, report_id, labels, values):
+    """Draw a report onto cleared axes; returns its BarContainer, if any."""
+    bars = None
+    if report_id == "revenue_by_month":
+        bars = ax.bar(labels, values)
+        ax.set_title("Revenue by Month")
+        ax.set_ylabel("€")
+        ax.set_xlabel("Month")
+        ax.tick_params(axis='x', rotation=45)
+    elif report_id == "appointments_by_species":
+        ax.pie(values, labels=labels, autopct='%1.1f%%', startangle=140)
+        ax.set_title("Appointments by Species")
+    elif report_id == "top_items":
+        bars = ax.barh(labels, values)
+        ax.set_title("Top-Selling Medications/Items")
+        ax.set_xlabel("Units Sold")
+        ax.invert_yaxis()
+    elif report_id == "busiest_days":
+        bars = ax.bar(range(7), values)
+        ax.set_title("Appointments by Day of Week")
+        ax.set_ylabel("Number of Appointments")
+        ax.set_xticks(range(7))
+        ax.set_xticklabels(labels, rotation=45)
+    elif report_id == "appointments_by_vet":
+        bars = ax.bar(range(len(labels)), values)
+        ax.set_title("Appointments by Veterinarian")
+        ax.set_ylabel("Appointments")
+        ax.set_xticks(range(len(labels)))
+        ax.set_xticklabels(labels, rotation=45)
+    elif report_id == "vet_utilization":
+        # values: summary rows without the vet; rostered and booked minutes first
+        xs = range(len(labels))
+        rostered = [v[0] / 60 for v in values]
+        booked = [v[1] / 60 for v in values]
+        ax.bar([x - 0.2 for x in xs], rostered, width=0.4, label="Rostered")
+        ax.bar([x + 0.2 for x in xs], booked, width=0.4, label="Booked")
+        for x, r, b in zip(xs, rostered, booked):
+            if r:
+                ax.text(x + 0.2, b, f"{b / r:.0%}", ha='center', va='bottom', fontsize=8)
+        ax.set_title("Veterinarian Utilization")
+        ax.set_ylabel("Hours")
+        ax.set_xticks(list(xs))
+        ax.set_xticklabels(labels, rotation=45)
+        ax.legend()
+    else:
+        raise ValueError(f"Unknown report: {report_id}")
+    return bars
+
+
+class ChartFigure:
+    """
+    One reusable Figure/Axes pair for a report chart. A figure that has
+    shown the heatmap keeps its colour bar, so give the heatmap its own.
+    """
+    def __init__(self, figsize=SCREEN_FIGSIZE):
+        self.figure = Figure(figsize=figsize)
+        self.ax = self.figure.add_subplot(111)
+        self._shown = None        # (report id, labels) the bars belong to
+        self._bars = None
+        self._image = None        # heatmap AxesImage
+
+    def show(self, report_id, data):
+        if report_id == "appointment_heatmap":
+            self._show_heatmap(data)
+            return
+        labels, values = _series(report_id, data)
+        if self._bars is not None and self._shown == (report_id, list(labels)):
+            # same categories: move the existing bars instead of redrawing
+            horizontal = report_id == "top_items"
+            for rect, v in zip(self._bars, values):
+                if horizontal:
+                    rect.set_width(v)
+                else:
+                    rect.set_height(v)
+            self.ax.relim()
+            self.ax.autoscale_view()
+            return
+        self.ax.clear()
+        self._bars = None
+        self._shown = None
+        if not values:
+            self.ax.text(0.5, 0.5, "No data", ha='center')
+            return
+        self._bars = _draw(self.ax, report_id, labels, values)
+        self._shown = (report_id, list(labels))
+
+    def _show_heatmap(self, grid):
+        """Draw a HeatmapGrid; later grids only replace the image data."""
+        minutes = grid.minutes
+        slots = minutes.shape[1]
+        if self._image is None:
+            self.ax.clear()
+            self._bars = self._shown = None
+            self._image = self.ax.imshow(minutes, aspect='auto', cmap='YlOrRd', interpolation='nearest')
+            self.figure.colorbar(self._image, ax=self.ax, label="Booked minutes")
+            self.ax.set_title("Booked Minutes by Weekday and Time")
+            self.ax.set_yticks(range(7))
+            self.ax.set_yticklabels(DAYS)
+            self.ax.set_xlabel("Time of day")
+            self.figure.subplots_adjust(left=0.17)      # room for the weekday names
+        else:
+            self._image.set_data(minutes)
+            self._image.set_extent((-0.5, slots - 0.5, 6.5, -0.5))
+        self._image.set_clim(0, max(float(minutes.max()), 1.0))
+        per_hour = slots // 24
+        self.ax.set_xticks(range(0, slots, 3 * per_hour))
+        self.ax.set_xticklabels([f"{h:02d}:00" for h in range(0, 24, 3)])
+
+
+_render_lock = threading.Lock()
+_export_charts = {}               # report id → ChartFigure on an Agg canvas
+
+def render_png(report_id, data, key=None):
+    """
+    PNG bytes of the export-sized chart. With a report_cache `key` the
+    bytes are cached and later calls skip the render.
+    """
+    if key is not None:
+        png = report_cache.get(key, "png")
+        if png is not None:
+            return png
+    with _render_lock:
+        chart = _export_charts.get(report_id)
+        if chart is None:
+            chart = _export_charts[report_id] = ChartFigure(EXPORT_FIGSIZE)
+            FigureCanvasAgg(chart.figure)
+        chart.show(report_id, data)
+        chart.figure.tight_layout()
+        buf = BytesIO()
+        chart.figure.savefig(buf, format='png', dpi=EXPORT_DPI)
+    png = buf.getvalue()
+    if key is not None:
+        report_cache.put(key, "png", png)
+    return png
+
+
+class _ChartImage(ImageReader):
+    """ImageReader that counts its decoded pixels towards report_cache's size limit."""
+    def __sizeof__(self):
+        width, height = self.getSize()
+        # the decoded RGBA image plus the RGB bytes drawImage() keeps on the reader
+        return super().__sizeof__() + 7 * width * height
+
+def chart_image(report_id, data, key=None):
+    """
+    render_png() as an ImageReader. With a report_cache `key` the reader,
+    and the pixels it decodes on first use, are cached with the PNG.
+    """
+    if key is not None:
+        image = report_cache.get(key, "image")
+        if image is not None:
+            return image
+    image = _ChartImage(BytesIO(render_png(report_id, data, key)))
+    if key is not None:
+        report_cache.put(key, "image", image)
+    return image
+
+# ── PDF ──────────────────────────────────────────────────────────────────
+# report id → (default file name, document title, heading, row formatter)
+PDF_LAYOUTS = {
+    "revenue_by_month": ("revenue_report.pdf", "Revenue Report",
+                         "Pet Wellness Vets – Revenue Summary",
+                         lambda row: f"{row[0]}: €{row[1]:.2f}"),
+    "appointments_by_species": ("species_report.pdf", "Species Report",
+                                "Pet Wellness Vets – Appointments by Species",
+                                lambda row: f"{row[0]}: {row[1]} appointments"),
+    "top_items": ("top_items_report.pdf", "Top Items Report",
+                  "Pet Wellness Vets – Top Medications/Items",
+                  lambda row: f"{row[0]}: {row[1]} units"),
+    "busiest_days": ("busiest_days.pdf", "Busiest Days Report",
+                     "Pet Wellness Vets – Busiest Days",
+                     lambda row: f"{row[0]}: {row[1]} appointments"),
+    "appointments_by_vet": ("appointments_by_vet.pdf", "Appointments by Vet Report",
+                            "Pet Wellness Vets – Appointments by Vet",
+                            lambda row: f"{row[0]}: {row[1]} appointments"),
+    "vet_utilization": ("vet_utilization.pdf", "Vet Utilization Report",
+                        "Pet Wellness Vets – Veterinarian Utilization",
+                        lambda row: (f"{row[0]}: {row[2] / 60:.1f} h booked of {row[1] / 60:.1f} h rostered"
+                                     f" ({row[2] / row[1] if row[1] else 0:.0%}), idle {row[4] / 60:.1f} h,"
+                                     f" longest gap {row[5]} min, overbooked {row[6]} min,"
+                                     f" outside roster {row[3] / 60:.1f} h")),
+    "appointment_heatmap": ("appointment_heatmap.pdf", "Appointment Heatmap Report",
+                            "Pet Wellness Vets – Busiest Times of the Week",
+                            lambda row: f"{row[0]}: {row[1]} booked minutes"),
+}
+
+def write_pdf(path, report_id, data, start, end, image, subtitle=""):
+    """Write one report's PDF: heading, date range, chart (an ImageReader) and one line per row."""
+    _, title, heading, fmt = PDF_LAYOUTS[report_id]
+    if report_id == "busiest_days":
+        rows = list(zip(DAYS, data))
+    elif report_id == "appointment_heatmap":
+        rows = appointment_heatmap.busiest_slots(data)
+    elif report_id == "vet_utilization":
+        rows = data.summary
+    else:
+        rows = data
+
+    pdf = pdf_canvas.Canvas(path, pagesize=A4)
+    width, height = A4
+    pdf.setTitle(title)
+
+    pdf.setFont("Helvetica-Bold", 16)
+    pdf.drawString(50, height - 50, heading)
+
+    pdf.setFont("Helvetica", 10)
+    pdf.drawString(50, height - 70, f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
+    pdf.drawString(50, height - 85, f"From {start} to {end}")
+    if subtitle:
+        pdf.drawString(50, height - 100, subtitle)
+
+    # a cached reader is already decoded; drawImage() compresses its pixels into the PDF
+    pdf.drawImage(image, 50, height - 400, width=500, height=250)
+
+    y = height - 420
+    pdf.setFont("Helvetica", 10)
+    for row in rows:
+        pdf.drawString(60, y, fmt(row))
+        y -= 15
+
+    if report_id == "revenue_by_month":
+        pdf.setFont("Helvetica-Bold", 12)
+        pdf.drawString(60, y - 10, f"Total Revenue: €{sum(amount for _, amount in rows):.2f}")
+    pdf.save()
+
+def export_pdf(path, report_id, data, start, end, key=None, subtitle=""):
+    write_pdf(path, report_id, data, start, end, chart_image(report_id, data, key), subtitle)
+
+_export_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chart-export")
+
+def export_pdf_async(path, report_id, data, start, end, key=None, subtitle=""):
+    """export_pdf() on a background thread; returns its Future."""
+    return _export_executor.submit(export_pdf, path, report_id, data, start, end, key, subtitle)
@@ -0,0 +1,361 @@
+# report_rollups.py
+"""
+Daily rollup tables behind the Reports & Analytics screen.
+
+* rollup_revenue_daily      — invoices and revenue per day
+* rollup_appointments       — appointments and booked minutes per
+                              day × vet × species × hour (weekday stored)
+* rollup_items_daily        — units sold per day × item description
+
+Triggers on invoices, invoice_items, appointments and patients apply
+signed deltas as rows change, so a report over any range only reads a
+few rows per day and the rollups stay exact without a periodic rebuild.
+drifted_months() compares them with the base tables and repair_rollups()
+rebuilds only the months that differ (python -m reports rollups --repair),
+for a database edited with the triggers missing or disabled.
+"""
+import sqlite3
+
+import appointment_heatmap
+import vet_utilization
+
+DB = "vet_management.db"
+
+_TABLES = """
+CREATE TABLE IF NOT EXISTS rollup_revenue_daily (
+    day       TEXT PRIMARY KEY,           -- DATE(invoices.created_at)
+    invoices  INTEGER NOT NULL DEFAULT 0,
+    revenue   REAL    NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS rollup_appointments (
+    day           TEXT    NOT NULL,       -- DATE(appointments.date_time)
+    veterinarian  TEXT    NOT NULL,
+    species       TEXT    NOT NULL,       -- '' when the patient is gone
+    hour          INTEGER NOT NULL,
+    weekday       INTEGER NOT NULL,       -- 0 = Sunday, as strftime('%w')
+    appointments  INTEGER NOT NULL DEFAULT 0,
+    minutes       INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, veterinarian, species, hour)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS rollup_items_daily (
+    day          TEXT    NOT NULL,        -- DATE() of the parent invoice
+    description  TEXT    NOT NULL,
+    quantity     INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, description)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS rollup_meta (
+    key    TEXT PRIMARY KEY,
+    value  TEXT
+);
+"""
+
+# ── Delta statements ─────────────────────────────────────────────────────
+# Every change is an upsert of signed amounts; {sign} is +1 or -1 and
+# {r} the NEW/OLD row.
+def _revenue_delta(r, sign):
+    return f"""
+    INSERT INTO rollup_revenue_daily (day, invoices, revenue)
+    SELECT DATE({r}.created_at), {sign}, {sign} * COALESCE({r}.final_amount, 0)
+     WHERE DATE({r}.created_at) IS NOT NULL
+    ON CONFLICT (day) DO UPDATE SET
+        invoices = invoices + excluded.invoices,
+        revenue  = revenue  + excluded.revenue;
+    """
+
+def _appointment_delta(r, sign):
+    return f"""
+    INSERT INTO rollup_appointments (day, veterinarian, species, hour, weekday, appointments, minutes)
+    SELECT DATE({r}.date_time), COALESCE({r}.veterinarian, ''),
+           COALESCE((SELECT species FROM patients WHERE patient_id = {r}.patient_id), ''),
+           CAST(strftime('%H', {r}.date_time) AS INTEGER),
+           CAST(strftime('%w', {r}.date_time) AS INTEGER),
+           {sign}, {sign} * COALESCE({r}.duration_minutes, 30)
+     WHERE DATE({r}.date_time) IS NOT NULL
+    ON CONFLICT (day, veterinarian, species, hour) DO UPDATE SET
+        appointments = appointments + excluded.appointments,
+        minutes      = minutes      + excluded.minutes;
+    """
+
+def _patient_species_delta(patient_id, species, sign):
+    """Move all of one patient's appointments in or out of `species`."""
+    return f"""
+    INSERT INTO rollup_appointments (day, veterinarian, species, hour, weekday, appointments, minutes)
+    SELECT DATE(a.date_time), COALESCE(a.veterinarian, ''), {species},
+           CAST(strftime('%H', a.date_time) AS INTEGER),
+           CAST(strftime('%w', a.date_time) AS INTEGER),
+           {sign} * COUNT(*), {sign} * SUM(COALESCE(a.duration_minutes, 30))
+      FROM appointments a
+     WHERE a.patient_id = {patient_id} AND DATE(a.date_time) IS NOT NULL
+     GROUP BY 1, 2, 4
+    ON CONFLICT (day, veterinarian, species, hour) DO UPDATE SET
+        appointments = appointments + excluded.appointments,
+        minutes      = minutes      + excluded.minutes;
+    """
+
+def _item_delta(r, sign):
+    return f"""
+    INSERT INTO rollup_items_daily (day, description, quantity)
+    SELECT DATE(i.created_at), {r}.description, {sign} * {r}.quantity
+      FROM invoices i
+     WHERE i.invoice_id = {r}.invoice_id AND DATE(i.created_at) IS NOT NULL
+    ON CONFLICT (day, description) DO UPDATE SET quantity = quantity + excluded.quantity;
+    """
+
+def _invoice_items_delta(invoice_id, day, sign):
+    """Move all of one invoice's items in or out of `day`."""
+    return f"""
+    INSERT INTO rollup_items_daily (day, description, quantity)
+    SELECT {day}, ii.description, {sign} * SUM(ii.quantity)
+      FROM invoice_items ii
+     WHERE ii.invoice_id = {invoice_id} AND {day} IS NOT NULL
+     GROUP BY ii.description
+    ON CONFLICT (day, description) DO UPDATE SET quantity = quantity + excluded.quantity;
+    """
+
+_TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS trg_invoices_rollup_ai AFTER INSERT ON invoices BEGIN
+    {_revenue_delta("NEW", 1)}
+END;
+CREATE TRIGGER IF NOT EXISTS trg_invoices_rollup_au
+AFTER UPDATE OF created_at, final_amount ON invoices BEGIN
+    {_revenue_delta("OLD", -1)}
+    {_revenue_delta("NEW", 1)}
+    {_invoice_items_delta("OLD.invoice_id", "DATE(OLD.created_at)", -1)}
+    {_invoice_items_delta("NEW.invoice_id", "DATE(NEW.created_at)", 1)}
+END;
+CREATE TRIGGER IF NOT EXISTS trg_invoices_rollup_ad AFTER DELETE ON invoices BEGIN
+    {_revenue_delta("OLD", -1)}
+    {_invoice_items_delta("OLD.invoice_id", "DATE(OLD.created_at)", -1)}
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_invoice_items_rollup_ai AFTER INSERT ON invoice_items BEGIN
+    {_item_delta("NEW", 1)}
+END;
+CREATE TRIGGER IF NOT EXISTS trg_invoice_items_rollup_au
+AFTER UPDATE OF invoice_id, description, quantity ON invoice_items BEGIN
+    {_item_delta("OLD", -1)}
+    {_item_delta("NEW", 1)}
+END;
+CREATE TRIGGER IF NOT EXISTS trg_invoice_items_rollup_ad AFTER DELETE ON invoice_items BEGIN
+    {_item_delta("OLD", -1)}
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_appointments_rollup_ai AFTER INSERT ON appointments BEGIN
+    {_appointment_delta("NEW", 1)}
+END;
+CREATE TRIGGER IF NOT EXISTS trg_appointments_rollup_au
+AFTER UPDATE OF patient_id, date_time, veterinarian, duration_minutes ON appointments BEGIN
+    {_appointment_delta("OLD", -1)}
+    {_appointment_delta("NEW", 1)}
+END;
+CREATE TRIGGER IF NOT EXISTS trg_appointments_rollup_ad AFTER DELETE ON appointments BEGIN
+    {_appointment_delta("OLD", -1)}
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_patients_rollup_au
+AFTER UPDATE OF species ON patients BEGIN
+    {_patient_species_delta("OLD.patient_id", "COALESCE(OLD.species, '')", -1)}
+    {_patient_species_delta("NEW.patient_id", "COALESCE(NEW.species, '')", 1)}
+END;
+CREATE TRIGGER IF NOT EXISTS trg_patients_rollup_ad AFTER DELETE ON patients BEGIN
+    {_patient_species_delta("OLD.patient_id", "COALESCE(OLD.species, '')", -1)}
+    {_patient_species_delta("OLD.patient_id", "''", 1)}
+END;
+"""
+
+# (rollup, its columns, the same rows from the base tables for the days
+#  :first to :last, the columns compared by drifted_months(), rows worth keeping)
+_ROLLUPS = (
+    ("rollup_revenue_daily", "day, invoices, revenue", """
+        SELECT DATE(created_at) AS day, COUNT(*) AS invoices, SUM(COALESCE(final_amount, 0)) AS revenue
+          FROM invoices
+         WHERE DATE(created_at) BETWEEN :first AND :last
+         GROUP BY 1
+    """, "day, invoices, ROUND(revenue, 2)", "invoices != 0"),
+    ("rollup_appointments", "day, veterinarian, species, hour, weekday, appointments, minutes", """
+        SELECT DATE(a.date_time) AS day, COALESCE(a.veterinarian, '') AS veterinarian,
+               COALESCE(p.species, '') AS species,
+               CAST(strftime('%H', a.date_time) AS INTEGER) AS hour,
+               CAST(strftime('%w', a.date_time) AS INTEGER) AS weekday,
+               COUNT(*) AS appointments, SUM(COALESCE(a.duration_minutes, 30)) AS minutes
+          FROM appointments a
+          LEFT JOIN patients p ON p.patient_id = a.patient_id
+         WHERE DATE(a.date_time) BETWEEN :first AND :last
+         GROUP BY 1, 2, 3, 4
+    """, "day, veterinarian, species, hour, weekday, appointments, minutes", "appointments != 0"),
+    ("rollup_items_daily", "day, description, quantity", """
+        SELECT DATE(i.created_at) AS day, ii.description, SUM(ii.quantity) AS quantity
+          FROM invoice_items ii
+          JOIN invoices i ON i.invoice_id = ii.invoice_id
+         WHERE DATE(i.created_at) BETWEEN :first AND :last
+         GROUP BY 1, 2
+    """, "day, description, quantity", "quantity != 0"),
+)
+ALL_DAYS = {"first": "0000-01-01", "last": "9999-12-31"}
+
+# ── Schema / repair ──────────────────────────────────────────────────────
+def _fill(cur, days):
+    """Replace the rollup rows for `days` ({"first", "last"}) with ones from the base tables."""
+    for table, columns, rows, _, live in _ROLLUPS:
+        cur.execute(f"DELETE FROM {table} WHERE day BETWEEN :first AND :last", days)
+        cur.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM ({rows}) WHERE {live}", days)
+
+def ensure_rollup_tables():
+    conn = sqlite3.connect(DB)
+    cur = conn.cursor()
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    tables = {r[0] for r in cur.fetchall()}
+    if not {"invoices", "invoice_items", "appointments", "patients"} <= tables:
+        conn.close()
+        return  # init_db.py has not run yet
+    fresh = "rollup_meta" not in tables
+    cur.executescript(_TABLES + _TRIGGERS)
+    if fresh:
+        cur.execute("BEGIN IMMEDIATE")
+        _fill(cur, ALL_DAYS)
+        cur.execute("INSERT OR REPLACE INTO rollup_meta (key, value) VALUES ('built_on', DATE('now', 'localtime'))")
+        conn.commit()
+    conn.close()
+
+def drifted_months(days=ALL_DAYS):
+    """
+    Months (YYYY-MM, sorted) in which a rollup no longer matches its base
+    tables. The triggers keep the rollups exact, so this should be empty;
+    it only reads, and is safe to run while the application is open.
+    """
+    conn = sqlite3.connect(f"file:{DB}?mode=ro", uri=True)
+    try:
+        months = set()
+        for table, _, rows, compared, live in _ROLLUPS:
+            months.update(m for (m,) in conn.execute(f"""
+                WITH base AS (SELECT {compared} FROM ({rows}) WHERE {live}),
+                     kept AS (SELECT {compared} FROM {table} WHERE {live} AND day BETWEEN :first AND :last)
+                SELECT substr(day, 1, 7) FROM (SELECT * FROM base EXCEPT SELECT * FROM kept)
+                 UNION
+                SELECT substr(day, 1, 7) FROM (SELECT * FROM kept EXCEPT SELECT * FROM base)
+            """, days))
+        return sorted(months)
+    finally:
+        conn.close()
+
+def repair_rollups(months=None):
+    """
+    Rebuild the rollups for `months` (default: drifted_months()) from the
+    base tables, one month per transaction so the write lock is only held
+    briefly, and drop rows the triggers have counted down to zero. Returns
+    the months rebuilt.
+    """
+    months = drifted_months() if months is None else months
+    conn = sqlite3.connect(DB, timeout=30)
+    try:
+        cur = conn.cursor()
+        for month in months:
+            cur.execute("BEGIN IMMEDIATE")
+            _fill(cur, {"first": f"{month}-01", "last": f"{month}-31"})
+            conn.commit()
+        for table, _, _, _, live in _ROLLUPS:
+            cur.execute(f"DELETE FROM {table} WHERE NOT ({live})")
+            conn.commit()
+        return months
+    finally:
+        conn.close()
+
+# ── Report queries (rollups only) ────────────────────────────────────────
+def _query(sql, params):
+    # read-only: the analytics screen runs these on worker threads
+    conn = sqlite3.connect(f"file:{DB}?mode=ro", uri=True)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+def revenue_by_month(start, end):
+    """[(YYYY-MM, revenue)] for invoices created between start and end (inclusive)."""
+    return _query("""
+        SELECT substr(day, 1, 7) AS month, SUM(revenue)
+          FROM rollup_revenue_daily
+         WHERE day BETWEEN ? AND ?
+         GROUP BY month
+        HAVING SUM(invoices) > 0
+         ORDER BY month
+    """, (start, end))
+
+def appointments_by_species(start, end):
+    """[(species, appointments)]"""
+    return _query("""
+        SELECT species, SUM(appointments)
+          FROM rollup_appointments
+         WHERE day BETWEEN ? AND ? AND species != ''
+         GROUP BY species
+        HAVING SUM(appointments) > 0
+    """, (start, end))
+
+def top_items(start, end, limit=10):
+    """[(description, units sold)], best sellers first."""
+    return _query("""
+        SELECT description, SUM(quantity) AS total_sold
+          FROM rollup_items_daily
+         WHERE day BETWEEN ? AND ?
+         GROUP BY description
+        HAVING total_sold != 0
+         ORDER BY total_sold DESC
+         LIMIT ?
+    """, (start, end, limit))
+
+def busiest_days(start, end):
+    """Appointment counts per weekday, Sunday first (7 ints)."""
+    counts = [0] * 7
+    for weekday, n in _query("""
+        SELECT weekday, SUM(appointments)
+          FROM rollup_appointments
+         WHERE day BETWEEN ? AND ?
+         GROUP BY weekday
+    """, (start, end)):
+        counts[weekday] = n
+    return counts
+
+def appointments_by_vet(start, end):
+    """[(veterinarian, appointments)]"""
+    return _query("""
+        SELECT veterinarian, SUM(appointments)
+          FROM rollup_appointments
+         WHERE day BETWEEN ? AND ? AND veterinarian != ''
+         GROUP BY veterinarian
+        HAVING SUM(appointments) > 0
+    """, (start, end))
+
+UNPAID_HEADER = ["Invoice ID", "Appointment ID", "Patient", "Amount Due", "Created At"]
+UNPAID_INVOICES_SQL = """
+    SELECT i.invoice_id, i.appointment_id, p.name,
+           ROUND(i.final_amount - IFNULL((SELECT SUM(amount_paid) FROM payment_history WHERE invoice_id = i.invoice_id), 0), 2) AS due,
+           i.created_at
+    FROM invoices i
+    JOIN appointments a ON i.appointment_id = a.appointment_id
+    JOIN patients p ON a.patient_id = p.patient_id
+    WHERE i.payment_status != 'Paid'
+"""
+
+def unpaid_invoices():
+    """
+    [(invoice_id, appointment_id, patient, amount due, created_at)] for
+    invoices not fully paid. This is current state, not an aggregate, so
+    it reads the base tables.
+    """
+    return _query(UNPAID_INVOICES_SQL, ())
+
+
+# report id → (tables it reads, query)
+REPORTS = {
+    "revenue_by_month":        (("invoices",), revenue_by_month),
+    "unpaid_invoices":         (("invoices", "payment_history", "appointments", "patients"), unpaid_invoices),
+    "appointments_by_species": (("appointments", "patients"), appointments_by_species),
+    "top_items":               (("invoices", "invoice_items"), top_items),
+    "busiest_days":            (("appointments",), busiest_days),
+    "appointments_by_vet":     (("appointments",), appointments_by_vet),
+    # reads the appointments themselves: minutes are spread over the slots they cover
+    "appointment_heatmap":     (("appointments",), appointment_heatmap.heatmap_by_vet),
+    "vet_utilization":         (("appointments", "vet_roster"), vet_utilization.utilization),
+}
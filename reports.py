@@ -0,0 +1,173 @@
+# reports.py
+"""
+Headless report generator for scheduled runs; no Qt is imported.
+
+    python -m reports run --from 2025-01-01 --to 2025-01-31 --out month_end/
+    python -m reports run --out month_end/ --reports revenue_by_month top_items
+
+Each chart report is read from its query, drawn on Agg and written with
+the same PDF layout as the Reports & Analytics screen; the unpaid invoice
+list, the per-vet heatmap grids and daily vet utilization are written as
+CSV. Reports are rendered in a process pool. Without --from/--to the
+previous calendar month is used, so a cron entry on the 1st produces the
+month-end pack.
+
+    python -m reports snapshot --out snapshot/
+
+writes invoices, invoice items, payments, appointments and stock
+movements as columnar files partitioned by month (see snapshot_export);
+repeat runs only write months that changed.
+
+    python -m reports rollups [--repair]
+
+lists the months whose report rollups differ from the base tables and,
+with --repair, rebuilds just those months. Run all of these from the
+application directory, where vet_management.db lives.
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+
+import appointment_heatmap
+import csv_export
+import report_charts
+import report_rollups
+import schema
+import snapshot_export
+import vet_utilization
+from logger import log_error
+
+CHART_REPORTS = tuple(report_charts.PDF_LAYOUTS)
+ALL_REPORTS = CHART_REPORTS + ("unpaid_invoices",)
+
+
+def write_unpaid_csv(path):
+    csv_export.export_csv(path, csv_export.ExportQuery(
+        report_rollups.UNPAID_INVOICES_SQL, (), report_rollups.UNPAID_HEADER))
+
+
+def run_report(report_id, start, end, out_dir):
+    """Write one report into `out_dir`; returns the file path. Runs in a pool worker."""
+    if report_id == "unpaid_invoices":
+        path = os.path.join(out_dir, "unpaid_invoices.csv")
+        write_unpaid_csv(path)
+        return path
+    _, query = report_rollups.REPORTS[report_id]
+    data = query(start, end)
+    path = os.path.join(out_dir, report_charts.PDF_LAYOUTS[report_id][0])
+    if report_id == "appointment_heatmap":
+        # per-vet grids go to the CSV; the PDF charts the whole practice
+        appointment_heatmap.write_csv(os.path.splitext(path)[0] + ".csv", data)
+        data = data[appointment_heatmap.ALL_VETS]
+    elif report_id == "vet_utilization":
+        vet_utilization.write_csv(os.path.splitext(path)[0] + ".csv", data)
+    report_charts.export_pdf(path, report_id, data, start, end)
+    return path
+
+
+def previous_month(today=None):
+    first = (today or date.today()).replace(day=1)
+    last = first - timedelta(days=1)
+    return last.replace(day=1), last
+
+
+def run(args):
+    start, end = args.start, args.end
+    if start is None or end is None:
+        default_start, default_end = previous_month()
+        start, end = start or default_start, end or default_end
+    if start > end:
+        print("--from must not be after --to", file=sys.stderr)
+        return 2
+    os.makedirs(args.out, exist_ok=True)
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {
+            pool.submit(run_report, report_id, start.isoformat(), end.isoformat(), args.out): report_id
+            for report_id in args.reports
+        }
+        for future in as_completed(futures):
+            report_id = futures[future]
+            try:
+                print(future.result())
+            except Exception as e:
+                failed += 1
+                log_error(f"Report '{report_id}' failed: {e}")
+                print(f"{report_id}: {e}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def snapshot(args):
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {
+            pool.submit(snapshot_export.export_table, table, args.out, args.format, args.full): table
+            for table in args.tables
+        }
+        for future in as_completed(futures):
+            table = futures[future]
+            try:
+                months = future.result()
+            except Exception as e:
+                failed += 1
+                log_error(f"Snapshot of '{table}' failed: {e}")
+                print(f"{table}: {e}", file=sys.stderr)
+                continue
+            print(f"{table}: {', '.join(months) if months else 'up to date'}")
+    return 1 if failed else 0
+
+
+def rollups(args):
+    months = report_rollups.drifted_months()
+    if not months:
+        print("rollups match the base tables")
+        return 0
+    if not args.repair:
+        print(f"rollups differ from the base tables in {', '.join(months)}; rerun with --repair")
+        return 1
+    report_rollups.repair_rollups(months)
+    print(f"rebuilt {', '.join(months)}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m reports", description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_cmd = commands.add_parser("run", help="write report PDFs/CSV into a directory")
+    run_cmd.add_argument("--from", dest="start", type=date.fromisoformat, metavar="YYYY-MM-DD",
+                         help="first day (default: first day of last month)")
+    run_cmd.add_argument("--to", dest="end", type=date.fromisoformat, metavar="YYYY-MM-DD",
+                         help="last day, inclusive (default: last day of last month)")
+    run_cmd.add_argument("--out", required=True, help="output directory (created if missing)")
+    run_cmd.add_argument("--reports", nargs="+", choices=ALL_REPORTS, default=list(ALL_REPORTS),
+                         help="reports to write (default: all)")
+    run_cmd.add_argument("--workers", type=int, default=os.cpu_count(),
+                         help="processes to render with")
+    run_cmd.set_defaults(func=run)
+
+    snap_cmd = commands.add_parser("snapshot", help="write tables as columnar files partitioned by month")
+    snap_cmd.add_argument("--out", required=True, help="snapshot directory (created if missing)")
+    snap_cmd.add_argument("--format", choices=snapshot_export.available_formats(),
+                          help="default: parquet if pyarrow is installed, else npz")
+    snap_cmd.add_argument("--tables", nargs="+", choices=tuple(snapshot_export.TABLES),
+                          default=list(snapshot_export.TABLES), help="tables to write (default: all)")
+    snap_cmd.add_argument("--full", action="store_true", help="rewrite every month, not just changed ones")
+    snap_cmd.add_argument("--workers", type=int, default=os.cpu_count(),
+                          help="processes to write with")
+    snap_cmd.set_defaults(func=snapshot)
+
+    rollup_cmd = commands.add_parser("rollups", help="check the report rollups against the base tables")
+    rollup_cmd.add_argument("--repair", action="store_true", help="rebuild the months that differ")
+    rollup_cmd.set_defaults(func=rollups)
+
+    args = parser.parse_args(argv)
+    schema.ensure_schema()      # once, here; the pool workers only read
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,30 @@
-import sqlite3
-import csv
-from datetime import datetime
-from io import BytesIO
-from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
 
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QLabel, QTableWidget, QTableWidgetItem, QHeaderView,
-    QTabWidget, QPushButton, QFileDialog, QMessageBox, QHBoxLayout, QDateEdit
+    QTabWidget, QPushButton, QFileDialog, QMessageBox, QHBoxLayout, QDateEdit, QComboBox
 )
-from PySide6.QtCore import QDate
+from PySide6.QtCore import QDate, QObject, Qt, Signal
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-import matplotlib.pyplot as plt
-from reportlab.pdfgen import canvas as pdf_canvas
-from reportlab.lib.pagesizes import A4
+
+import appointment_heatmap
+import csv_export
+import csv_export_dialog
+import report_cache
+import report_charts
+import report_rollups
+import vet_utilization
+from logger import log_error
+
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="report")
+
+
+class _ReportSignals(QObject):
+    # emitted from worker threads, delivered on the GUI thread
+    loaded = Signal(str, object, object, object)   # report id, params, cache key, data
+    failed = Signal(str, object, str)              # report id, params, error
+    exported = Signal(str, str)                    # path, error ('' on success)
 
 
 class ReportsAnalyticsScreen(QWidget):
@@ -27,16 +38,145 @@ class ReportsAnalyticsScreen(QWidget):
         self.end_date = QDateEdit(QDate.currentDate())
         self.end_date.setCalendarPopup(True)
 
-        tabs = QTabWidget()
-        tabs.addTab(self.revenue_by_month_tab(), "Revenue by Month")
-        tabs.addTab(self.unpaid_invoices_tab(), "Unpaid Invoices")
-        tabs.addTab(self.appointments_by_species_tab(), "Appointments by Species")
-        tabs.addTab(self.top_items_tab(), "Top Medications/Items")
-        tabs.addTab(self.busiest_days_tab(), "Busiest Days/Times")
-        tabs.addTab(self.appointments_by_vet_tab(), "Appointments by Vet")
-
-        layout.addWidget(tabs)
+        self.signals = _ReportSignals(self)
+        self.signals.loaded.connect(self._on_report_loaded)
+        self.signals.failed.connect(self._on_report_failed)
+        self.signals.exported.connect(self._on_exported)
+        self._charts = {}         # report id → (report_charts.ChartFigure, canvas)
+        self._requested = {}      # report id → params of the latest request
+        self._in_flight = set()   # (report id, params) submitted and not yet back
+        self._shown = {
+            "revenue_by_month": self.show_revenue_chart,
+            "unpaid_invoices": self.show_unpaid_invoices,
+            "appointments_by_species": self.show_species_chart,
+            "top_items": self.show_top_items_chart,
+            "busiest_days": self.show_busiest_days_chart,
+            "appointment_heatmap": self.show_heatmap_chart,
+            "appointments_by_vet": self.show_vet_chart,
+            "vet_utilization": self.show_utilization,
+        }
+
+        # each tab is built (and its chart drawn) the first time it is shown
+        self.tabs = QTabWidget()
+        self._tab_builders = []
+        for builder, title in (
+            (self.revenue_by_month_tab, "Revenue by Month"),
+            (self.unpaid_invoices_tab, "Unpaid Invoices"),
+            (self.appointments_by_species_tab, "Appointments by Species"),
+            (self.top_items_tab, "Top Medications/Items"),
+            (self.busiest_days_tab, "Busiest Days/Times"),
+            (self.heatmap_tab, "Busy Hours Heatmap"),
+            (self.appointments_by_vet_tab, "Appointments by Vet"),
+            (self.vet_utilization_tab, "Vet Utilization"),
+        ):
+            page = QWidget()
+            QVBoxLayout(page).addWidget(self._placeholder())
+            self.tabs.addTab(page, title)
+            self._tab_builders.append(builder)
+        self.tabs.currentChanged.connect(self._build_tab)
+
+        layout.addWidget(self.tabs)
+
+        # warm the cache for every tab's default range in parallel; the
+        # tabs pick the results up when they are first opened
+        default_range = (QDate.currentDate().addMonths(-1).toString("yyyy-MM-dd"),
+                         QDate.currentDate().toString("yyyy-MM-dd"))
+        for report_id in report_rollups.REPORTS:
+            if report_id == "unpaid_invoices":
+                self._submit(report_id, ())
+            elif report_id == "appointment_heatmap":
+                self._submit(report_id, default_range + (60,))
+            else:
+                self._submit(report_id, default_range)
+        self._build_tab(self.tabs.currentIndex())
+
+    @staticmethod
+    def _placeholder():
+        label = QLabel("Loading…")
+        label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        return label
+
+    def _build_tab(self, index):
+        if not 0 <= index < len(self._tab_builders) or self._tab_builders[index] is None:
+            return
+        builder, self._tab_builders[index] = self._tab_builders[index], None
+        page_layout = self.tabs.widget(index).layout()
+        placeholder = page_layout.takeAt(0).widget()
+        page_layout.addWidget(builder())
+        placeholder.deleteLater()
+
+    # ── Background queries ───────────────────────────────────────────────
+    def _submit(self, report_id, params):
+        if (report_id, params) in self._in_flight:
+            return
+        self._in_flight.add((report_id, params))
+        _executor.submit(self._fetch, report_id, params)
+
+    def _fetch(self, report_id, params):
+        """Worker thread: load `report_id` through the cache and hand it to the GUI thread."""
+        try:
+            tables, query = report_rollups.REPORTS[report_id]
+            key, data = report_cache.fetch(report_id, params, tables, query)
+        except Exception as e:
+            # anything a query raises (not just sqlite3.Error) must reach the GUI
+            log_error(f"Report '{report_id}' failed: {e}")
+            self.signals.failed.emit(report_id, params, str(e))
+        else:
+            self.signals.loaded.emit(report_id, params, key, data)
+        finally:
+            # a set is safe to change from here; a later request for the same params is fetched afresh
+            self._in_flight.discard((report_id, params))
+
+    def request_report(self, report_id, params):
+        """Load `report_id` for `params` and show it when it arrives; older requests are dropped."""
+        self._requested[report_id] = params
+        self._submit(report_id, params)
+
+    def _on_report_loaded(self, report_id, params, key, data):
+        if self._requested.get(report_id) == params:
+            self._shown[report_id](key, data)
+
+    def _on_report_failed(self, report_id, params, error):
+        if self._requested.get(report_id) == params:
+            QMessageBox.critical(self, "Report Error", f"Could not load the report:\n{error}")
+
+    @staticmethod
+    def _clear(holder):
+        for i in reversed(range(holder.count())):
+            widget_to_remove = holder.itemAt(i).widget()
+            if widget_to_remove:
+                widget_to_remove.setParent(None)
 
+    def _show_chart(self, report_id, holder, data):
+        """Draw into the tab's ChartFigure; the figure and canvas are created once."""
+        if report_id not in self._charts:
+            chart = report_charts.ChartFigure()
+            canvas = FigureCanvas(chart.figure)
+            self._clear(holder)
+            holder.addWidget(canvas)
+            self._charts[report_id] = (chart, canvas)
+        chart, canvas = self._charts[report_id]
+        chart.show(report_id, data)
+        canvas.draw_idle()
+
+    def _export_pdf(self, path, key, data, subtitle=""):
+        """
+        Render and write the PDF on a worker thread; `key` names the report
+        and its date range. A `subtitle` also makes the cached chart distinct.
+        """
+        report_id, (start, end) = key[0], key[1][:2]
+        png_key = key + (subtitle,) if subtitle else key
+        future = report_charts.export_pdf_async(path, report_id, data, start, end, png_key, subtitle)
+        future.add_done_callback(
+            lambda f: self.signals.exported.emit(path, str(f.exception() or ""))
+        )
+
+    def _on_exported(self, path, error):
+        if error:
+            log_error(f"PDF export to {path} failed: {error}")
+            QMessageBox.critical(self, "Export Failed", f"Could not write {path}:\n{error}")
+        else:
+            QMessageBox.information(self, "Exported", f"Report saved to {path}")
 
     def revenue_by_month_tab(self):
         widget = QWidget()
@@ -62,6 +202,7 @@ class ReportsAnalyticsScreen(QWidget):
         layout.addLayout(filter_row)
 
         self.revenue_canvas_holder = QVBoxLayout()
+        self.revenue_canvas_holder.addWidget(self._placeholder())
         layout.addLayout(self.revenue_canvas_holder)
 
         export_btn = QPushButton("Export to PDF")
@@ -72,43 +213,17 @@ class ReportsAnalyticsScreen(QWidget):
         return widget
 
     def load_revenue_chart(self, layout):
-        for i in reversed(range(self.revenue_canvas_holder.count())):
-            widget_to_remove = self.revenue_canvas_holder.itemAt(i).widget()
-            if widget_to_remove:
-                widget_to_remove.setParent(None)
-
-        fig = Figure(figsize=(6, 4))
-        canvas = FigureCanvas(fig)
-        ax = fig.add_subplot(111)
-
-        conn = sqlite3.connect("vet_management.db")
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT strftime('%Y-%m', created_at) AS month, SUM(final_amount)
-            FROM invoices
-            WHERE DATE(created_at) BETWEEN DATE(?) AND DATE(?)
-            GROUP BY month
-            ORDER BY month
-        """, (
+        self.request_report("revenue_by_month", (
             self.revenue_start_date.date().toString("yyyy-MM-dd"),
             self.revenue_end_date.date().toString("yyyy-MM-dd")
         ))
-        data = cursor.fetchall()
-        conn.close()
-
-        if data:
-            months, totals = zip(*data)
-            ax.bar(months, totals)
-            ax.set_title("Revenue by Month")
-            ax.set_ylabel("€")
-            ax.set_xlabel("Month")
-            ax.tick_params(axis='x', rotation=45)
-        else:
-            ax.text(0.5, 0.5, "No data", ha='center')
 
-        self.revenue_canvas_holder.addWidget(canvas)
-        self.revenue_figure = fig
+    def show_revenue_chart(self, key, data):
+        if key == getattr(self, 'revenue_key', None):
+            return  # already showing this data
+        self._show_chart("revenue_by_month", self.revenue_canvas_holder, data)
         self.revenue_data = data
+        self.revenue_key = key
 
     def export_revenue_pdf(self):
         if not getattr(self, 'revenue_data', None):
@@ -119,50 +234,7 @@ class ReportsAnalyticsScreen(QWidget):
         if not path:
             return
 
-        # Create a fresh figure for export
-        export_fig = Figure(figsize=(6, 3.5))
-        ax = export_fig.add_subplot(111)
-
-        months, totals = zip(*self.revenue_data)
-        ax.bar(months, totals)
-        ax.set_title("Revenue by Month")
-        ax.set_ylabel("€")
-        ax.set_xlabel("Month")
-        ax.tick_params(axis='x', rotation=45)
-        export_fig.tight_layout()
-
-        buf = BytesIO()
-        export_fig.savefig(buf, format='png', dpi=100)
-        buf.seek(0)
-        chart_image = Image.open(buf)
-
-        pdf = pdf_canvas.Canvas(path, pagesize=A4)
-        width, height = A4
-        pdf.setTitle("Revenue Report")
-
-        pdf.setFont("Helvetica-Bold", 16)
-        pdf.drawString(50, height - 50, "Pet Wellness Vets – Revenue Summary")
-
-        pdf.setFont("Helvetica", 10)
-        date_range = f"From {self.revenue_start_date.date().toString('yyyy-MM-dd')} to {self.revenue_end_date.date().toString('yyyy-MM-dd')}"
-        pdf.drawString(50, height - 70, f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
-        pdf.drawString(50, height - 85, date_range)
-
-        pdf.drawInlineImage(chart_image, 50, height - 400, width=500, height=250)
-
-        y = height - 420
-        total_revenue = 0
-        pdf.setFont("Helvetica", 10)
-        for month, amount in self.revenue_data:
-            pdf.drawString(60, y, f"{month}: €{amount:.2f}")
-            total_revenue += amount
-            y -= 15
-
-        pdf.setFont("Helvetica-Bold", 12)
-        pdf.drawString(60, y - 10, f"Total Revenue: €{total_revenue:.2f}")
-        pdf.save()
-
-        QMessageBox.information(self, "Exported", f"Report saved to {path}")
+        self._export_pdf(path, self.revenue_key, self.revenue_data)
 
     def unpaid_invoices_tab(self):
         widget = QWidget()
@@ -170,29 +242,9 @@ class ReportsAnalyticsScreen(QWidget):
 
         self.unpaid_table = QTableWidget()
         self.unpaid_table.setColumnCount(5)
-        self.unpaid_table.setHorizontalHeaderLabels(["Invoice ID", "Appointment ID", "Patient", "Amount Due", "Created At"])
+        self.unpaid_table.setHorizontalHeaderLabels(report_rollups.UNPAID_HEADER)
         self.unpaid_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
 
-        conn = sqlite3.connect("vet_management.db")
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT i.invoice_id, i.appointment_id, p.name,
-                   (i.final_amount - IFNULL((SELECT SUM(amount_paid) FROM payment_history WHERE invoice_id = i.invoice_id), 0)) AS due,
-                   i.created_at
-            FROM invoices i
-            JOIN appointments a ON i.appointment_id = a.appointment_id
-            JOIN patients p ON a.patient_id = p.patient_id
-            WHERE i.payment_status != 'Paid'
-        """)
-        rows = cursor.fetchall()
-        conn.close()
-
-        self.unpaid_table.setRowCount(len(rows))
-        for r_idx, row in enumerate(rows):
-            for c_idx, val in enumerate(row):
-                item = QTableWidgetItem(f"{val:.2f}" if isinstance(val, float) else str(val))
-                self.unpaid_table.setItem(r_idx, c_idx, item)
-
         layout.addWidget(QLabel("Unpaid or Partially Paid Invoices"))
         layout.addWidget(self.unpaid_table)
 
@@ -200,21 +252,24 @@ class ReportsAnalyticsScreen(QWidget):
         export_csv_btn.clicked.connect(self.export_unpaid_csv)
         layout.addWidget(export_csv_btn)
 
+        self.request_report("unpaid_invoices", ())
         return widget
 
+    def show_unpaid_invoices(self, key, rows):
+        self.unpaid_table.setRowCount(len(rows))
+        for r_idx, row in enumerate(rows):
+            for c_idx, val in enumerate(row):
+                item = QTableWidgetItem(f"{val:.2f}" if isinstance(val, float) else str(val))
+                self.unpaid_table.setItem(r_idx, c_idx, item)
+
     def export_unpaid_csv(self):
         path, _ = QFileDialog.getSaveFileName(self, "Save CSV", "unpaid_invoices.csv", "CSV Files (*.csv)")
         if not path:
             return
 
-        with open(path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(["Invoice ID", "Appointment ID", "Patient", "Amount Due", "Created At"])
-            for r in range(self.unpaid_table.rowCount()):
-                row = [self.unpaid_table.item(r, c).text() for c in range(self.unpaid_table.columnCount())]
-                writer.writerow(row)
-
-        QMessageBox.information(self, "Export Complete", f"Saved to {path}")
+        # re-runs the query rather than reading the table cells, so amounts stay numbers
+        csv_export_dialog.start_export(self, path, csv_export.ExportQuery(
+            report_rollups.UNPAID_INVOICES_SQL, (), report_rollups.UNPAID_HEADER))
 
     def appointments_by_species_tab(self):
         widget = QWidget()
@@ -240,6 +295,7 @@ class ReportsAnalyticsScreen(QWidget):
         layout.addLayout(filter_row)
 
         self.species_canvas_holder = QVBoxLayout()
+        self.species_canvas_holder.addWidget(self._placeholder())
         layout.addLayout(self.species_canvas_holder)
 
         export_btn = QPushButton("Export to PDF")
@@ -250,40 +306,17 @@ class ReportsAnalyticsScreen(QWidget):
         return widget
 
     def load_species_chart(self, layout):
-        for i in reversed(range(self.species_canvas_holder.count())):
-            widget_to_remove = self.species_canvas_holder.itemAt(i).widget()
-            if widget_to_remove:
-                widget_to_remove.setParent(None)
-
-        fig = Figure(figsize=(6, 4))
-        canvas = FigureCanvas(fig)
-        ax = fig.add_subplot(111)
-
-        conn = sqlite3.connect("vet_management.db")
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT p.species, COUNT(*)
-            FROM appointments a
-            JOIN patients p ON a.patient_id = p.patient_id
-            WHERE DATE(a.date_time) BETWEEN DATE(?) AND DATE(?)
-            GROUP BY p.species
-        """, (
+        self.request_report("appointments_by_species", (
             self.species_start_date.date().toString("yyyy-MM-dd"),
             self.species_end_date.date().toString("yyyy-MM-dd")
         ))
-        data = cursor.fetchall()
-        conn.close()
-
-        if data:
-            species, counts = zip(*data)
-            ax.pie(counts, labels=species, autopct='%1.1f%%', startangle=140)
-            ax.set_title("Appointments by Species")
-        else:
-            ax.text(0.5, 0.5, "No data", ha='center')
 
-        self.species_canvas_holder.addWidget(canvas)
-        self.species_figure = fig
+    def show_species_chart(self, key, data):
+        if key == getattr(self, 'species_key', None):
+            return  # already showing this data
+        self._show_chart("appointments_by_species", self.species_canvas_holder, data)
         self.species_data = data
+        self.species_key = key
 
     def export_species_pdf(self):
         if not getattr(self, 'species_data', None):
@@ -294,42 +327,7 @@ class ReportsAnalyticsScreen(QWidget):
         if not path:
             return
 
-        # Re-render chart to avoid resizing the in-app figure
-        export_fig = Figure(figsize=(6, 3.5))
-        ax = export_fig.add_subplot(111)
-
-        species, counts = zip(*self.species_data)
-        ax.pie(counts, labels=species, autopct='%1.1f%%', startangle=140)
-        ax.set_title("Appointments by Species")
-        export_fig.tight_layout()
-
-        buf = BytesIO()
-        export_fig.savefig(buf, format='png', dpi=100)
-        buf.seek(0)
-        chart_image = Image.open(buf)
-
-        pdf = pdf_canvas.Canvas(path, pagesize=A4)
-        width, height = A4
-        pdf.setTitle("Species Report")
-
-        pdf.setFont("Helvetica-Bold", 16)
-        pdf.drawString(50, height - 50, "Pet Wellness Vets – Appointments by Species")
-
-        pdf.setFont("Helvetica", 10)
-        date_range = f"From {self.species_start_date.date().toString('yyyy-MM-dd')} to {self.species_end_date.date().toString('yyyy-MM-dd')}"
-        pdf.drawString(50, height - 70, f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
-        pdf.drawString(50, height - 85, date_range)
-
-        pdf.drawInlineImage(chart_image, 50, height - 400, width=500, height=250)
-
-        y = height - 420
-        pdf.setFont("Helvetica", 10)
-        for specie, count in self.species_data:
-            pdf.drawString(60, y, f"{specie}: {count} appointments")
-            y -= 15
-
-        pdf.save()
-        QMessageBox.information(self, "Exported", f"Report saved to {path}")
+        self._export_pdf(path, self.species_key, self.species_data)
 
     def top_items_tab(self):
         widget = QWidget()
@@ -355,6 +353,7 @@ class ReportsAnalyticsScreen(QWidget):
         layout.addLayout(filter_row)
 
         self.top_items_canvas_holder = QVBoxLayout()
+        self.top_items_canvas_holder.addWidget(self._placeholder())
         layout.addLayout(self.top_items_canvas_holder)
 
         export_btn = QPushButton("Export to PDF")
@@ -365,44 +364,17 @@ class ReportsAnalyticsScreen(QWidget):
         return widget
 
     def load_top_items_chart(self, layout):
-        for i in reversed(range(self.top_items_canvas_holder.count())):
-            widget_to_remove = self.top_items_canvas_holder.itemAt(i).widget()
-            if widget_to_remove:
-                widget_to_remove.setParent(None)
-
-        fig = Figure(figsize=(6, 4))
-        canvas = FigureCanvas(fig)
-        ax = fig.add_subplot(111)
-
-        conn = sqlite3.connect("vet_management.db")
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT ii.description, SUM(ii.quantity) as total_sold
-            FROM invoice_items ii
-            JOIN invoices i ON i.invoice_id = ii.invoice_id
-            WHERE DATE(i.created_at) BETWEEN DATE(?) AND DATE(?)
-            GROUP BY ii.description
-            ORDER BY total_sold DESC
-            LIMIT 10
-        """, (
+        self.request_report("top_items", (
             self.items_start_date.date().toString("yyyy-MM-dd"),
             self.items_end_date.date().toString("yyyy-MM-dd")
         ))
-        data = cursor.fetchall()
-        conn.close()
-
-        if data:
-            items, counts = zip(*data)
-            ax.barh(items, counts)
-            ax.set_title("Top-Selling Medications/Items")
-            ax.set_xlabel("Units Sold")
-            ax.invert_yaxis()
-        else:
-            ax.text(0.5, 0.5, "No data", ha='center')
 
-        self.top_items_canvas_holder.addWidget(canvas)
-        self.top_items_figure = fig
+    def show_top_items_chart(self, key, data):
+        if key == getattr(self, 'top_items_key', None):
+            return  # already showing this data
+        self._show_chart("top_items", self.top_items_canvas_holder, data)
         self.top_items_data = data
+        self.top_items_key = key
 
     def export_top_items_pdf(self):
         if not getattr(self, 'top_items_data', None):
@@ -413,44 +385,7 @@ class ReportsAnalyticsScreen(QWidget):
         if not path:
             return
 
-        # Re-render chart into separate export figure
-        export_fig = Figure(figsize=(6, 3.5))
-        ax = export_fig.add_subplot(111)
-
-        items, counts = zip(*self.top_items_data)
-        ax.barh(items, counts)
-        ax.set_title("Top-Selling Medications/Items")
-        ax.set_xlabel("Units Sold")
-        ax.invert_yaxis()
-        export_fig.tight_layout()
-
-        buf = BytesIO()
-        export_fig.savefig(buf, format='png', dpi=100)
-        buf.seek(0)
-        chart_image = Image.open(buf)
-
-        pdf = pdf_canvas.Canvas(path, pagesize=A4)
-        width, height = A4
-        pdf.setTitle("Top Items Report")
-
-        pdf.setFont("Helvetica-Bold", 16)
-        pdf.drawString(50, height - 50, "Pet Wellness Vets – Top Medications/Items")
-
-        pdf.setFont("Helvetica", 10)
-        date_range = f"From {self.items_start_date.date().toString('yyyy-MM-dd')} to {self.items_end_date.date().toString('yyyy-MM-dd')}"
-        pdf.drawString(50, height - 70, f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
-        pdf.drawString(50, height - 85, date_range)
-
-        pdf.drawInlineImage(chart_image, 50, height - 400, width=500, height=250)
-
-        y = height - 420
-        pdf.setFont("Helvetica", 10)
-        for item, qty in self.top_items_data:
-            pdf.drawString(60, y, f"{item}: {qty} units")
-            y -= 15
-
-        pdf.save()
-        QMessageBox.information(self, "Exported", f"Report saved to {path}")
+        self._export_pdf(path, self.top_items_key, self.top_items_data)
 
     def busiest_days_tab(self):
         widget = QWidget()
@@ -476,6 +411,7 @@ class ReportsAnalyticsScreen(QWidget):
         layout.addLayout(filter_row)
 
         self.busiest_canvas_holder = QVBoxLayout()
+        self.busiest_canvas_holder.addWidget(self._placeholder())
         layout.addLayout(self.busiest_canvas_holder)
 
         export_btn = QPushButton("Export to PDF")
@@ -486,44 +422,17 @@ class ReportsAnalyticsScreen(QWidget):
         return widget
 
     def load_busiest_days_chart(self, layout):
-        for i in reversed(range(self.busiest_canvas_holder.count())):
-            widget_to_remove = self.busiest_canvas_holder.itemAt(i).widget()
-            if widget_to_remove:
-                widget_to_remove.setParent(None)
-
-        fig = Figure(figsize=(6, 4))
-        canvas = FigureCanvas(fig)
-        ax = fig.add_subplot(111)
-
-        conn = sqlite3.connect("vet_management.db")
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT strftime('%w', date_time) AS weekday, COUNT(*)
-            FROM appointments
-            WHERE DATE(date_time) BETWEEN DATE(?) AND DATE(?)
-            GROUP BY weekday
-        """, (
+        self.request_report("busiest_days", (
             self.busiest_start_date.date().toString("yyyy-MM-dd"),
             self.busiest_end_date.date().toString("yyyy-MM-dd")
         ))
-        data = cursor.fetchall()
-        conn.close()
-
-        days = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
-        counts = [0] * 7
-        for weekday, count in data:
-            counts[int(weekday)] = count
-
-        ax.bar(days, counts)
-        ax.set_title("Appointments by Day of Week")
-        ax.set_ylabel("Number of Appointments")
-        ax.set_xticks(range(len(days)))
-        ax.set_xticklabels(days, rotation=45)
-
 
-        self.busiest_canvas_holder.addWidget(canvas)
-        self.busiest_figure = fig
+    def show_busiest_days_chart(self, key, counts):
+        if key == getattr(self, 'busiest_key', None):
+            return  # already showing this data
+        self._show_chart("busiest_days", self.busiest_canvas_holder, counts)
         self.busiest_data = counts
+        self.busiest_key = key
 
     def export_busiest_days_pdf(self):
         if not getattr(self, 'busiest_data', None):
@@ -534,45 +443,116 @@ class ReportsAnalyticsScreen(QWidget):
         if not path:
             return
 
-        # Re-render chart into new figure for PDF
-        export_fig = Figure(figsize=(6, 3.5))
-        ax = export_fig.add_subplot(111)
+        self._export_pdf(path, self.busiest_key, self.busiest_data)
 
-        days = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
-        ax.bar(range(7), self.busiest_data)
-        ax.set_title("Appointments by Day of Week")
-        ax.set_ylabel("Number of Appointments")
-        ax.set_xticks(range(7))
-        ax.set_xticklabels(days, rotation=45)
-        export_fig.tight_layout()
+    def heatmap_tab(self):
+        widget = QWidget()
+        layout = QVBoxLayout(widget)
 
-        buf = BytesIO()
-        export_fig.savefig(buf, format='png', dpi=100)
-        buf.seek(0)
-        chart_image = Image.open(buf)
+        self.heatmap_start_date = QDateEdit(QDate.currentDate().addMonths(-1))
+        self.heatmap_end_date = QDateEdit(QDate.currentDate())
+        self.heatmap_start_date.setCalendarPopup(True)
+        self.heatmap_end_date.setCalendarPopup(True)
+        self.heatmap_start_date.setDisplayFormat("yyyy-MM-dd")
+        self.heatmap_end_date.setDisplayFormat("yyyy-MM-dd")
 
-        pdf = pdf_canvas.Canvas(path, pagesize=A4)
-        width, height = A4
-        pdf.setTitle("Busiest Days Report")
+        self.heatmap_slot = QComboBox()
+        self.heatmap_slot.addItem("Hourly", 60)
+        self.heatmap_slot.addItem("15 minutes", 15)
 
-        pdf.setFont("Helvetica-Bold", 16)
-        pdf.drawString(50, height - 50, "Pet Wellness Vets – Busiest Days")
+        # filled from the loaded grids; switching vet needs no query
+        self.heatmap_vet = QComboBox()
+        self.heatmap_vet.addItem("All vets", appointment_heatmap.ALL_VETS)
+        self.heatmap_vet.currentIndexChanged.connect(self.show_heatmap_vet)
 
-        pdf.setFont("Helvetica", 10)
-        date_range = f"From {self.busiest_start_date.date().toString('yyyy-MM-dd')} to {self.busiest_end_date.date().toString('yyyy-MM-dd')}"
-        pdf.drawString(50, height - 70, f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
-        pdf.drawString(50, height - 85, date_range)
+        filter_row = QHBoxLayout()
+        filter_row.addWidget(QLabel("From:"))
+        filter_row.addWidget(self.heatmap_start_date)
+        filter_row.addWidget(QLabel("To:"))
+        filter_row.addWidget(self.heatmap_end_date)
+        filter_row.addWidget(self.heatmap_slot)
+
+        filter_btn = QPushButton("Apply Date Filter")
+        filter_btn.clicked.connect(lambda: self.load_heatmap_chart(layout))
+        filter_row.addWidget(filter_btn)
+        filter_row.addWidget(QLabel("Vet:"))
+        filter_row.addWidget(self.heatmap_vet)
 
-        pdf.drawInlineImage(chart_image, 50, height - 400, width=500, height=250)
+        layout.addLayout(filter_row)
+
+        self.heatmap_canvas_holder = QVBoxLayout()
+        self.heatmap_canvas_holder.addWidget(self._placeholder())
+        layout.addLayout(self.heatmap_canvas_holder)
 
-        y = height - 420
-        pdf.setFont("Helvetica", 10)
-        for i, count in enumerate(self.busiest_data):
-            pdf.drawString(60, y, f"{days[i]}: {count} appointments")
-            y -= 15
+        btn_row = QHBoxLayout()
+        csv_btn = QPushButton("Export to CSV")
+        csv_btn.clicked.connect(self.export_heatmap_csv)
+        pdf_btn = QPushButton("Export to PDF")
+        pdf_btn.clicked.connect(self.export_heatmap_pdf)
+        btn_row.addWidget(csv_btn)
+        btn_row.addWidget(pdf_btn)
+        layout.addLayout(btn_row)
 
-        pdf.save()
-        QMessageBox.information(self, "Exported", f"Report saved to {path}")
+        self.load_heatmap_chart(layout)
+        return widget
+
+    def load_heatmap_chart(self, layout):
+        self.request_report("appointment_heatmap", (
+            self.heatmap_start_date.date().toString("yyyy-MM-dd"),
+            self.heatmap_end_date.date().toString("yyyy-MM-dd"),
+            self.heatmap_slot.currentData()
+        ))
+
+    def show_heatmap_chart(self, key, grids):
+        if key == getattr(self, 'heatmap_key', None):
+            return  # already showing this data
+        self.heatmap_grids = grids
+        self.heatmap_key = key
+
+        current = self.heatmap_vet.currentData()
+        self.heatmap_vet.blockSignals(True)
+        self.heatmap_vet.clear()
+        self.heatmap_vet.addItem("All vets", appointment_heatmap.ALL_VETS)
+        for vet in grids:
+            if vet != appointment_heatmap.ALL_VETS:
+                self.heatmap_vet.addItem(vet, vet)
+        self.heatmap_vet.setCurrentIndex(max(self.heatmap_vet.findData(current), 0))
+        self.heatmap_vet.blockSignals(False)
+        self.show_heatmap_vet()
+
+    def show_heatmap_vet(self):
+        grids = getattr(self, 'heatmap_grids', None)
+        if grids:
+            self._show_chart("appointment_heatmap", self.heatmap_canvas_holder,
+                             grids[self.heatmap_vet.currentData()])
+
+    def export_heatmap_csv(self):
+        if not getattr(self, 'heatmap_grids', None):
+            QMessageBox.warning(self, "No Data", "No heatmap data to export.")
+            return
+
+        path, _ = QFileDialog.getSaveFileName(self, "Save CSV", "appointment_heatmap.csv", "CSV Files (*.csv)")
+        if not path:
+            return
+
+        # "All vets" exports every vet's grid plus the total; otherwise just the chosen vet
+        vet = self.heatmap_vet.currentData()
+        grids = self.heatmap_grids if vet == appointment_heatmap.ALL_VETS else {vet: self.heatmap_grids[vet]}
+        appointment_heatmap.write_csv(path, grids)
+        QMessageBox.information(self, "Export Complete", f"Saved to {path}")
+
+    def export_heatmap_pdf(self):
+        if not getattr(self, 'heatmap_grids', None):
+            QMessageBox.warning(self, "No Data", "No heatmap data to export.")
+            return
+
+        path, _ = QFileDialog.getSaveFileName(self, "Save PDF", "appointment_heatmap.pdf", "PDF Files (*.pdf)")
+        if not path:
+            return
+
+        vet = self.heatmap_vet.currentData()
+        self._export_pdf(path, self.heatmap_key, self.heatmap_grids[vet],
+                         subtitle=f"Veterinarian: {vet}" if vet else "")
 
     def appointments_by_vet_tab(self):
         widget = QWidget()
@@ -598,6 +578,7 @@ class ReportsAnalyticsScreen(QWidget):
         layout.addLayout(filter_row)
 
         self.vet_canvas_holder = QVBoxLayout()
+        self.vet_canvas_holder.addWidget(self._placeholder())
         layout.addLayout(self.vet_canvas_holder)
 
         export_btn = QPushButton("Export to PDF")
@@ -608,43 +589,17 @@ class ReportsAnalyticsScreen(QWidget):
         return widget
 
     def load_vet_chart(self, layout):
-        for i in reversed(range(self.vet_canvas_holder.count())):
-            widget_to_remove = self.vet_canvas_holder.itemAt(i).widget()
-            if widget_to_remove:
-                widget_to_remove.setParent(None)
-
-        fig = Figure(figsize=(6, 4))
-        canvas = FigureCanvas(fig)
-        ax = fig.add_subplot(111)
-
-        conn = sqlite3.connect("vet_management.db")
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT a.veterinarian, COUNT(*)
-            FROM appointments a
-            WHERE a.veterinarian IS NOT NULL AND a.veterinarian != ''
-              AND DATE(a.date_time) BETWEEN DATE(?) AND DATE(?)
-            GROUP BY a.veterinarian
-        """, (
+        self.request_report("appointments_by_vet", (
             self.vet_start_date.date().toString("yyyy-MM-dd"),
             self.vet_end_date.date().toString("yyyy-MM-dd")
         ))
-        data = cursor.fetchall()
-        conn.close()
-
-        if data:
-            vets, counts = zip(*data)
-            ax.bar(range(len(vets)), counts)
-            ax.set_title("Appointments by Veterinarian")
-            ax.set_ylabel("Appointments")
-            ax.set_xticks(range(len(vets)))
-            ax.set_xticklabels(vets, rotation=45)
-        else:
-            ax.text(0.5, 0.5, "No data", ha='center')
 
-        self.vet_canvas_holder.addWidget(canvas)
-        self.vet_figure = fig
+    def show_vet_chart(self, key, data):
+        if key == getattr(self, 'vet_key', None):
+            return  # already showing this data
+        self._show_chart("appointments_by_vet", self.vet_canvas_holder, data)
         self.vet_data = data
+        self.vet_key = key
 
     def export_vet_pdf(self):
         if not getattr(self, 'vet_data', None):
@@ -655,43 +610,97 @@ class ReportsAnalyticsScreen(QWidget):
         if not path:
             return
 
-        # Re-render chart to buffer instead of modifying UI figure
-        export_fig = Figure(figsize=(6, 3.5))
-        ax = export_fig.add_subplot(111)
-
-        vets, counts = zip(*self.vet_data)
-        ax.bar(range(len(vets)), counts)
-        ax.set_title("Appointments by Veterinarian")
-        ax.set_ylabel("Appointments")
-        ax.set_xticks(range(len(vets)))
-        ax.set_xticklabels(vets, rotation=45)
-        export_fig.tight_layout()
-
-        buf = BytesIO()
-        export_fig.savefig(buf, format='png', dpi=100)
-        buf.seek(0)
-        chart_image = Image.open(buf)
-
-        pdf = pdf_canvas.Canvas(path, pagesize=A4)
-        width, height = A4
-        pdf.setTitle("Appointments by Vet Report")
-
-        pdf.setFont("Helvetica-Bold", 16)
-        pdf.drawString(50, height - 50, "Pet Wellness Vets – Appointments by Vet")
-
-        pdf.setFont("Helvetica", 10)
-        date_range = f"From {self.vet_start_date.date().toString('yyyy-MM-dd')} to {self.vet_end_date.date().toString('yyyy-MM-dd')}"
-        pdf.drawString(50, height - 70, f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
-        pdf.drawString(50, height - 85, date_range)
-
-        pdf.drawInlineImage(chart_image, 50, height - 400, width=500, height=250)
-
-        y = height - 420
-        pdf.setFont("Helvetica", 10)
-        for vet, count in self.vet_data:
-            pdf.drawString(60, y, f"{vet}: {count} appointments")
-            y -= 15
-
-        pdf.save()
-        QMessageBox.information(self, "Exported", f"Report saved to {path}")
-        QMessageBox.information(self, "Exported", f"Report saved to {path}")
+        self._export_pdf(path, self.vet_key, self.vet_data)
+
+    def vet_utilization_tab(self):
+        widget = QWidget()
+        layout = QVBoxLayout(widget)
+
+        self.util_start_date = QDateEdit(QDate.currentDate().addMonths(-1))
+        self.util_end_date = QDateEdit(QDate.currentDate())
+        self.util_start_date.setCalendarPopup(True)
+        self.util_end_date.setCalendarPopup(True)
+        self.util_start_date.setDisplayFormat("yyyy-MM-dd")
+        self.util_end_date.setDisplayFormat("yyyy-MM-dd")
+
+        filter_row = QHBoxLayout()
+        filter_row.addWidget(QLabel("From:"))
+        filter_row.addWidget(self.util_start_date)
+        filter_row.addWidget(QLabel("To:"))
+        filter_row.addWidget(self.util_end_date)
+
+        filter_btn = QPushButton("Apply Date Filter")
+        filter_btn.clicked.connect(lambda: self.load_utilization(layout))
+        filter_row.addWidget(filter_btn)
+
+        layout.addLayout(filter_row)
+
+        self.util_canvas_holder = QVBoxLayout()
+        self.util_canvas_holder.addWidget(self._placeholder())
+        layout.addLayout(self.util_canvas_holder)
+
+        self.util_table = QTableWidget()
+        self.util_table.setColumnCount(9)
+        self.util_table.setHorizontalHeaderLabels([
+            "Vet", "Week of", "Rostered (h)", "Booked (h)", "Utilization",
+            "Outside Roster (h)", "Idle (h)", "Longest Gap (min)", "Overbooked (min)"
+        ])
+        self.util_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        layout.addWidget(self.util_table)
+
+        btn_row = QHBoxLayout()
+        csv_btn = QPushButton("Export to CSV")
+        csv_btn.clicked.connect(self.export_utilization_csv)
+        pdf_btn = QPushButton("Export to PDF")
+        pdf_btn.clicked.connect(self.export_utilization_pdf)
+        btn_row.addWidget(csv_btn)
+        btn_row.addWidget(pdf_btn)
+        layout.addLayout(btn_row)
+
+        self.load_utilization(layout)
+        return widget
+
+    def load_utilization(self, layout):
+        self.request_report("vet_utilization", (
+            self.util_start_date.date().toString("yyyy-MM-dd"),
+            self.util_end_date.date().toString("yyyy-MM-dd")
+        ))
+
+    def show_utilization(self, key, util):
+        if key == getattr(self, 'util_key', None):
+            return  # already showing this data
+        self._show_chart("vet_utilization", self.util_canvas_holder, util)
+
+        self.util_table.setRowCount(len(util.weekly))
+        for r_idx, (vet, week, rostered, booked, outside, idle, gap, over) in enumerate(util.weekly):
+            values = [vet, week, f"{rostered / 60:.1f}", f"{booked / 60:.1f}",
+                      f"{booked / rostered:.0%}" if rostered else "–",
+                      f"{outside / 60:.1f}", f"{idle / 60:.1f}", str(gap), str(over)]
+            for c_idx, val in enumerate(values):
+                self.util_table.setItem(r_idx, c_idx, QTableWidgetItem(val))
+
+        self.util_data = util
+        self.util_key = key
+
+    def export_utilization_csv(self):
+        if not getattr(self, 'util_data', None) or not self.util_data.daily:
+            QMessageBox.warning(self, "No Data", "No utilization data to export.")
+            return
+
+        path, _ = QFileDialog.getSaveFileName(self, "Save CSV", "vet_utilization.csv", "CSV Files (*.csv)")
+        if not path:
+            return
+
+        vet_utilization.write_csv(path, self.util_data)
+        QMessageBox.information(self, "Export Complete", f"Saved to {path}")
+
+    def export_utilization_pdf(self):
+        if not getattr(self, 'util_data', None) or not self.util_data.summary:
+            QMessageBox.warning(self, "No Data", "No utilization data to export.")
+            return
+
+        path, _ = QFileDialog.getSaveFileName(self, "Save PDF", "vet_utilization.pdf", "PDF Files (*.pdf)")
+        if not path:
+            return
+
+        self._export_pdf(path, self.util_key, self.util_data)
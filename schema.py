@@ -0,0 +1,33 @@
+# schema.py
+"""
+Tables, indexes and triggers the feature modules add on top of init_db.py.
+
+Importing a module never touches the database; ensure_schema() runs each
+module's setup once, in dependency order, from app_launcher before any
+screen is built and from the reports CLI before it starts its workers.
+Every step is idempotent and skips itself until init_db.py has created
+the tables it builds on.
+"""
+import global_search
+import inventory
+import patient_search
+import prescription_audit
+import record_search
+import report_cache
+import report_rollups
+import vet_utilization
+
+
+def ensure_schema():
+    inventory.ensure_source_columns()
+    inventory.ensure_stock_tables()
+    inventory.ensure_alert_tables()
+    inventory.ensure_item_indexes()
+    inventory.ensure_invoice_link_column()
+    patient_search.ensure_search_tables()
+    prescription_audit.ensure_history_index()
+    record_search.ensure_record_index()
+    global_search.ensure_global_index()
+    vet_utilization.ensure_roster_table()
+    report_rollups.ensure_rollup_tables()
+    report_cache.ensure_version_table()
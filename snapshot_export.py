@@ -0,0 +1,240 @@
+# snapshot_export.py
+"""
+Columnar snapshot of the accounting and activity tables, for slicing in
+other tools (pandas, DuckDB, Power BI, ...) without handing out copies of
+vet_management.db.
+
+    python -m reports snapshot --out snapshot/
+
+Each table is written under <out>/<table>/month=YYYY-MM/ as Parquet
+(zstd) when pyarrow is installed, otherwise as compressed NumPy .npz
+files of up to CHUNK_ROWS rows each. invoice_items are filed under their
+invoice's month; rows without a date go to month=undated.
+
+Columns are typed from the schema: INTEGER → int64, REAL → float64,
+dates and timestamps → datetime64[s] (a Parquet timestamp), anything
+else → string. NULLs, and values that do not fit the column's type, are
+Parquet nulls or flagged in a boolean "<column>__null" array in the .npz.
+
+Runs are incremental: <out>/<table>/_manifest.json records the row count
+and highest rowid written for every month, and a month is only written
+again when those differ from the database, when it is the current (or a
+future) month, or when the format or columns changed. month=undated is
+treated like a closed month. An edit that leaves both unchanged in a
+closed month (or in month=undated) is not picked up; full=True (--full)
+rewrites everything.
+"""
+import json
+import os
+import shutil
+import sqlite3
+from datetime import date
+from itertools import groupby, islice
+from operator import itemgetter
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None                 # snapshots fall back to .npz
+
+DB = "vet_management.db"
+CHUNK_ROWS = 100_000               # rows per file
+FETCH_ROWS = 5000
+UNDATED = "undated"
+
+# table → (expression giving the row's date, FROM clause); `t` is the table itself
+TABLES = {
+    "invoices":        ("t.created_at", "invoices t"),
+    "invoice_items":   ("i.created_at",
+                        "invoice_items t LEFT JOIN invoices i ON i.invoice_id = t.invoice_id"),
+    "payment_history": ("t.payment_date", "payment_history t"),
+    "appointments":    ("t.date_time", "appointments t"),
+    "stock_movements": ("t.timestamp", "stock_movements t"),
+}
+
+_DTYPES = {"int": np.int64, "float": np.float64, "datetime": "datetime64[s]", "text": str}
+_FILL = {"int": 0, "float": np.nan, "datetime": "NaT", "text": ""}
+
+
+def available_formats():
+    """Formats this install can write, preferred first."""
+    return ("parquet", "npz") if pq is not None else ("npz",)
+
+# ── Columns ──────────────────────────────────────────────────────────────
+def _column_kinds(conn, table):
+    """[[name, kind]] from the declared column types; kind is a key of _DTYPES."""
+    date_expr = TABLES[table][0]
+    kinds = []
+    for _, name, declared, *_ in conn.execute(f"PRAGMA table_info({table})"):
+        declared = (declared or "").upper()
+        if "INT" in declared:
+            kind = "int"
+        elif any(t in declared for t in ("REAL", "FLOA", "DOUB")):
+            kind = "float"
+        elif "DATE" in declared or "TIME" in declared or date_expr == f"t.{name}":
+            kind = "datetime"
+        else:
+            kind = "text"
+        kinds.append([name, kind])       # lists, to compare equal to the manifest's JSON
+    return kinds
+
+def _to_array(values, kind):
+    """(array, null mask or None) for one column of a chunk."""
+    dtype, fill = _DTYPES[kind], _FILL[kind]
+    null = np.fromiter((v is None for v in values), bool, len(values))
+    filled = [fill if v is None else v for v in values]
+    try:
+        array = np.array(filled, dtype=dtype)
+    except (TypeError, ValueError):
+        # SQLite does not enforce column types: null out the values that do not fit
+        for i, v in enumerate(filled):
+            try:
+                np.array(v, dtype=dtype)
+            except (TypeError, ValueError):
+                filled[i] = fill
+                null[i] = True
+        array = np.array(filled, dtype=dtype)
+    return array, (null if null.any() else None)
+
+def _write_chunk(directory, index, kinds, rows, fmt):
+    arrays = {name: _to_array(list(values), kind)
+              for (name, kind), values in zip(kinds, zip(*rows))}
+    path = os.path.join(directory, f"part-{index:04d}.{fmt}")
+    if fmt == "parquet":
+        table = pa.table({
+            name: pa.array(values.tolist() if kind == "text" else values, mask=mask,
+                           type=pa.string() if kind == "text" else None)
+            for (name, kind), (values, mask) in zip(kinds, arrays.values())
+        })
+        pq.write_table(table, path, compression="zstd")
+    else:
+        payload = {}
+        for name, (values, mask) in arrays.items():
+            payload[name] = values
+            if mask is not None:
+                payload[name + "__null"] = mask
+        np.savez_compressed(path, **payload)
+
+# ── Manifest ─────────────────────────────────────────────────────────────
+def _load_manifest(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _save_manifest(path, manifest):
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+# ── Export ───────────────────────────────────────────────────────────────
+def _fetch(cur):
+    while True:
+        batch = cur.fetchmany(FETCH_ROWS)
+        if not batch:
+            return
+        yield from batch
+
+def export_table(table, out_dir, fmt=None, full=False):
+    """
+    Bring <out_dir>/<table>/ up to date; returns the months written, in
+    order. Safe to run in a separate process per table.
+    """
+    fmt = fmt or available_formats()[0]
+    if fmt not in available_formats():
+        raise ValueError(f"format must be one of {available_formats()}")
+    date_expr, source = TABLES[table]
+    month_expr = f"COALESCE(substr({date_expr}, 1, 7), '{UNDATED}')"
+    table_dir = os.path.join(out_dir, table)
+    os.makedirs(table_dir, exist_ok=True)
+    manifest_path = os.path.join(table_dir, "_manifest.json")
+
+    conn = sqlite3.connect(f"file:{DB}?mode=ro", uri=True)
+    try:
+        kinds = _column_kinds(conn, table)
+        manifest = _load_manifest(manifest_path)
+        if full or manifest is None or manifest["format"] != fmt or manifest["columns"] != kinds:
+            for name in os.listdir(table_dir):
+                if name.startswith("month="):
+                    shutil.rmtree(os.path.join(table_dir, name))
+            manifest = {"format": fmt, "columns": kinds, "months": {}}
+
+        # what each month holds now, compared with what was last written
+        current = {
+            month: {"rows": rows, "max_rowid": max_rowid}
+            for month, rows, max_rowid in conn.execute(
+                f"SELECT {month_expr}, COUNT(*), MAX(t.rowid) FROM {source} GROUP BY 1"
+            )
+        }
+        this_month = date.today().isoformat()[:7]
+        stale = sorted(
+            month for month, stats in current.items()
+            if manifest["months"].get(month) != stats
+            # "undated" sorts after every YYYY-MM but is compared like a closed month
+            or (month != UNDATED and month >= this_month)
+        )
+        for month in set(manifest["months"]) - set(current):
+            # every row of the month has since been deleted
+            shutil.rmtree(os.path.join(table_dir, f"month={month}"), ignore_errors=True)
+            del manifest["months"][month]
+        _save_manifest(manifest_path, manifest)
+
+        written = []
+        if stale:
+            cur = conn.execute(f"""
+                SELECT {month_expr} AS month, t.rowid, t.*
+                  FROM {source}
+                 WHERE month IN ({','.join('?' * len(stale))})
+                 ORDER BY month, t.rowid
+            """, stale)
+            for month, rows in groupby(_fetch(cur), key=itemgetter(0)):
+                final = os.path.join(table_dir, f"month={month}")
+                tmp = final + ".tmp"
+                shutil.rmtree(tmp, ignore_errors=True)
+                os.makedirs(tmp)
+                count = max_rowid = index = 0
+                while True:
+                    chunk = list(islice(rows, CHUNK_ROWS))
+                    if not chunk:
+                        break
+                    _write_chunk(tmp, index, kinds, [r[2:] for r in chunk], fmt)
+                    count += len(chunk)
+                    max_rowid = max(max_rowid, chunk[-1][1])
+                    index += 1
+                shutil.rmtree(final, ignore_errors=True)
+                os.rename(tmp, final)
+                # record what was written; a write racing this export shows up as a change next run
+                manifest["months"][month] = {"rows": count, "max_rowid": max_rowid}
+                _save_manifest(manifest_path, manifest)
+                written.append(month)
+    finally:
+        conn.close()
+    return written
+
+
+def export_snapshot(out_dir, fmt=None, full=False, tables=None):
+    """export_table() for every table (or `tables`); returns {table: months written}."""
+    return {table: export_table(table, out_dir, fmt, full) for table in tables or TABLES}
+
+
+def read_npz_month(path):
+    """
+    {column: numpy masked array} for one month=YYYY-MM directory of .npz
+    files, the chunks joined in order.
+    """
+    parts = sorted(name for name in os.listdir(path) if name.endswith(".npz"))
+    chunks = []
+    for name in parts:
+        with np.load(os.path.join(path, name)) as data:
+            chunks.append({key: data[key] for key in data.files})
+    columns = [key for key in chunks[0] if not key.endswith("__null")] if chunks else []
+    result = {}
+    for column in columns:
+        values = np.concatenate([c[column] for c in chunks])
+        mask = np.concatenate([c.get(column + "__null", np.zeros(len(c[column]), bool)) for c in chunks])
+        result[column] = np.ma.masked_array(values, mask)
+    return result
@@ -0,0 +1,145 @@
+# stock_take.py
+"""
+Bulk stock-take: read counted quantities from a CSV, compare them with
+item_stock in one query and post every variance as a stock movement in
+a single transaction. A name shared by several items is reported as
+ambiguous and skipped rather than posted against one of them.
+"""
+import csv
+import sqlite3
+from datetime import datetime
+
+import inventory
+
+DB = inventory.DB
+
+ID_COLUMNS    = ("item_id", "id", "sku")
+NAME_COLUMNS  = ("name", "item", "item_name")
+COUNT_COLUMNS = ("counted", "count", "qty", "quantity", "on_hand")
+
+def read_counts(path):
+    """
+    Parse a stock-take CSV into [(item_id or None, name or None, counted)].
+
+    The header must contain an ID or a name column and a count column
+    (case-insensitive, see the *_COLUMNS tuples). Blank counts are skipped.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        header = {h.strip().lower(): h for h in (reader.fieldnames or [])}
+        id_col    = next((header[c] for c in ID_COLUMNS if c in header), None)
+        name_col  = next((header[c] for c in NAME_COLUMNS if c in header), None)
+        count_col = next((header[c] for c in COUNT_COLUMNS if c in header), None)
+        if count_col is None or (id_col is None and name_col is None):
+            raise ValueError(
+                "CSV needs an item_id or name column and a counted column."
+            )
+
+        counts = []
+        for line_no, row in enumerate(reader, start=2):
+            raw = (row.get(count_col) or "").strip()
+            if not raw:
+                continue
+            try:
+                counted = int(float(raw))
+            except ValueError:
+                raise ValueError(f"Line {line_no}: '{raw}' is not a quantity.")
+            item_id = (row.get(id_col) or "").strip() if id_col else ""
+            name = (row.get(name_col) or "").strip() if name_col else ""
+            counts.append((int(item_id) if item_id else None, name or None, counted))
+    return counts
+
+def apply_counts(counts, reason=None):
+    """
+    Post the variance between `counts` and current on-hand for every item
+    in one BEGIN IMMEDIATE transaction.
+
+    Returns (variances, unknown, ambiguous):
+      variances — [(item_id, name, on_hand, counted, variance)] for every
+                  counted item, including those with no variance
+      unknown   — [(item_id, name, counted)] lines matching no item
+      ambiguous — [(name, counted, candidate ids)] lines naming several
+                  items; like item_catalogue, these are not guessed at,
+                  so no stock movement is posted for them
+    """
+    ts = datetime.now().isoformat(" ", "seconds")
+    reason = reason or f"Stock-take {ts[:10]}"
+
+    conn = sqlite3.connect(DB, isolation_level=None)
+    cur = conn.cursor()
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS stock_take_counts (
+              line     INTEGER PRIMARY KEY,
+              item_id  INTEGER,
+              name     TEXT,
+              counted  INTEGER NOT NULL
+            )
+        """)
+        cur.execute("DELETE FROM stock_take_counts")
+        cur.executemany(
+            "INSERT INTO stock_take_counts (item_id, name, counted) VALUES (?,?,?)",
+            counts
+        )
+
+        # resolve + diff in one pass; the last line wins if an item repeats
+        cur.execute("""
+            WITH resolved AS (
+              SELECT t.line, t.item_id AS given_id, t.name AS given_name, t.counted,
+                     COALESCE(by_id.item_id, IIF(by_name.n = 1, by_name.item_id, NULL)) AS item_id,
+                     IIF(by_id.item_id IS NULL AND by_name.n > 1, by_name.ids, NULL) AS candidates
+                FROM stock_take_counts t
+                LEFT JOIN items by_id ON by_id.item_id = t.item_id
+                LEFT JOIN (SELECT name, MIN(item_id) AS item_id, COUNT(*) AS n,
+                                  group_concat(item_id, ',') AS ids
+                             FROM items GROUP BY name) by_name
+                       ON by_name.name = t.name
+            ),
+            latest AS (
+              SELECT * FROM (
+                SELECT r.*, ROW_NUMBER() OVER (
+                         PARTITION BY COALESCE(r.item_id, -r.line) ORDER BY r.line DESC
+                       ) AS rn
+                  FROM resolved r
+              ) WHERE rn = 1
+            )
+            SELECT l.item_id, COALESCE(i.name, l.given_name), IFNULL(s.on_hand, 0),
+                   l.counted, l.counted - IFNULL(s.on_hand, 0), l.given_id, l.candidates
+              FROM latest l
+              LEFT JOIN items i      ON i.item_id = l.item_id
+              LEFT JOIN item_stock s ON s.item_id = l.item_id
+             ORDER BY l.line
+        """)
+        variances, unknown, ambiguous = [], [], []
+        for item_id, name, on_hand, counted, variance, given_id, candidates in cur.fetchall():
+            if candidates is not None:
+                ambiguous.append((name, counted, sorted(int(c) for c in candidates.split(","))))
+            elif item_id is None:
+                unknown.append((given_id, name, counted))
+            else:
+                variances.append((item_id, name, on_hand, counted, variance))
+
+        cur.executemany("""
+            INSERT INTO stock_movements (item_id, change_qty, reason, timestamp)
+            VALUES (?,?,?,?)
+        """, [(v[0], v[4], reason, ts) for v in variances if v[4]])
+        cur.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            cur.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return variances, unknown, ambiguous
+
+def write_variance_report(path, variances, unknown=(), ambiguous=()):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["ID", "Name", "OnHand", "Counted", "Variance"])
+        w.writerows(variances)
+        for item_id, name, counted in unknown:
+            w.writerow([item_id or "", name or "", "", counted, "UNKNOWN ITEM"])
+        for name, counted, candidates in ambiguous:
+            w.writerow(["", name, "", counted,
+                        "AMBIGUOUS NAME: " + ", ".join(f"#{c}" for c in candidates) + "; use the item ID"])
@@ -0,0 +1,22 @@
+# test_reorder_forecast.py
+import numpy as np
+
+from reorder_forecast import forecast
+
+
+def test_zero_usage_item_below_threshold_is_topped_up_to_threshold():
+    # like 'shot': threshold 10, on hand -1, nothing used in the window
+    usage = np.zeros((1, 90))
+    f = forecast(usage, on_hand=[-1], threshold=[10])
+    assert np.isinf(f["days_of_cover"][0])
+    assert f["reorder_point"][0] == 0
+    assert f["order_qty"][0] == 11
+
+
+def test_threshold_below_reorder_point_does_not_change_order():
+    usage = np.full((1, 30), 2.0)
+    without = forecast(usage, on_hand=[5])
+    with_low_threshold = forecast(usage, on_hand=[5], threshold=[1])
+    # steady 2/day: top up to 7 days' lead time plus 14 days' review
+    assert without["order_qty"][0] == 2 * 21 - 5
+    assert with_low_threshold["order_qty"][0] == without["order_qty"][0]
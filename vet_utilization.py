@@ -0,0 +1,202 @@
+# vet_utilization.py
+"""
+Veterinarian utilization: booked time against rostered time.
+
+Each vet's appointments are sorted and merged into busy blocks with
+NumPy (a running maximum of end times marks where a new block starts),
+so double-booked minutes count once. The blocks are clipped to the vet's
+shift for the day, giving per day and per week:
+
+* rostered  — shift minutes from vet_roster
+* booked    — merged appointment minutes inside the shift
+* outside   — merged minutes before/after the shift
+* idle      — rostered minutes with nothing booked
+* longest_gap — longest idle stretch inside the shift
+* overbooked  — minutes where appointments overlap
+
+Shifts live in vet_roster (one per vet and weekday); a vet with no rows
+works DEFAULT_SHIFTS. Canceled appointments are ignored. A block is
+counted on the day it starts.
+"""
+import csv
+import sqlite3
+from collections import namedtuple
+
+import numpy as np
+
+DB = "vet_management.db"
+# weekday (0 = Sunday) → (start, end) in minutes after midnight
+DEFAULT_SHIFTS = {wd: (9 * 60, 17 * 60) for wd in range(1, 6)}
+# 1970-01-01 was a Thursday
+_EPOCH_WEEKDAY = 4
+
+Utilization = namedtuple("Utilization", "daily weekly summary")
+# daily/weekly rows:  (vet, day or week start, rostered, booked, outside, idle, longest_gap, overbooked)
+# summary rows:       (vet, rostered, booked, outside, idle, longest_gap, overbooked, appointments)
+
+# ── Schema ───────────────────────────────────────────────────────────────
+def ensure_roster_table():
+    conn = sqlite3.connect(DB)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS vet_roster (
+            veterinarian  TEXT    NOT NULL,
+            weekday       INTEGER NOT NULL CHECK (weekday BETWEEN 0 AND 6),  -- 0 = Sunday
+            start_time    TEXT    NOT NULL,                                  -- 'HH:MM'
+            end_time      TEXT    NOT NULL,
+            PRIMARY KEY (veterinarian, weekday)
+        )
+    """)
+    conn.commit()
+    conn.close()
+
+# ── Loading ──────────────────────────────────────────────────────────────
+def _minutes(hhmm):
+    h, m = hhmm.split(":")[:2]
+    return int(h) * 60 + int(m)
+
+def _load(start, end):
+    conn = sqlite3.connect(f"file:{DB}?mode=ro", uri=True)
+    try:
+        appointments = conn.execute("""
+            SELECT veterinarian, date_time, duration_minutes
+              FROM appointments
+             WHERE date_time >= ? AND date_time < DATE(?, '+1 day')
+               AND status != 'Canceled' AND veterinarian != ''
+        """, (start, end)).fetchall()
+        roster = conn.execute(
+            "SELECT veterinarian, weekday, start_time, end_time FROM vet_roster"
+        ).fetchall()
+    finally:
+        conn.close()
+    return appointments, roster
+
+def _shift_table(vets, roster):
+    """(start, end) minute arrays of shape (vets, 7)."""
+    starts = np.zeros((len(vets), 7), np.int64)
+    ends = np.zeros((len(vets), 7), np.int64)
+    index = {v: i for i, v in enumerate(vets)}
+    rostered = {r[0] for r in roster}
+    for vet, i in index.items():
+        if vet not in rostered:
+            for wd, (s, e) in DEFAULT_SHIFTS.items():
+                starts[i, wd], ends[i, wd] = s, e
+    for vet, wd, s, e in roster:
+        starts[index[vet], wd], ends[index[vet], wd] = _minutes(s), _minutes(e)
+    return starts, np.maximum(ends, starts)
+
+# ── Computation ──────────────────────────────────────────────────────────
+def utilization(start, end):
+    """Utilization(daily, weekly, summary) for start..end inclusive ('YYYY-MM-DD')."""
+    appointments, roster = _load(start, end)
+    vets = sorted({a[0] for a in appointments} | {r[0] for r in roster})
+    day0 = np.datetime64(start, "D")
+    n_days = int((np.datetime64(end, "D") - day0).astype(np.int64)) + 1
+    if not vets or n_days <= 0:
+        return Utilization([], [], [])
+    n_vets = len(vets)
+
+    # rostered minutes per (vet, day)
+    epoch_days = day0.astype(np.int64) + np.arange(n_days)
+    weekday = (epoch_days + _EPOCH_WEEKDAY) % 7
+    shift_start, shift_end = _shift_table(vets, roster)
+    shift_start, shift_end = shift_start[:, weekday], shift_end[:, weekday]    # (vets, days)
+    rostered = shift_end - shift_start
+
+    booked = np.zeros(n_vets * n_days, np.int64)
+    outside = np.zeros(n_vets * n_days, np.int64)
+    overbooked = np.zeros(n_vets * n_days, np.int64)
+    longest = rostered.ravel().copy()          # a day with nothing booked is one long gap
+    counts = np.zeros(n_vets, np.int64)
+
+    if appointments:
+        index = {v: i for i, v in enumerate(vets)}
+        vet_col, times, durations = zip(*appointments)
+        vet = np.fromiter((index[v] for v in vet_col), np.int64, len(vet_col))
+        begin = (np.array(times, dtype="datetime64[m]") - day0.astype("datetime64[m]")).astype(np.int64)
+        duration = np.maximum(np.array(durations, dtype=np.int64), 0)
+        counts = np.bincount(vet, minlength=n_vets)
+
+        order = np.lexsort((begin, vet))
+        vet, begin, duration = vet[order], begin[order], duration[order]
+        finish = begin + duration
+
+        # merge overlapping appointments; offsetting each vet by `big` keeps
+        # the running maximum from leaking between vets
+        big = int(finish.max()) + 1
+        reach = np.maximum.accumulate(finish + vet * big)
+        previous = np.concatenate(([-1], reach[:-1]))
+        first = np.flatnonzero(begin + vet * big >= previous)
+        block_vet = vet[first]
+        block_start = begin[first]
+        block_end = np.maximum.reduceat(finish, first)
+        block_over = np.add.reduceat(duration, first) - (block_end - block_start)
+
+        day = np.clip(block_start // 1440, 0, n_days - 1)
+        cell = block_vet * n_days + day
+        s = shift_start[block_vet, day] + day * 1440
+        e = shift_end[block_vet, day] + day * 1440
+        clip_start = np.maximum(block_start, s)
+        clip_end = np.minimum(block_end, e)
+        inside = np.maximum(clip_end - clip_start, 0)
+
+        booked = np.bincount(cell, inside, minlength=n_vets * n_days).astype(np.int64)
+        outside = np.bincount(cell, (block_end - block_start) - inside,
+                              minlength=n_vets * n_days).astype(np.int64)
+        overbooked = np.bincount(cell, block_over, minlength=n_vets * n_days).astype(np.int64)
+
+        # idle gaps inside the shift, between the clipped blocks of each day
+        keep = inside > 0
+        cell, s, e = cell[keep], s[keep], e[keep]
+        clip_start, clip_end = clip_start[keep], clip_end[keep]
+        if len(cell):
+            longest[np.unique(cell)] = 0
+            same_day = np.concatenate(([False], cell[1:] == cell[:-1]))
+            prior_end = np.where(same_day, np.concatenate(([0], clip_end[:-1])), s)
+            np.maximum.at(longest, cell, clip_start - prior_end)
+            last = np.concatenate((cell[1:] != cell[:-1], [True]))
+            np.maximum.at(longest, cell[last], e[last] - clip_end[last])
+
+    rostered = rostered.ravel()
+    idle = rostered - booked
+    daily = [
+        (vets[i // n_days], str(day0 + i % n_days),
+         int(rostered[i]), int(booked[i]), int(outside[i]), int(idle[i]),
+         int(longest[i]), int(overbooked[i]))
+        for i in np.flatnonzero(rostered + booked + outside)
+    ]
+
+    # weeks start on Monday; 1969-12-29 was one
+    week = (epoch_days + 3) // 7
+    week_index = week - week[0]
+    n_weeks = int(week_index[-1]) + 1
+    week_cell = (np.arange(n_vets)[:, None] * n_weeks + week_index[None, :]).ravel()
+    def per_week(values):
+        return np.bincount(week_cell, values, minlength=n_vets * n_weeks).astype(np.int64)
+    w_rostered, w_booked, w_outside = per_week(rostered), per_week(booked), per_week(outside)
+    w_idle, w_over = per_week(idle), per_week(overbooked)
+    w_longest = np.zeros(n_vets * n_weeks, np.int64)
+    np.maximum.at(w_longest, week_cell, longest)
+    weekly = [
+        (vets[i // n_weeks], str(np.datetime64(int(week[0] + i % n_weeks) * 7 - 3, "D")),
+         int(w_rostered[i]), int(w_booked[i]), int(w_outside[i]), int(w_idle[i]),
+         int(w_longest[i]), int(w_over[i]))
+        for i in np.flatnonzero(w_rostered + w_booked + w_outside)
+    ]
+
+    by_vet = lambda values: values.reshape(n_vets, -1)
+    summary = [
+        (v, int(by_vet(rostered)[i].sum()), int(by_vet(booked)[i].sum()),
+         int(by_vet(outside)[i].sum()), int(by_vet(idle)[i].sum()),
+         int(by_vet(longest)[i].max()), int(by_vet(overbooked)[i].sum()), int(counts[i]))
+        for i, v in enumerate(vets)
+    ]
+    return Utilization(daily, weekly, summary)
+
+# ── Export ───────────────────────────────────────────────────────────────
+def write_csv(path, util):
+    """One row per vet and day, minutes as integers."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Vet", "Date", "Rostered Minutes", "Booked Minutes", "Outside Roster Minutes",
+                         "Idle Minutes", "Longest Gap Minutes", "Overbooked Minutes"])
+        writer.writerows(util.daily)